@@ -9,6 +9,16 @@ from flask_migrate import Migrate
 from core.configuration.configuration import get_app_version
 from core.managers.module_manager import ModuleManager
 from core.managers.config_manager import ConfigManager
+from core.managers.database_manager import DatabaseManager, RoutingSession
+from core.managers.compression_manager import CompressionManager
+from core.managers.fragment_cache_manager import FragmentCacheManager
+from core.managers.query_instrumentation_manager import QueryInstrumentationManager
+from core.managers.metrics_manager import MetricsManager
+from core.managers.tracing_manager import TracingManager
+from core.managers.template_manager import TemplateManager
+from core.managers.warmup_manager import WarmupManager
+from core.managers.job_manager import JobManager
+from core.managers.ingest_manager import IngestManager
 from core.managers.error_handler_manager import ErrorHandlerManager
 from core.managers.logging_manager import LoggingManager
 
@@ -16,7 +26,7 @@ from core.managers.logging_manager import LoggingManager
 load_dotenv()
 
 # Create the instances
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
 
@@ -27,13 +37,38 @@ def create_app(config_name='development'):
     config_manager = ConfigManager(app)
     config_manager.load_config(config_name=config_name)
 
+    # Shared Jinja bytecode cache, configured before anything creates app.jinja_env
+    template_manager = TemplateManager(app)
+    template_manager.configure_templates()
+
     # Initialize SQLAlchemy and Migrate with the app
     db.init_app(app)
     migrate.init_app(app, db)
 
+    # Statement timeouts and pool instrumentation for the engines created above
+    database_manager = DatabaseManager(app, db)
+    database_manager.register_engine_events()
+
+    # Register warmers for shared read-only state, run before forking workers (core/configuration/gunicorn_config.py)
+    warmup_manager = WarmupManager(app)
+    warmup_manager.register_warmup()
+
+    # Cache of rendered page fragments; modules register their invalidators while being registered below
+    fragment_cache_manager = FragmentCacheManager(app, db)
+    fragment_cache_manager.register_fragment_cache()
+
+    # Bounded queue of background jobs (archive builds, conversions) run by a few threads of each process
+    job_manager = JobManager(app)
+    job_manager.register_jobs()
+
+    # Hooks run in a background job on the UVL files of new datasets; modules register theirs below
+    ingest_manager = IngestManager(app)
+    ingest_manager.register_ingest()
+
     # Register modules
     module_manager = ModuleManager(app)
     module_manager.register_modules()
+    warmup_manager.register('module_manifest', lambda app: module_manager.discover_modules())
 
     # Register login manager
     from flask_login import LoginManager
@@ -54,6 +89,22 @@ def create_app(config_name='development'):
     error_handler_manager = ErrorHandlerManager(app)
     error_handler_manager.register_error_handlers()
 
+    # Compress HTML, JSON and asset responses (br/gzip)
+    compression_manager = CompressionManager(app)
+    compression_manager.register_compression()
+
+    # Count and time the queries of each request (registered after compression so it sees the raw HTML)
+    query_instrumentation_manager = QueryInstrumentationManager(app, db)
+    query_instrumentation_manager.register_instrumentation()
+
+    # Request latency, in-flight requests, pool and cache metrics for /metrics
+    metrics_manager = MetricsManager(app)
+    metrics_manager.register_metrics()
+
+    # Sampled per-request traces of SQL, template, file and HTTP time (rosemary profile:traces)
+    tracing_manager = TracingManager(app, db)
+    tracing_manager.register_tracing()
+
     # Injecting environment variables into jinja context
     @app.context_processor
     def inject_vars_into_jinja():
@@ -67,4 +118,4 @@ def create_app(config_name='development'):
     return app
 
 
-app = create_app()
+app = create_app(os.getenv('FLASK_ENV', 'development'))
@@ -6,6 +6,8 @@ from core.seeders.BaseSeeder import BaseSeeder
 class AuthSeeder(BaseSeeder):
 
     priority = 1  # Higher priority
+    depends_on = ()
+    bulk = True
 
     def run(self):
 
@@ -1,9 +1,16 @@
+import time
+
 import pytest
 from flask import url_for
 
+from app.modules.auth.models import User
+from app.modules.auth.seeders import AuthSeeder
 from app.modules.auth.services import AuthenticationService
 from app.modules.auth.repositories import UserRepository
+from app.modules.profile.models import UserProfile
 from app.modules.profile.repositories import UserProfileRepository
+from core.seeders.BaseSeeder import BaseSeeder
+from rosemary.commands.db_seed import get_seeder_dependencies, run_seeders_in_parallel
 
 
 @pytest.fixture(scope="module")
@@ -117,3 +124,78 @@ def test_service_create_with_profile_fail_no_password(clean_database):
 
     assert UserRepository().count() == 0
     assert UserProfileRepository().count() == 0
+
+
+def test_auth_seeder_bulk_mode(clean_database):
+    AuthSeeder().run()
+
+    users = User.query.order_by(User.id).all()
+    assert [user.email for user in users] == ['user1@example.com', 'user2@example.com']
+    assert users[0].check_password('1234')
+    assert [user.profile.name for user in users] == ['John', 'Jane']
+
+
+def test_bulk_seed_assigns_ids_in_chunks(clean_database):
+    seeder = BaseSeeder()
+    seeder.chunk_size = 2
+    users = seeder.seed([User(email=f'bulk{i}@example.com', password='1234') for i in range(5)], bulk=True)
+    profiles = seeder.seed([UserProfile(id=100 + i, user_id=user.id, name='Name', surname='Surname')
+                            for i, user in enumerate(users)], bulk=True)
+
+    assert [db_user.email for db_user in User.query.order_by(User.id)] == [user.email for user in users]
+    assert [user.id for user in users] == sorted(user.id for user in User.query)
+    assert [profile.id for profile in profiles] == [100, 101, 102, 103, 104]
+    assert UserProfile.query.filter_by(id=104).one().user_id == users[-1].id
+
+
+class RecordingSeeder(BaseSeeder):
+    def __init__(self, name, priority=10, depends_on=None, log=None, fail=False):
+        super().__init__()
+        self.name, self.priority, self.depends_on, self.log, self.fail = name, priority, depends_on, log, fail
+
+    def run(self):
+        self.log.append(('start', self.name))
+        time.sleep(0.05)
+        if self.fail:
+            raise Exception('failed')
+        self.log.append(('end', self.name))
+
+
+class UsersSeeder(RecordingSeeder):
+    pass
+
+
+def test_seeder_dependencies_default_to_priority_order(test_client):
+    first = RecordingSeeder('first', priority=1)
+    second = RecordingSeeder('second', priority=2)
+    users = UsersSeeder('users', priority=3, depends_on=())
+    declared = RecordingSeeder('declared', priority=3, depends_on=('UsersSeeder',))
+
+    dependencies = get_seeder_dependencies([first, second, users, declared])
+
+    assert dependencies[first] == []
+    assert dependencies[second] == [first]
+    assert dependencies[users] == []
+    assert dependencies[declared] == [users]
+
+
+def test_parallel_seeding_respects_dependencies(test_client):
+    log = []
+    users = UsersSeeder('users', priority=1, depends_on=(), log=log)
+    datasets = RecordingSeeder('datasets', priority=2, depends_on=('UsersSeeder',), log=log)
+    notes = RecordingSeeder('notes', priority=2, depends_on=('UsersSeeder',), log=log)
+
+    assert run_seeders_in_parallel([users, datasets, notes], workers=4)
+
+    assert log[:2] == [('start', 'users'), ('end', 'users')]
+    # Both dependents started before either finished
+    assert set(log[2:4]) == {('start', 'datasets'), ('start', 'notes')}
+
+
+def test_parallel_seeding_stops_after_a_failure(test_client):
+    log = []
+    failing = RecordingSeeder('failing', priority=1, log=log, fail=True)
+    later = RecordingSeeder('later', priority=2, log=log)
+
+    assert not run_seeders_in_parallel([failing, later], workers=2)
+    assert log == [('start', 'failing')]
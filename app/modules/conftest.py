@@ -1,7 +1,12 @@
 import pytest
+from sqlalchemy import create_engine, event
 
 from app import create_app, db
 from app.modules.auth.models import User
+from app.modules.dataset.models import Author, DSMetaData, DataSet, PublicationType
+from app.modules.featuremodel.models import FMMetaData, FeatureModel
+from app.modules.hubfile.models import Hubfile
+from core.seeders.ScaleSeeder import ScaleSeeder
 
 
 @pytest.fixture(scope='session')
@@ -41,6 +46,84 @@ def test_client(test_app):
             db.drop_all()
 
 
+@pytest.fixture(scope='function')
+def query_budget(test_client):
+    """
+    Requests a URL and fails if handling it issued more SQL queries than the declared budget, as reported
+    by the X-Query-Count header of the SQL instrumentation.
+
+    Usage: query_budget('/explore', max_queries=3) or query_budget('/explore', 3, method='POST', json={...})
+    """
+
+    def check(url, max_queries, method='GET', **kwargs):
+        response = test_client.open(url, method=method, **kwargs)
+        query_count = int(response.headers['X-Query-Count'])
+        assert query_count <= max_queries, (
+            f"{method} {url} issued {query_count} queries, over its budget of {max_queries} "
+            f"({response.headers['X-Query-Repeated']} statements repeated, possible N+1)"
+        )
+        return response
+
+    return check
+
+
+@pytest.fixture(scope='session')
+def seed_synchronized_datasets():
+    """
+    Returns a function adding published datasets (with a DOI) of the test user, each with the given number of
+    feature models, for the tests of the pages that list them.
+
+    Usage: seed_synchronized_datasets(number_of_datasets=5, models_per_dataset=3), inside an app context
+    """
+
+    def seed(number_of_datasets, models_per_dataset):
+        user = User.query.filter_by(email='test@example.com').first()
+        for n in range(number_of_datasets):
+            dataset = DataSet(user_id=user.id, ds_meta_data=DSMetaData(
+                title=f'Dataset {n}', description='Description', publication_type=PublicationType.NONE,
+                dataset_doi=f'10.1234/dataset{n}', tags='tag1, tag2', authors=[Author(name='Author')]
+            ))
+            for i in range(models_per_dataset):
+                dataset.feature_models.append(FeatureModel(
+                    fm_meta_data=FMMetaData(uvl_filename=f'file{i}.uvl', title=f'Model {i}',
+                                            description='Description', publication_type=PublicationType.NONE,
+                                            authors=[Author(name='Author')]),
+                    files=[Hubfile(name=f'file{i}.uvl', checksum='checksum', size=100)]
+                ))
+            db.session.add(dataset)
+        db.session.commit()
+
+    return seed
+
+
+@pytest.fixture
+def replica(test_client, tmp_path):
+    """A second SQLite database registered as the 'replica' bind, recording the statements it receives."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    db.metadata.create_all(engine)
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda conn, cursor, statement, *args: statements.append(statement))
+
+    with test_client.application.app_context():
+        db.session.remove()
+        db.engines['replica'] = engine
+        yield statements
+        db.session.remove()
+        db.engines.pop('replica')
+    engine.dispose()
+
+
+@pytest.fixture(scope='module')
+def benchmark_uploads(test_client, tmp_path_factory):
+    """
+    Seeds the fixed data of the benchmarks (bench_*.py files): 40 published datasets with 3 generated models of 60
+    features each, the same for every run. Returns the folder holding their uploads.
+    """
+    uploads_dir = tmp_path_factory.mktemp('benchmark_uploads')
+    ScaleSeeder(40, models=3, features=60, records=0, processes=1, seed=0, uploads_dir=str(uploads_dir)).run()
+    return uploads_dir
+
+
 @pytest.fixture(scope='function')
 def clean_database():
     db.session.remove()
@@ -8,3 +8,23 @@ dataset_bp = BaseBlueprint('dataset', __name__, template_folder='templates')
 
 api = Api(dataset_bp)
 init_blueprint_api(api)
+
+
+@dataset_bp.record_once
+def register_fragment_invalidator(state):
+    fragment_cache = state.app.extensions.get('fragment_cache')
+    if fragment_cache:
+        from app.modules.dataset.services import DATASET_DETAIL_TABLES, dataset_detail_invalidations
+        fragment_cache.register_invalidator(DATASET_DETAIL_TABLES, dataset_detail_invalidations)
+
+
+@dataset_bp.record_once
+def setup_doi_resolver(state):
+    from app.modules.dataset.services import register_doi_resolver
+    register_doi_resolver(state.app)
+
+
+@dataset_bp.record_once
+def setup_dataset_archive_cache(state):
+    from app.modules.dataset.services import register_dataset_archive_cache
+    register_dataset_archive_cache(state.app)
@@ -82,11 +82,14 @@ var currentId = 0;
         }
 
 
-        document.getElementById('add_author').addEventListener('click', function () {
-            let authors = document.getElementById('authors');
-            let newAuthor = createAuthorBlock(amount_authors++, "");
-            authors.appendChild(newAuthor);
-        });
+        const addAuthorButton = document.getElementById('add_author');
+        if (addAuthorButton) {
+            addAuthorButton.addEventListener('click', function () {
+                let authors = document.getElementById('authors');
+                let newAuthor = createAuthorBlock(amount_authors++, "");
+                authors.appendChild(newAuthor);
+            });
+        }
 
 
         document.addEventListener('click', function (event) {
@@ -128,7 +131,12 @@ var currentId = 0;
             upload_error.style.display = 'block';
         }
 
-        window.onload = function () {
+        // A listener rather than window.onload, which would replace the one of any other script
+        window.addEventListener('load', function () {
+
+            if (!document.getElementById('upload_button')) {
+                return;
+            }
 
             test_zenodo_connection();
 
@@ -230,10 +238,14 @@ var currentId = 0;
 
 
             });
-        };
+        });
 
 
         function isValidOrcid(orcid) {
             let orcidRegex = /^\d{4}-\d{4}-\d{4}-\d{4}$/;
             return orcidRegex.test(orcid);
-        }
\ No newline at end of file
+        }
+
+        // Called from the upload page
+        window.show_upload_dataset = show_upload_dataset;
+        window.generateIncrementalId = generateIncrementalId;
@@ -61,7 +61,7 @@ class DSMetaData(db.Model):
     description = db.Column(db.Text, nullable=False)
     publication_type = db.Column(SQLAlchemyEnum(PublicationType), nullable=False)
     publication_doi = db.Column(db.String(120))
-    dataset_doi = db.Column(db.String(120))
+    dataset_doi = db.Column(db.String(120), index=True)
     tags = db.Column(db.String(120))
     ds_metrics_id = db.Column(db.Integer, db.ForeignKey('ds_metrics.id'))
     ds_metrics = db.relationship('DSMetrics', uselist=False, backref='ds_meta_data', cascade="all, delete")
@@ -78,6 +78,9 @@ class DataSet(db.Model):
     ds_meta_data = db.relationship('DSMetaData', backref=db.backref('data_set', uselist=False))
     feature_models = db.relationship('FeatureModel', backref='data_set', lazy=True, cascade="all, delete")
 
+    # "My datasets" filters by owner and sorts by creation date
+    __table_args__ = (db.Index('ix_data_set_user_id_created_at', 'user_id', 'created_at'),)
+
     def name(self):
         return self.ds_meta_data.title
 
@@ -140,6 +143,10 @@ class DSDownloadRecord(db.Model):
     download_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     download_cookie = db.Column(db.String(36), nullable=False)  # Assuming UUID4 strings
 
+    # Every dataset download checks whether this cookie already downloaded it
+    __table_args__ = (db.Index('ix_ds_download_record_user_id_dataset_id_download_cookie',
+                               'user_id', 'dataset_id', 'download_cookie'),)
+
     def __repr__(self):
         return (
             f'<Download id={self.id} '
@@ -156,11 +163,15 @@ class DSViewRecord(db.Model):
     view_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     view_cookie = db.Column(db.String(36), nullable=False)  # Assuming UUID4 strings
 
+    # Every dataset page view checks whether this cookie already viewed it
+    __table_args__ = (db.Index('ix_ds_view_record_user_id_dataset_id_view_cookie',
+                               'user_id', 'dataset_id', 'view_cookie'),)
+
     def __repr__(self):
         return f'<View id={self.id} dataset_id={self.dataset_id} date={self.view_date} cookie={self.view_cookie}>'
 
 
 class DOIMapping(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    dataset_doi_old = db.Column(db.String(120))
-    dataset_doi_new = db.Column(db.String(120))
+    dataset_doi_old = db.Column(db.String(120), index=True)
+    dataset_doi_new = db.Column(db.String(120), index=True)
@@ -4,6 +4,7 @@ from flask_login import current_user
 from typing import Optional
 
 from sqlalchemy import desc, func
+from sqlalchemy.orm import selectinload
 
 from app.modules.dataset.models import (
     Author,
@@ -13,11 +14,20 @@ from app.modules.dataset.models import (
     DSViewRecord,
     DataSet
 )
+from app.modules.featuremodel.models import FeatureModel
 from core.repositories.BaseRepository import BaseRepository
 
 logger = logging.getLogger(__name__)
 
 
+def dataset_listing_options():
+    """Eager loads what dataset cards and DataSet.to_dict() read, instead of a few queries per dataset."""
+    return (
+        selectinload(DataSet.ds_meta_data).selectinload(DSMetaData.authors),
+        selectinload(DataSet.feature_models).selectinload(FeatureModel.files),
+    )
+
+
 class AuthorRepository(BaseRepository):
     def __init__(self):
         super().__init__(Author)
@@ -31,13 +41,28 @@ class DSDownloadRecordRepository(BaseRepository):
         max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
         return max_id if max_id is not None else 0
 
+    def the_record_exists(self, dataset_id: int, user_cookie: str):
+        return self.model.query.filter_by(
+            user_id=current_user.id if current_user.is_authenticated else None,
+            dataset_id=dataset_id,
+            download_cookie=user_cookie
+        ).first()
+
 
 class DSMetaDataRepository(BaseRepository):
     def __init__(self):
         super().__init__(DSMetaData)
 
     def filter_by_doi(self, doi: str) -> Optional[DSMetaData]:
-        return self.model.query.filter_by(dataset_doi=doi).first()
+        # view_dataset.html lists every file of every feature model
+        return (
+            self.model.query.filter_by(dataset_doi=doi)
+            .options(
+                selectinload(DSMetaData.authors),
+                selectinload(DSMetaData.data_set).selectinload(DataSet.feature_models).selectinload(FeatureModel.files),
+            )
+            .first()
+        )
 
 
 class DSViewRecordRepository(BaseRepository):
@@ -105,12 +130,22 @@ class DataSetRepository(BaseRepository):
             .count()
         )
 
+    def get_id_by_doi(self, doi: str) -> Optional[int]:
+        return (
+            self.model.query.with_entities(self.model.id)
+            .join(DSMetaData)
+            .filter(DSMetaData.dataset_doi == doi)
+            .limit(1)
+            .scalar()
+        )
+
     def latest_synchronized(self):
         return (
             self.model.query.join(DSMetaData)
             .filter(DSMetaData.dataset_doi.isnot(None))
             .order_by(desc(self.model.id))
             .limit(5)
+            .options(*dataset_listing_options())
             .all()
         )
 
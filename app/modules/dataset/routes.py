@@ -2,17 +2,15 @@ import logging
 import os
 import json
 import shutil
-import tempfile
 import uuid
 from datetime import datetime, timezone
-from zipfile import ZipFile
 
 from flask import (
     redirect,
     render_template,
     request,
     jsonify,
-    send_from_directory,
+    send_file,
     make_response,
     abort,
     url_for,
@@ -20,9 +18,6 @@ from flask import (
 from flask_login import login_required, current_user
 
 from app.modules.dataset.forms import DataSetForm
-from app.modules.dataset.models import (
-    DSDownloadRecord
-)
 from app.modules.dataset import dataset_bp
 from app.modules.dataset.services import (
     AuthorService,
@@ -30,7 +25,8 @@ from app.modules.dataset.services import (
     DSMetaDataService,
     DSViewRecordService,
     DataSetService,
-    DOIMappingService
+    DOIMappingService,
+    doi_resolver
 )
 from app.modules.zenodo.services import ZenodoService
 
@@ -61,6 +57,7 @@ def create_dataset():
             dataset = dataset_service.create_from_form(form=form, current_user=current_user)
             logger.info(f"Created dataset: {dataset}")
             dataset_service.move_feature_models(dataset)
+            dataset_service.schedule_precompute(dataset)
         except Exception as exc:
             logger.exception(f"Exception while create dataset data in local {exc}")
             return jsonify({"Exception while create dataset data in local: ": str(exc)}), 400
@@ -180,24 +177,7 @@ def delete():
 def download_dataset(dataset_id):
     dataset = dataset_service.get_or_404(dataset_id)
 
-    file_path = f"uploads/user_{dataset.user_id}/dataset_{dataset.id}/"
-
-    temp_dir = tempfile.mkdtemp()
-    zip_path = os.path.join(temp_dir, f"dataset_{dataset_id}.zip")
-
-    with ZipFile(zip_path, "w") as zipf:
-        for subdir, dirs, files in os.walk(file_path):
-            for file in files:
-                full_path = os.path.join(subdir, file)
-
-                relative_path = os.path.relpath(full_path, file_path)
-
-                zipf.write(
-                    full_path,
-                    arcname=os.path.join(
-                        os.path.basename(zip_path[:-4]), relative_path
-                    ),
-                )
+    archive_path = dataset_service.get_archive(dataset)
 
     user_cookie = request.cookies.get("download_cookie")
     if not user_cookie:
@@ -206,28 +186,24 @@ def download_dataset(dataset_id):
         )  # Generate a new unique identifier if it does not exist
         # Save the cookie to the user's browser
         resp = make_response(
-            send_from_directory(
-                temp_dir,
-                f"dataset_{dataset_id}.zip",
+            send_file(
+                archive_path,
                 as_attachment=True,
+                download_name=f"dataset_{dataset_id}.zip",
                 mimetype="application/zip",
             )
         )
         resp.set_cookie("download_cookie", user_cookie)
     else:
-        resp = send_from_directory(
-            temp_dir,
-            f"dataset_{dataset_id}.zip",
+        resp = send_file(
+            archive_path,
             as_attachment=True,
+            download_name=f"dataset_{dataset_id}.zip",
             mimetype="application/zip",
         )
 
     # Check if the download record already exists for this cookie
-    existing_record = DSDownloadRecord.query.filter_by(
-        user_id=current_user.id if current_user.is_authenticated else None,
-        dataset_id=dataset_id,
-        download_cookie=user_cookie
-    ).first()
+    existing_record = DSDownloadRecordService().the_record_exists(dataset_id, user_cookie)
 
     if not existing_record:
         # Record the download in your database
@@ -244,24 +220,26 @@ def download_dataset(dataset_id):
 @dataset_bp.route("/doi/<path:doi>/", methods=["GET"])
 def subdomain_index(doi):
 
+    resolution = doi_resolver().resolve(doi)
+
     # Check if the DOI is an old DOI
-    new_doi = doi_mapping_service.get_new_doi(doi)
-    if new_doi:
+    if resolution.redirect_doi:
         # Redirect to the same path with the new DOI
-        return redirect(url_for('dataset.subdomain_index', doi=new_doi), code=302)
-
-    # Try to search the dataset by the provided DOI (which should already be the new one)
-    ds_meta_data = dsmetadata_service.filter_by_doi(doi)
+        return redirect(url_for('dataset.subdomain_index', doi=resolution.redirect_doi), code=302)
 
-    if not ds_meta_data:
+    if not resolution.dataset_id:
         abort(404)
 
-    # Get dataset
-    dataset = ds_meta_data.data_set
+    dataset = dataset_service.get_by_id(resolution.dataset_id)
+    if not dataset:
+        # Deleted in another worker since this one cached the DOI
+        doi_resolver().invalidate(doi)
+        abort(404)
 
     # Save the cookie to the user's browser
     user_cookie = ds_view_record_service.create_cookie(dataset=dataset)
-    resp = make_response(render_template("dataset/view_dataset.html", dataset=dataset))
+    dataset_detail = dataset_service.render_dataset_detail(dataset)
+    resp = make_response(render_template("dataset/view_dataset.html", dataset=dataset, dataset_detail=dataset_detail))
     resp.set_cookie("view_cookie", user_cookie)
 
     return resp
@@ -10,6 +10,7 @@ from app.modules.dataset.models import (
     PublicationType,
     DSMetrics,
     Author)
+from app.modules.dataset.services import calculate_checksum_and_size
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 
@@ -17,6 +18,8 @@ from dotenv import load_dotenv
 class DataSetSeeder(BaseSeeder):
 
     priority = 2  # Lower priority
+    depends_on = ('AuthSeeder',)
+    bulk = True
 
     def run(self):
         # Retrieve users
@@ -103,6 +106,7 @@ class DataSetSeeder(BaseSeeder):
         load_dotenv()
         working_dir = os.getenv('WORKING_DIR', '')
         src_folder = os.path.join(working_dir, 'app', 'modules', 'dataset', 'uvl_examples')
+        uvl_files = []
         for i in range(12):
             file_name = f'file{i+1}.uvl'
             feature_model = seeded_feature_models[i]
@@ -114,11 +118,14 @@ class DataSetSeeder(BaseSeeder):
             shutil.copy(os.path.join(src_folder, file_name), dest_folder)
 
             file_path = os.path.join(dest_folder, file_name)
+            checksum, size = calculate_checksum_and_size(file_path)
 
-            uvl_file = Hubfile(
+            uvl_files.append(Hubfile(
                 name=file_name,
-                checksum=f'checksum{i+1}',
-                size=os.path.getsize(file_path),
+                checksum=checksum,
+                size=size,
                 feature_model_id=feature_model.id
-            )
-            self.seed([uvl_file])
+            ))
+
+        # Insert all the files at once
+        self.seed(uvl_files)
@@ -1,14 +1,20 @@
+import itertools
 import logging
 import os
 import hashlib
 import shutil
-from typing import Optional
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
 import uuid
+from zipfile import ZipFile
 
-from flask import request
+from flask import current_app, has_app_context, request
+from sqlalchemy import event, inspect, select
 
 from app.modules.auth.services import AuthenticationService
-from app.modules.dataset.models import DSViewRecord, DataSet, DSMetaData
+from app import db
+from app.modules.dataset.models import Author, DOIMapping, DSViewRecord, DataSet, DSMetaData
 from app.modules.dataset.repositories import (
     AuthorRepository,
     DOIMappingRepository,
@@ -17,23 +23,138 @@ from app.modules.dataset.repositories import (
     DSViewRecordRepository,
     DataSetRepository
 )
+from app.modules.featuremodel.models import FMMetaData, FeatureModel
 from app.modules.featuremodel.repositories import FMMetaDataRepository, FeatureModelRepository
+from app.modules.hubfile.models import Hubfile
+from app.modules.profile.models import UserProfile
 from app.modules.hubfile.repositories import (
     HubfileDownloadRecordRepository,
     HubfileRepository,
     HubfileViewRecordRepository
 )
+from core.cache.backends import LRUCache, private_directory
+from core.managers.job_manager import JobQueueFull
+from core.metrics.metrics import CACHE_HITS, CACHE_MISSES, registry
 from core.services.BaseService import BaseService
+from core.tracing.tracer import trace_span
 
 logger = logging.getLogger(__name__)
 
 
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+DATASET_DETAIL_FRAGMENT = 'dataset/_dataset_detail.html'
+DATASET_DETAIL_TABLES = ('data_set', 'ds_meta_data', 'author', 'feature_model', 'fm_meta_data', 'file', 'user_profile')
+
+
 def calculate_checksum_and_size(file_path):
     file_size = os.path.getsize(file_path)
+    hash_md5 = hashlib.md5()
     with open(file_path, "rb") as file:
-        content = file.read()
-        hash_md5 = hashlib.md5(content).hexdigest()
-        return hash_md5, file_size
+        for chunk in iter(lambda: file.read(CHECKSUM_CHUNK_SIZE), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest(), file_size
+
+
+def calculate_checksums_and_sizes(file_paths, max_workers=8):
+    """Hashes the files in a thread pool (hashlib releases the GIL), keeping the order of `file_paths`."""
+    if len(file_paths) <= 1:
+        return [calculate_checksum_and_size(file_path) for file_path in file_paths]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(file_paths))) as executor:
+        return list(executor.map(calculate_checksum_and_size, file_paths))
+
+
+def create_dataset_zip(source_dir, zip_path, folder=None):
+    """Zips every file under `source_dir` into `zip_path`, inside `folder` (by default named after the archive)."""
+    folder = folder or os.path.basename(zip_path[:-4])
+    with ZipFile(zip_path, "w") as zipf:
+        for subdir, dirs, files in os.walk(source_dir):
+            for file in files:
+                full_path = os.path.join(subdir, file)
+                zipf.write(full_path, arcname=os.path.join(folder, os.path.relpath(full_path, source_dir)))
+    return zip_path
+
+
+def dataset_uploads_dir(dataset):
+    working_dir = os.getenv("WORKING_DIR", "")
+    return os.path.join(working_dir, "uploads", f"user_{dataset.user_id}", f"dataset_{dataset.id}")
+
+
+class DatasetArchiveCache:
+    """
+    ZIP archives of the datasets in ARCHIVE_CACHE_DIR, built in the background after an upload and on the first
+    download otherwise. An archive older than the uploads folder of its dataset or any file in it is built again.
+    The directory must be private to the user of the app (see `private_directory`): its archives are served as is.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        private_directory(directory)
+
+    def path(self, dataset_id):
+        return os.path.join(self.directory, f"dataset_{dataset_id}.zip")
+
+    @staticmethod
+    def _last_modified(source_dir):
+        # The folder's own mtime changes when files are added or removed
+        try:
+            times = [os.path.getmtime(source_dir)]
+        except FileNotFoundError:
+            return 0
+        for subdir, dirs, files in os.walk(source_dir):
+            times.extend(os.path.getmtime(os.path.join(subdir, name)) for name in dirs + files)
+        return max(times)
+
+    def is_fresh(self, dataset):
+        try:
+            built_at = os.path.getmtime(self.path(dataset.id))
+        except FileNotFoundError:
+            return False
+        return built_at >= self._last_modified(dataset_uploads_dir(dataset))
+
+    def get(self, dataset):
+        """Returns the path of the archive of `dataset`, building it if it is missing or stale."""
+        if self.is_fresh(dataset):
+            self.hits += 1
+            return self.path(dataset.id)
+        self.misses += 1
+        return self.build(dataset)
+
+    def build(self, dataset):
+        # Zip to a temporary file then rename, so downloads never see a half written archive
+        zip_path = self.path(dataset.id)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp_", suffix=".zip")
+        os.close(fd)
+        try:
+            with trace_span("file", f"zip {dataset_uploads_dir(dataset)}"):
+                create_dataset_zip(dataset_uploads_dir(dataset), temp_path, folder=f"dataset_{dataset.id}")
+            os.replace(temp_path, zip_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return zip_path
+
+    def collect_metrics(self):
+        CACHE_HITS.set_total(self.hits, cache="dataset_archive")
+        CACHE_MISSES.set_total(self.misses, cache="dataset_archive")
+
+
+def register_dataset_archive_cache(app):
+    cache = DatasetArchiveCache(app.config["ARCHIVE_CACHE_DIR"])
+    app.extensions["dataset_archive_cache"] = cache
+    registry.register_collector("dataset_archive_cache", cache.collect_metrics)
+    return cache
+
+
+def build_dataset_archive(dataset_id):
+    """Background job: builds the archive of a dataset."""
+    # On the primary: the job runs right after the dataset is created, outside any request and its stickiness, so a
+    # lagging replica would not have it yet
+    dataset = db.session.get(DataSet, dataset_id)
+    if dataset is not None:
+        current_app.extensions["dataset_archive_cache"].get(dataset)
 
 
 class DataSetService(BaseService):
@@ -52,9 +173,7 @@ class DataSetService(BaseService):
     def move_feature_models(self, dataset: DataSet):
         current_user = AuthenticationService().get_authenticated_user()
         source_dir = current_user.temp_folder()
-
-        working_dir = os.getenv("WORKING_DIR", "")
-        dest_dir = os.path.join(working_dir, "uploads", f"user_{current_user.id}", f"dataset_{dataset.id}")
+        dest_dir = dataset_uploads_dir(dataset)
 
         os.makedirs(dest_dir, exist_ok=True)
 
@@ -62,6 +181,29 @@ class DataSetService(BaseService):
             uvl_filename = feature_model.fm_meta_data.uvl_filename
             shutil.move(os.path.join(source_dir, uvl_filename), dest_dir)
 
+    def schedule_precompute(self, dataset: DataSet):
+        """
+        Queues the build of the archive of a dataset whose files were just moved, so that its first downloads are
+        served from the cache, and the ingest hooks of its files. Returns the archive job, or None when jobs are
+        disabled or the queue is full; the first download then builds the archive itself.
+        """
+        ingest = current_app.extensions.get("ingest")
+        if ingest is not None:
+            ingest.ingest([file.id for file in dataset.files()], key=f"ingest:dataset:{dataset.id}")
+
+        jobs = current_app.extensions.get("jobs")
+        if jobs is None:
+            return None
+        try:
+            return jobs.submit("dataset_archive", build_dataset_archive, dataset.id,
+                               key=f"dataset_archive:{dataset.id}")
+        except JobQueueFull as e:
+            logger.warning(f"Not building the archive of dataset {dataset.id}: {e}")
+            return None
+
+    def get_archive(self, dataset: DataSet) -> str:
+        return current_app.extensions["dataset_archive_cache"].get(dataset)
+
     def get_synchronized(self, current_user_id: int) -> DataSet:
         return self.repository.get_synchronized(current_user_id)
 
@@ -100,32 +242,43 @@ class DataSetService(BaseService):
         }
         try:
             logger.info(f"Creating dsmetadata...: {form.get_dsmetadata()}")
-            dsmetadata = self.dsmetadata_repository.create(**form.get_dsmetadata())
-            for author_data in [main_author] + form.get_authors():
-                author = self.author_repository.create(commit=False, ds_meta_data_id=dsmetadata.id, **author_data)
-                dsmetadata.authors.append(author)
-
-            dataset = self.create(commit=False, user_id=current_user.id, ds_meta_data_id=dsmetadata.id)
-
-            for feature_model in form.feature_models:
-                uvl_filename = feature_model.uvl_filename.data
-                fmmetadata = self.fmmetadata_repository.create(commit=False, **feature_model.get_fmmetadata())
-                for author_data in feature_model.get_authors():
-                    author = self.author_repository.create(commit=False, fm_meta_data_id=fmmetadata.id, **author_data)
-                    fmmetadata.authors.append(author)
-
-                fm = self.feature_model_repository.create(
-                    commit=False, data_set_id=dataset.id, fm_meta_data_id=fmmetadata.id
-                )
-
-                # associated files in feature model
-                file_path = os.path.join(current_user.temp_folder(), uvl_filename)
-                checksum, size = calculate_checksum_and_size(file_path)
-
-                file = self.hubfilerepository.create(
-                    commit=False, name=uvl_filename, checksum=checksum, size=size, feature_model_id=fm.id
-                )
-                fm.files.append(file)
+            # Checksums are computed before touching the database, so the transaction stays short
+            file_paths = [
+                os.path.join(current_user.temp_folder(), feature_model.uvl_filename.data)
+                for feature_model in form.feature_models
+            ]
+            checksums_and_sizes = calculate_checksums_and_sizes(file_paths)
+
+            # One INSERT per table: the ids of each level are read back to fill in the foreign keys of the next
+            dsmetadata = self.dsmetadata_repository.create(commit=False, **form.get_dsmetadata())
+            self.author_repository.bulk_create(
+                [{**author_data, 'ds_meta_data_id': dsmetadata.id}
+                 for author_data in [main_author] + form.get_authors()],
+                commit=False, return_instances=False
+            )
+            dataset = self.repository.create(commit=False, user_id=current_user.id, ds_meta_data_id=dsmetadata.id)
+
+            fmmetadata_list = self.fmmetadata_repository.bulk_create(
+                [feature_model.get_fmmetadata() for feature_model in form.feature_models], commit=False
+            )
+            self.author_repository.bulk_create(
+                [{**author_data, 'fm_meta_data_id': fmmetadata.id}
+                 for feature_model, fmmetadata in zip(form.feature_models, fmmetadata_list)
+                 for author_data in feature_model.get_authors()],
+                commit=False, return_instances=False
+            )
+            feature_models = self.feature_model_repository.bulk_create(
+                [{'data_set_id': dataset.id, 'fm_meta_data_id': fmmetadata.id} for fmmetadata in fmmetadata_list],
+                commit=False
+            )
+            self.hubfilerepository.bulk_create(
+                [{'name': feature_model.uvl_filename.data, 'checksum': checksum, 'size': size,
+                  'feature_model_id': created.id}
+                 for feature_model, created, (checksum, size)
+                 in zip(form.feature_models, feature_models, checksums_and_sizes)],
+                commit=False, return_instances=False
+            )
+
             self.repository.session.commit()
         except Exception as exc:
             logger.info(f"Exception creating dataset from form...: {exc}")
@@ -134,13 +287,68 @@ class DataSetService(BaseService):
         return dataset
 
     def update_dsmetadata(self, id, **kwargs):
-        return self.dsmetadata_repository.update(id, **kwargs)
+        ds_meta_data = self.dsmetadata_repository.update(id, **kwargs)
+        if ds_meta_data is not None and ds_meta_data.data_set is not None:
+            self.invalidate_dataset_detail(ds_meta_data.data_set.id)
+        return ds_meta_data
+
+    def render_dataset_detail(self, dataset: DataSet):
+        """
+        Metadata, authors and files of a published dataset, from the fragment cache when possible. The dataset
+        graph is only loaded (eagerly) to render a missing fragment.
+        """
+        def context():
+            return {'dataset': self.dsmetadata_repository.filter_by_doi(dataset.ds_meta_data.dataset_doi).data_set}
+
+        fragment_cache = current_app.extensions.get('fragment_cache')
+        if fragment_cache is None:
+            return None
+        return fragment_cache.render(DATASET_DETAIL_FRAGMENT, dataset.id, context)
+
+    def invalidate_dataset_detail(self, dataset_id: int):
+        fragment_cache = current_app.extensions.get('fragment_cache')
+        if fragment_cache is not None:
+            fragment_cache.invalidate(DATASET_DETAIL_FRAGMENT, dataset_id)
 
     def get_uvlhub_doi(self, dataset: DataSet) -> str:
         domain = os.getenv('DOMAIN', 'localhost')
         return f'http://{domain}/doi/{dataset.ds_meta_data.dataset_doi}'
 
 
+def dataset_detail_invalidations(connection, instances):
+    """Fragment cache invalidator: the dataset detail fragments showing any of the flushed instances."""
+    dataset_ids, ds_meta_data_ids, fm_meta_data_ids, feature_model_ids, user_ids = set(), set(), set(), set(), set()
+    for instance in instances:
+        if isinstance(instance, DataSet):
+            dataset_ids.add(instance.id)
+        elif isinstance(instance, DSMetaData):
+            ds_meta_data_ids.add(instance.id)
+        elif isinstance(instance, FeatureModel):
+            dataset_ids.add(instance.data_set_id)
+        elif isinstance(instance, FMMetaData):
+            fm_meta_data_ids.add(instance.id)
+        elif isinstance(instance, Hubfile):
+            feature_model_ids.add(instance.feature_model_id)
+        elif isinstance(instance, Author):
+            ds_meta_data_ids.add(instance.ds_meta_data_id)
+            fm_meta_data_ids.add(instance.fm_meta_data_id)
+        elif isinstance(instance, UserProfile):
+            user_ids.add(instance.user_id)
+
+    lookups = (
+        (DataSet.id, DataSet.ds_meta_data_id, ds_meta_data_ids),
+        (FeatureModel.data_set_id, FeatureModel.fm_meta_data_id, fm_meta_data_ids),
+        (FeatureModel.data_set_id, FeatureModel.id, feature_model_ids),
+        (DataSet.id, DataSet.user_id, user_ids),
+    )
+    for column, foreign_key, ids in lookups:
+        ids.discard(None)
+        if ids:
+            dataset_ids.update(connection.execute(select(column).where(foreign_key.in_(ids))).scalars())
+
+    return [(DATASET_DETAIL_FRAGMENT, dataset_id) for dataset_id in dataset_ids if dataset_id is not None]
+
+
 class AuthorService(BaseService):
     def __init__(self):
         super().__init__(AuthorRepository())
@@ -150,6 +358,9 @@ class DSDownloadRecordService(BaseService):
     def __init__(self):
         super().__init__(DSDownloadRecordRepository())
 
+    def the_record_exists(self, dataset_id: int, user_cookie: str):
+        return self.repository.the_record_exists(dataset_id, user_cookie)
+
 
 class DSMetaDataService(BaseService):
     def __init__(self):
@@ -198,6 +409,124 @@ class DOIMappingService(BaseService):
             return None
 
 
+class DOIResolution(NamedTuple):
+    dataset_id: Optional[int] = None
+    redirect_doi: Optional[str] = None
+
+    @property
+    def found(self):
+        return self.dataset_id is not None or self.redirect_doi is not None
+
+
+class DOIResolver:
+    """
+    Resolves the DOI of a landing page to the id of its dataset, or to the new DOI it was moved to, with one
+    cached step. Both lookups are indexed (ds_meta_data.dataset_doi, doi_mapping.dataset_doi_old). Unknown DOIs
+    are cached too, for DOI_CACHE_NEGATIVE_TIMEOUT seconds. Flushes that change a DOI or a mapping drop the
+    affected entries when they commit; other gunicorn workers see the change when their entry expires.
+    """
+
+    def __init__(self, max_entries=10000, timeout=300, negative_timeout=30):
+        self.cache = LRUCache(max_entries, default_timeout=timeout)
+        self.negative_timeout = negative_timeout
+        self.doi_mapping_repository = DOIMappingRepository()
+        self.dataset_repository = DataSetRepository()
+
+    def resolve(self, doi: str) -> DOIResolution:
+        resolution = self.cache.get(doi)
+        if resolution is None:
+            resolution = self.lookup(doi)
+            self.cache.set(doi, resolution, None if resolution.found else self.negative_timeout)
+        return resolution
+
+    def lookup(self, doi: str) -> DOIResolution:
+        doi_mapping = self.doi_mapping_repository.get_new_doi(doi)
+        if doi_mapping and doi_mapping.dataset_doi_new:
+            return DOIResolution(redirect_doi=doi_mapping.dataset_doi_new)
+        return DOIResolution(dataset_id=self.dataset_repository.get_id_by_doi(doi))
+
+    def invalidate(self, *dois):
+        for doi in dois:
+            if doi:
+                self.cache.delete(doi)
+
+    def clear(self):
+        self.cache.clear()
+
+    def collect_metrics(self):
+        CACHE_HITS.set_total(self.cache.hits, cache='doi')
+        CACHE_MISSES.set_total(self.cache.misses, cache='doi')
+
+
+DOI_RESOLVER_TABLES = ('data_set', 'ds_meta_data', 'doi_mapping')
+
+
+def doi_resolver():
+    return current_app.extensions.get('doi_resolver') if has_app_context() else None
+
+
+def _changed_values(session, instance, attribute):
+    if instance in session.new or instance in session.deleted:
+        return {getattr(instance, attribute)}
+    history = inspect(instance).attrs[attribute].history
+    return set(history.added or ()) | set(history.deleted or ())
+
+
+def _collect_doi_changes(session, flush_context):
+    if doi_resolver() is None:
+        return
+    dois = session.info.setdefault('doi_resolver_changes', set())
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, DOIMapping):
+            # Cached under the old DOI, whichever of its columns changed
+            dois.add(instance.dataset_doi_old)
+            dois.update(_changed_values(session, instance, 'dataset_doi_old'))
+        elif isinstance(instance, DSMetaData):
+            dois.update(_changed_values(session, instance, 'dataset_doi'))
+        elif isinstance(instance, DataSet) and instance in session.deleted:
+            # Which DOI pointed to the dataset is not known here without loading it, forget them all
+            session.info['doi_resolver_clear'] = True
+
+
+def _watch_doi_bulk_statements(orm_execute_state):
+    if orm_execute_state.is_select or doi_resolver() is None:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.local_table.name in DOI_RESOLVER_TABLES:
+        orm_execute_state.session.info['doi_resolver_clear'] = True
+
+
+def _apply_doi_changes(session):
+    dois = session.info.pop('doi_resolver_changes', None)
+    clear = session.info.pop('doi_resolver_clear', False)
+    resolver = doi_resolver()
+    if resolver is None:
+        return
+    if clear:
+        resolver.clear()
+    elif dois:
+        resolver.invalidate(*dois)
+
+
+def _discard_doi_changes(session):
+    session.info.pop('doi_resolver_changes', None)
+    session.info.pop('doi_resolver_clear', None)
+
+
+def register_doi_resolver(app):
+    resolver = DOIResolver(app.config.get('DOI_CACHE_MAX_ENTRIES', 10000), app.config.get('DOI_CACHE_TIMEOUT', 300),
+                           app.config.get('DOI_CACHE_NEGATIVE_TIMEOUT', 30))
+    app.extensions['doi_resolver'] = resolver
+    registry.register_collector('doi_cache', resolver.collect_metrics)
+
+    session_class = db.session.session_factory.class_
+    for name, listener in (('after_flush', _collect_doi_changes), ('after_commit', _apply_doi_changes),
+                           ('after_rollback', _discard_doi_changes), ('do_orm_execute', _watch_doi_bulk_statements)):
+        if not event.contains(session_class, name, listener):
+            event.listen(session_class, name, listener)
+    return resolver
+
+
 class SizeService():
 
     def __init__(self):
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from app.modules.dataset.api import dataset_serializer
+from app.modules.dataset.models import DataSet
+from app.modules.dataset.repositories import dataset_listing_options
+from app.modules.dataset.services import calculate_checksum_and_size, create_dataset_zip
+
+
+@pytest.fixture
+def datasets(test_client, benchmark_uploads):
+    with test_client.application.test_request_context():
+        yield DataSet.query.options(*dataset_listing_options()).order_by(DataSet.id).limit(20).all()
+
+
+def dataset_dir(uploads_dir, dataset):
+    return os.path.join(uploads_dir, f'user_{dataset.user_id}', f'dataset_{dataset.id}')
+
+
+def test_dataset_to_dict(benchmark, datasets):
+    result = benchmark(lambda: [dataset.to_dict() for dataset in datasets])
+
+    assert len(result) == 20
+
+
+def test_dataset_serializer(benchmark, datasets):
+    result = benchmark(lambda: [dataset_serializer.serialize(dataset) for dataset in datasets])
+
+    assert len(result[0]['files']) == 3
+
+
+def test_calculate_checksum_and_size(benchmark, benchmark_uploads, datasets):
+    directory = dataset_dir(benchmark_uploads, datasets[0])
+    paths = [os.path.join(directory, name) for name in sorted(os.listdir(directory))]
+
+    checksums = benchmark(lambda: [calculate_checksum_and_size(path) for path in paths])
+
+    assert len(checksums) == 3
+
+
+def test_create_dataset_zip(benchmark, benchmark_uploads, datasets, tmp_path):
+    zip_path = str(tmp_path / f'dataset_{datasets[0].id}.zip')
+
+    benchmark(create_dataset_zip, dataset_dir(benchmark_uploads, datasets[0]), zip_path)
+
+    assert os.path.getsize(zip_path) > 0
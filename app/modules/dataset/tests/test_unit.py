@@ -0,0 +1,505 @@
+import os
+import stat
+import time
+from types import SimpleNamespace
+from zipfile import ZipFile
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.sql.compiler import InsertmanyvaluesSentinelOpts
+
+from app import db
+from app.modules.dataset.models import Author, DOIMapping, DataSet, PublicationType
+from app.modules.dataset.repositories import AuthorRepository, DSDownloadRecordRepository, DataSetRepository
+from app.modules.dataset.services import (
+    DATASET_DETAIL_FRAGMENT,
+    DOIResolution,
+    DataSetService,
+    DatasetArchiveCache,
+    build_dataset_archive,
+    calculate_checksum_and_size,
+    dataset_uploads_dir
+)
+from app.modules.featuremodel.models import FeatureModel
+from app.modules.hubfile.models import Hubfile, HubfileConversion
+from core.cache.backends import FileSystemCache, LRUCache, NullCache, create_cache
+from core.repositories.explain import StatementRecorder, explain
+from core.seeders.ScaleSeeder import ScaleSeeder, generate_uvl
+
+
+@pytest.fixture(scope='module')
+def test_client(test_client):
+    """
+    Extends the test_client fixture to add additional specific data for module testing.
+    """
+    with test_client.application.app_context():
+        # Add HERE new elements to the database that you want to exist in the test context.
+        # DO NOT FORGET to use db.session.add(<element>) and db.session.commit() to save the data.
+        pass
+
+    yield test_client
+
+
+@pytest.fixture
+def statements(test_client):
+    """Records the SQL statements sent to the database while the test runs."""
+    recorded = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        recorded.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield recorded
+    event.remove(db.engine, 'before_cursor_execute', record)
+    AuthorRepository().delete_all()
+
+
+def make_form(number_of_models):
+    feature_models = [
+        SimpleNamespace(
+            uvl_filename=SimpleNamespace(data=f'model{i}.uvl'),
+            get_fmmetadata=lambda i=i: {
+                'uvl_filename': f'model{i}.uvl', 'title': f'Model {i}', 'description': 'Description',
+                'publication_type': PublicationType.NONE, 'uvl_version': '1.0'
+            },
+            get_authors=lambda i=i: [{'name': f'FM author {i}', 'affiliation': None, 'orcid': None}]
+        ) for i in range(number_of_models)
+    ]
+    return SimpleNamespace(
+        feature_models=feature_models,
+        get_dsmetadata=lambda: {
+            'title': 'Dataset', 'description': 'Description', 'publication_type': PublicationType.NONE
+        },
+        get_authors=lambda: [{'name': 'Coauthor', 'affiliation': None, 'orcid': None}]
+    )
+
+
+def create_dataset_from_form(tmp_path, number_of_models):
+    for i in range(number_of_models):
+        (tmp_path / f'model{i}.uvl').write_text(f'features\n    Root{i}\n')
+    user = SimpleNamespace(
+        id=1,
+        profile=SimpleNamespace(name='Name', surname='Surname', affiliation='Affiliation', orcid=None),
+        temp_folder=lambda: str(tmp_path)
+    )
+
+    return DataSetService().create_from_form(form=make_form(number_of_models), current_user=user)
+
+
+def test_create_from_form_persists_the_whole_graph(statements, tmp_path):
+    dataset = create_dataset_from_form(tmp_path, 100)
+
+    db.session.expire_all()
+    dataset = db.session.get(DataSet, dataset.id)
+    assert len(dataset.feature_models) == 100
+    assert len(dataset.ds_meta_data.authors) == 2
+    feature_model = dataset.feature_models[42]
+    assert feature_model.fm_meta_data.authors[0].name == f'FM author {feature_model.fm_meta_data.title[6:]}'
+    file = feature_model.files[0]
+    assert (file.checksum, file.size) == calculate_checksum_and_size(str(tmp_path / file.name))
+
+    # The rows whose ids are not needed go in one executemany INSERT per table on every database
+    assert len([s for s in statements if s.startswith('INSERT INTO author')]) == 2
+    assert len([s for s in statements if s.startswith('INSERT INTO file')]) == 1
+
+
+def test_create_from_form_batches_inserts(statements, tmp_path):
+    # MySQL has no RETURNING, and SQLite has no autoincrement sentinel to match the returned ids with the rows
+    # (it reports sorting by parameter order but degrades to one row per INSERT): both insert row by row
+    dialect = db.engine.dialect
+    if not (dialect.insert_executemany_returning_sort_by_parameter_order
+            and dialect.insertmanyvalues_implicit_sentinel & InsertmanyvaluesSentinelOpts.ANY_AUTOINCREMENT):
+        pytest.skip(f"{dialect.name} cannot batch INSERTs that return the ids of the rows in order")
+
+    create_dataset_from_form(tmp_path, 100)
+
+    # One INSERT per table (two for author: dataset and feature model authors)
+    assert len([s for s in statements if s.startswith('INSERT')]) <= 7
+
+
+def test_view_dataset_query_budget(test_client, query_budget, tmp_path):
+    dataset = create_dataset_from_form(tmp_path, 10)
+    dataset.ds_meta_data.dataset_doi = '10.1234/budget'
+    dataset.ds_meta_data.tags = 'tag1, tag2'
+    db.session.commit()
+    # Start from an empty identity map, like a real request
+    db.session.expunge_all()
+
+    # Independent of the number of feature models: their metadata and files are eagerly loaded
+    response = query_budget('/doi/10.1234/budget/', max_queries=16)
+
+    assert response.status_code == 200
+
+
+@pytest.fixture
+def fragment_cache(test_client):
+    """Enables the fragment cache, which the testing config disables, for one test."""
+    manager = test_client.application.extensions['fragment_cache']
+    disabled_cache = manager.cache
+    manager.cache = LRUCache()
+    manager.hits = manager.misses = 0
+    yield manager
+    manager.cache = disabled_cache
+
+
+def publish_dataset(tmp_path, doi, number_of_models=3):
+    dataset = create_dataset_from_form(tmp_path, number_of_models)
+    dataset.ds_meta_data.dataset_doi = doi
+    dataset.ds_meta_data.tags = 'tag1, tag2'
+    db.session.commit()
+    dataset_id, ds_meta_data_id = dataset.id, dataset.ds_meta_data_id
+    db.session.expunge_all()
+    return dataset_id, ds_meta_data_id
+
+
+def get_fresh(test_client, url):
+    response = test_client.get(url)
+    # Start the next request from an empty identity map, like a real one
+    db.session.expunge_all()
+    return response
+
+
+def test_view_dataset_serves_detail_from_fragment_cache(test_client, fragment_cache, tmp_path):
+    publish_dataset(tmp_path, '10.1234/fragment')
+
+    first = get_fresh(test_client, '/doi/10.1234/fragment/')
+    second = get_fresh(test_client, '/doi/10.1234/fragment/')
+
+    assert first.status_code == second.status_code == 200
+    assert (fragment_cache.misses, fragment_cache.hits) == (1, 1)
+    assert b'model2.uvl' in second.data
+    assert second.data == first.data
+    # A hit skips loading the metadata, authors, feature models and files
+    assert int(second.headers['X-Query-Count']) < int(first.headers['X-Query-Count'])
+
+
+def test_export_links_wait_for_pending_conversions(test_client, tmp_path):
+    publish_dataset(tmp_path, '10.1234/exports', number_of_models=2)
+    script = test_client.application.blueprints['flamapy'].script
+
+    response = get_fresh(test_client, '/doi/10.1234/exports/')
+
+    # Glencoe, DIMACS and SPLOT of each model, downloaded by the flamapy script once converted
+    assert response.data.count(b'data-conversion') == 6
+    assert f'/flamapy/scripts.{script.fingerprint}.js'.encode() in response.data
+
+
+def test_file_changes_invalidate_detail_fragment(test_client, fragment_cache, tmp_path):
+    publish_dataset(tmp_path, '10.1234/files')
+    get_fresh(test_client, '/doi/10.1234/files/')
+
+    hubfile = Hubfile.query.filter(Hubfile.name == 'model1.uvl').order_by(Hubfile.id.desc()).first()
+    hubfile.name = 'renamed.uvl'
+    db.session.commit()
+    db.session.expunge_all()
+
+    response = get_fresh(test_client, '/doi/10.1234/files/')
+    assert b'renamed.uvl' in response.data
+    assert fragment_cache.hits == 0
+
+
+def test_update_dsmetadata_invalidates_detail_fragment(test_client, fragment_cache, tmp_path):
+    _, ds_meta_data_id = publish_dataset(tmp_path, '10.1234/metadata')
+    get_fresh(test_client, '/doi/10.1234/metadata/')
+
+    DataSetService().update_dsmetadata(ds_meta_data_id, title='Updated title')
+    db.session.expunge_all()
+
+    response = get_fresh(test_client, '/doi/10.1234/metadata/')
+    assert b'Updated title' in response.data
+    assert fragment_cache.hits == 0
+
+
+def test_rendering_during_an_invalidation_is_not_served(test_client, fragment_cache, tmp_path):
+    dataset_id, _ = publish_dataset(tmp_path, '10.1234/race')
+
+    def context():
+        # Another request invalidates the fragment while this one renders it
+        fragment_cache.invalidate(DATASET_DETAIL_FRAGMENT, dataset_id)
+        return {'dataset': db.session.get(DataSet, dataset_id)}
+
+    with test_client.application.test_request_context():
+        fragment_cache.render(DATASET_DETAIL_FRAGMENT, dataset_id, context)
+        fragment_cache.render(DATASET_DETAIL_FRAGMENT, dataset_id,
+                              lambda: {'dataset': db.session.get(DataSet, dataset_id)})
+
+    assert (fragment_cache.misses, fragment_cache.hits) == (2, 0)
+
+
+def test_fragment_version_follows_template_edits_when_reloading(test_client, fragment_cache, monkeypatch):
+    jinja_env = test_client.application.jinja_env
+    source = ['<p>Old</p>']
+    monkeypatch.setattr(jinja_env.loader, 'get_source', lambda env, name: (source[0], None, None))
+    fragment_cache._versions.clear()
+
+    monkeypatch.setattr(jinja_env, 'auto_reload', False)
+    old_version = fragment_cache.version('edited.html')
+    source[0] = '<p>New</p>'
+    assert fragment_cache.version('edited.html') == old_version
+
+    monkeypatch.setattr(jinja_env, 'auto_reload', True)
+    assert fragment_cache.version('edited.html') != old_version
+    fragment_cache._versions.clear()
+
+
+def test_bulk_statements_invalidate_all_fragments(test_client, fragment_cache, tmp_path):
+    publish_dataset(tmp_path, '10.1234/bulk')
+    get_fresh(test_client, '/doi/10.1234/bulk/')
+    # The fragment and its generation
+    assert len(fragment_cache.cache) == 2
+
+    AuthorRepository().delete_where(Author.name == 'nobody')
+
+    assert len(fragment_cache.cache) == 0
+
+
+@pytest.fixture
+def uploads(test_client, tmp_path, monkeypatch):
+    """An empty archive cache, and uploads under a temporary WORKING_DIR."""
+    app = test_client.application
+    monkeypatch.setenv('WORKING_DIR', str(tmp_path))
+    monkeypatch.setitem(app.extensions, 'dataset_archive_cache', DatasetArchiveCache(str(tmp_path / 'archives')))
+    return tmp_path
+
+
+def upload_dataset(tmp_path, number_of_models=3):
+    """A committed dataset whose models are in its uploads folder, as after move_feature_models."""
+    (tmp_path / 'temp').mkdir(exist_ok=True)
+    dataset = create_dataset_from_form(tmp_path / 'temp', number_of_models)
+    os.makedirs(dataset_uploads_dir(dataset))
+    for file in dataset.files():
+        os.replace(tmp_path / 'temp' / file.name, os.path.join(dataset_uploads_dir(dataset), file.name))
+    dataset_id = dataset.id
+    db.session.expunge_all()
+    return db.session.get(DataSet, dataset_id)
+
+
+def test_dataset_download_is_served_from_the_archive_cache(test_client, uploads):
+    dataset_id = upload_dataset(uploads).id
+    archives = test_client.application.extensions['dataset_archive_cache']
+
+    first = get_fresh(test_client, f'/dataset/download/{dataset_id}')
+    second = get_fresh(test_client, f'/dataset/download/{dataset_id}')
+
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data
+    assert (archives.misses, archives.hits) == (1, 1)
+    with ZipFile(archives.path(dataset_id)) as archive:
+        assert sorted(archive.namelist()) == [f'dataset_{dataset_id}/model{i}.uvl' for i in range(3)]
+
+
+def test_dataset_archive_is_rebuilt_when_its_files_change(test_client, uploads):
+    dataset = upload_dataset(uploads)
+    archives = test_client.application.extensions['dataset_archive_cache']
+    archives.get(dataset)
+
+    # A file written after the archive was built
+    earlier = time.time() - 10
+    os.utime(archives.path(dataset.id), (earlier, earlier))
+    os.utime(os.path.join(dataset_uploads_dir(dataset), 'model1.uvl'))
+    archives.get(dataset)
+
+    assert (archives.misses, archives.hits) == (2, 0)
+    assert archives.is_fresh(dataset)
+
+
+def test_dataset_archive_cache_refuses_a_directory_other_users_can_write(tmp_path):
+    shared = tmp_path / 'archives'
+    shared.mkdir()
+    shared.chmod(0o777)
+
+    with pytest.raises(PermissionError):
+        DatasetArchiveCache(str(shared))
+
+
+def test_dataset_archive_job_reads_the_new_dataset_from_the_primary(test_client, uploads, replica):
+    dataset_id = upload_dataset(uploads).id
+
+    build_dataset_archive(dataset_id)
+
+    assert replica == []
+    assert os.path.exists(test_client.application.extensions['dataset_archive_cache'].path(dataset_id))
+
+
+def test_published_dataset_is_precomputed_in_the_background(test_client, uploads):
+    dataset = upload_dataset(uploads)
+    app = test_client.application
+
+    job = DataSetService().schedule_precompute(dataset)
+    assert DataSetService().schedule_precompute(dataset) is job
+    assert app.extensions['jobs'].join(timeout=60)
+
+    assert job.status == 'done', job.error
+    assert app.extensions['dataset_archive_cache'].is_fresh(dataset)
+    # The ingest hooks ran on every file of the dataset
+    conversions = HubfileConversion.query.filter(HubfileConversion.file_id.in_([f.id for f in dataset.files()]))
+    assert {conversion.status for conversion in conversions} == {HubfileConversion.DONE}
+    assert conversions.count() == 3 * 4
+
+
+@pytest.fixture
+def resolver(test_client):
+    resolver = test_client.application.extensions['doi_resolver']
+    resolver.clear()
+    resolver.cache.hits = resolver.cache.misses = 0
+    yield resolver
+    resolver.clear()
+
+
+def test_doi_page_resolves_in_one_cached_step(test_client, fragment_cache, resolver, tmp_path):
+    dataset_id, _ = publish_dataset(tmp_path, '10.1234/resolved')
+
+    first = get_fresh(test_client, '/doi/10.1234/resolved/')
+    second = get_fresh(test_client, '/doi/10.1234/resolved/')
+
+    assert first.status_code == second.status_code == 200
+    assert resolver.resolve('10.1234/resolved') == DOIResolution(dataset_id=dataset_id)
+    assert (resolver.cache.misses, resolver.cache.hits) == (1, 2)
+    # Loading the dataset by primary key and recording the view
+    assert int(second.headers['X-Query-Count']) <= 3
+
+
+def test_unknown_doi_is_cached_until_published(test_client, resolver, tmp_path):
+    assert test_client.get('/doi/10.1234/later/').status_code == 404
+    assert test_client.get('/doi/10.1234/later/').status_code == 404
+    assert (resolver.cache.misses, resolver.cache.hits) == (1, 1)
+
+    dataset_id, _ = publish_dataset(tmp_path, '10.1234/later')
+
+    assert resolver.resolve('10.1234/later') == DOIResolution(dataset_id=dataset_id)
+
+
+def test_doi_mapping_changes_invalidate_resolutions(test_client, resolver, tmp_path):
+    publish_dataset(tmp_path, '10.1234/new')
+    assert not resolver.resolve('10.1234/old').found
+
+    mapping = DOIMapping(dataset_doi_old='10.1234/old', dataset_doi_new='10.1234/new')
+    db.session.add(mapping)
+    db.session.commit()
+    response = test_client.get('/doi/10.1234/old/')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/doi/10.1234/new/')
+
+    mapping.dataset_doi_new = '10.1234/newer'
+    db.session.commit()
+    assert resolver.resolve('10.1234/old') == DOIResolution(redirect_doi='10.1234/newer')
+
+
+def explain_queries(func):
+    with StatementRecorder([db.engine]) as recorder:
+        func()
+    return [explain(engine, statement, parameters) for engine, statement, parameters in recorder.statements]
+
+
+def test_hot_lookups_use_composite_indexes(test_client, tmp_path):
+    dataset_id, _ = publish_dataset(tmp_path, '10.1234/explained')
+    user_id = db.session.get(DataSet, dataset_id).user_id
+
+    with test_client.application.test_request_context():
+        [record_plan] = explain_queries(lambda: DSDownloadRecordRepository().the_record_exists(dataset_id, 'cookie'))
+        [datasets_plan] = explain_queries(lambda: DataSetRepository().get_synchronized(user_id))
+
+    assert not record_plan.full_scans
+    assert any('ix_ds_download_record_user_id_dataset_id_download_cookie' in step for step in record_plan.steps)
+    assert any('ix_data_set_user_id_created_at' in step for step in datasets_plan.steps)
+
+
+def test_explain_flags_full_scans(test_client):
+    [plan] = explain_queries(lambda: DataSet.query.filter(DataSet.created_at.isnot(None)).all())
+
+    assert plan.full_scans == ['SCAN data_set']
+
+
+def test_lru_cache_evicts_least_recently_used_and_expires():
+    cache = LRUCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+    cache.set('d', 4, timeout=-1)
+    assert cache.get('d') is None
+    assert (cache.hits, cache.misses) == (3, 2)
+
+
+def test_lru_cache_bounds_the_total_size():
+    cache = LRUCache(max_entries=100, max_size=10)
+    cache.set('a', 'a', size=4)
+    cache.set('b', 'b', size=4)
+    cache.set('a', 'a', size=5)
+    assert (cache.size, len(cache)) == (9, 2)
+
+    # Setting 'a' again made 'b' the least recently used
+    cache.set('c', 'c', size=4)
+    assert (cache.get('b'), cache.get('a'), cache.get('c')) == (None, 'a', 'c')
+    assert (cache.size, cache.evictions) == (9, 1)
+
+    cache.set('huge', 'huge', size=11)
+    assert cache.get('huge') is None and cache.size == 9
+
+
+def test_filesystem_cache_is_shared_through_its_directory(tmp_path):
+    writer, reader = FileSystemCache(str(tmp_path)), FileSystemCache(str(tmp_path))
+    writer.set('fragment', '<p>cached</p>')
+    writer.set('expired', 'value', timeout=-1)
+
+    assert reader.get('fragment') == '<p>cached</p>'
+    assert reader.get('expired') is None
+    reader.delete('fragment')
+    assert writer.get('fragment') is None
+
+
+def test_filesystem_cache_refuses_a_directory_other_users_can_write(tmp_path):
+    new_directory = tmp_path / 'new'
+    FileSystemCache(str(new_directory))
+    assert stat.S_IMODE(os.stat(new_directory).st_mode) == 0o700
+
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        FileSystemCache(str(shared))
+
+    link = tmp_path / 'link'
+    link.symlink_to(new_directory)
+    with pytest.raises(PermissionError):
+        FileSystemCache(str(link))
+
+
+def test_create_cache_backends(tmp_path):
+    assert isinstance(create_cache('lru'), LRUCache)
+    assert isinstance(create_cache('filesystem', directory=str(tmp_path)), FileSystemCache)
+    assert isinstance(create_cache('null'), NullCache)
+    with pytest.raises(ValueError):
+        create_cache('redis')
+
+
+def test_generated_uvl_is_parseable(tmp_path):
+    from flamapy.metamodels.fm_metamodel.transformations import UVLReader
+
+    path = tmp_path / 'generated.uvl'
+    path.write_text(generate_uvl(seed=7, number_of_features=40))
+    feature_model = UVLReader(str(path)).transform()
+
+    assert len(feature_model.get_features()) == 40
+    assert len(feature_model.get_constraints()) == 4
+    assert generate_uvl(seed=7, number_of_features=40) == path.read_text()
+
+
+def test_scale_seeder(test_client, tmp_path):
+    datasets_before = DataSet.query.count()
+
+    seeder = ScaleSeeder(4, models=2, features=20, records=8, datasets_per_user=3, processes=2, chunk_size=5,
+                         uploads_dir=str(tmp_path))
+    seeder.run()
+
+    assert DataSet.query.count() == datasets_before + 4
+    assert seeder.counts['user'] == 2
+    assert seeder.counts['ds_view_record'] == 32
+    assert seeder.counts['file_view_record'] == 16
+    dataset = DataSet.query.order_by(DataSet.id.desc()).first()
+    assert dataset.ds_meta_data.dataset_doi and len(dataset.ds_meta_data.authors) == 2
+    hubfile = Hubfile.query.join(FeatureModel).filter(FeatureModel.data_set_id == dataset.id).first()
+    path = tmp_path / f'user_{dataset.user_id}' / f'dataset_{dataset.id}' / hubfile.name
+    assert calculate_checksum_and_size(str(path)) == (hubfile.checksum, hubfile.size)
@@ -1,5 +1,8 @@
 document.addEventListener('DOMContentLoaded', () => {
-    send_query();
+    // The script is also loaded on other pages when the module scripts are bundled
+    if (document.getElementById('results')) {
+        send_query();
+    }
 });
 
 function send_query() {
@@ -158,7 +161,10 @@ function set_publication_type_as_query(publicationType) {
     publicationTypeSelect.dispatchEvent(new Event('input', {bubbles: true}));
 }
 
-document.getElementById('clear-filters').addEventListener('click', clearFilters);
+const clearFiltersButton = document.getElementById('clear-filters');
+if (clearFiltersButton) {
+    clearFiltersButton.addEventListener('click', clearFilters);
+}
 
 function clearFilters() {
 
@@ -185,6 +191,10 @@ function clearFilters() {
 
 document.addEventListener('DOMContentLoaded', () => {
 
+    if (!document.getElementById('query')) {
+        return;
+    }
+
     //let queryInput = document.querySelector('#query');
     //queryInput.dispatchEvent(new Event('input', {bubbles: true}));
 
@@ -202,4 +212,8 @@ document.addEventListener('DOMContentLoaded', () => {
         const queryInput = document.getElementById('query');
         queryInput.dispatchEvent(new Event('input', {bubbles: true}));
     }
-});
\ No newline at end of file
+});
+
+// Called from the result cards
+window.set_tag_as_query = set_tag_as_query;
+window.set_publication_type_as_query = set_publication_type_as_query;
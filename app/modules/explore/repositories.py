@@ -2,7 +2,9 @@ import re
 from sqlalchemy import any_, or_
 import unidecode
 from app.modules.dataset.models import Author, DSMetaData, DataSet, PublicationType
+from app.modules.dataset.repositories import dataset_listing_options
 from app.modules.featuremodel.models import FMMetaData, FeatureModel
+from core.decorators.decorators import read_from_replica
 from core.repositories.BaseRepository import BaseRepository
 
 
@@ -10,6 +12,7 @@ class ExploreRepository(BaseRepository):
     def __init__(self):
         super().__init__(DataSet)
 
+    @read_from_replica
     def filter(self, query="", sorting="newest", publication_type="any", tags=[], **kwargs):
         # Normalize and remove unwanted characters
         normalized_query = unidecode.unidecode(query).lower()
@@ -58,4 +61,4 @@ class ExploreRepository(BaseRepository):
         else:
             datasets = datasets.order_by(self.model.created_at.desc())
 
-        return datasets.all()
+        return datasets.options(*dataset_listing_options()).all()
@@ -0,0 +1,18 @@
+import pytest
+
+from app import db
+from app.modules.explore.repositories import ExploreRepository
+
+
+@pytest.mark.parametrize('criteria', [
+    {'query': ''},
+    {'query': 'network'},
+    {'query': 'network storage', 'sorting': 'oldest'},
+    {'query': '', 'publication_type': 'report'},
+], ids=['all', 'one_word', 'two_words', 'publication_type'])
+def test_explore_filter(benchmark, benchmark_uploads, criteria):
+    # Every round starts from an empty identity map, like a new request
+    datasets = benchmark.pedantic(ExploreRepository().filter, kwargs=criteria, setup=db.session.expunge_all,
+                                  rounds=20, warmup_rounds=2)
+
+    assert datasets
@@ -0,0 +1,78 @@
+import pytest
+
+from app import db
+from app.modules.auth.repositories import UserRepository
+from app.modules.explore.repositories import ExploreRepository
+
+
+@pytest.fixture(scope='module')
+def test_client(test_client, seed_synchronized_datasets):
+    """
+    Extends the test_client fixture to add additional specific data for module testing.
+    """
+    with test_client.application.app_context():
+        # Add HERE new elements to the database that you want to exist in the test context.
+        # DO NOT FORGET to use db.session.add(<element>) and db.session.commit() to save the data.
+        seed_synchronized_datasets(number_of_datasets=5, models_per_dataset=3)
+
+    yield test_client
+
+
+def test_repository_reads_go_to_replica(replica):
+    repository = UserRepository()
+
+    assert repository.count() == 0
+    assert repository.get_by_column('email', 'test@example.com') == []
+    assert repository.get_by_id(1) is None
+    assert len(replica) == 3
+
+
+def test_repository_writes_look_up_rows_on_primary(replica):
+    repository = UserRepository()
+    user_id = repository.create(email='update@example.com', password='test1234').id
+    db.session.expire_all()
+
+    assert repository.update(user_id, email='updated@example.com') is not None
+    assert repository.delete_by_column('email', 'updated@example.com')
+    assert not repository.delete(user_id)
+    assert replica == []
+
+
+def test_explore_filter_goes_to_replica(replica):
+    assert ExploreRepository().filter(query='model') == []
+    assert len(replica) == 1
+
+
+def test_other_queries_go_to_primary(replica):
+    assert UserRepository().get_by_email('test@example.com') is not None
+    assert replica == []
+
+
+def test_reads_stay_on_primary_after_write_in_transaction(replica):
+    repository = UserRepository()
+    repository.create(commit=False, email='pending@example.com', password='test1234')
+
+    assert len(repository.get_by_column('email', 'pending@example.com')) == 1
+    assert replica == []
+    db.session.rollback()
+
+
+def test_reads_stick_to_primary_after_user_commits(test_client, replica):
+    app = test_client.application
+    repository = UserRepository()
+
+    with app.test_request_context():
+        repository.create(email='sticky@example.com', password='test1234')
+        assert len(repository.get_by_column('email', 'sticky@example.com')) == 1
+        assert replica == []
+
+    with app.test_request_context():
+        # Another user, without the sticky marker in their session, reads from the replica again
+        assert repository.get_by_column('email', 'sticky@example.com') == []
+        assert len(replica) == 1
+
+
+def test_explore_query_budget(query_budget):
+    response = query_budget('/explore', max_queries=5, method='POST', json={'query': 'dataset'})
+
+    assert len(response.get_json()) == 5
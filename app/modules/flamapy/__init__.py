@@ -1,3 +1,41 @@
+import os
+import tempfile
+
 from core.blueprints.base_blueprint import BaseBlueprint
 
 flamapy_bp = BaseBlueprint('flamapy', __name__, template_folder='templates')
+
+WARMUP_UVL = """features
+    Root
+        optional
+            A
+            B
+constraints
+    A => B
+"""
+
+
+def warm_uvl_grammar(app):
+    """Imports flamapy and parses a tiny model so the antlr UVL grammar and its DFA caches are built once."""
+    from flamapy.metamodels.fm_metamodel.transformations import UVLReader
+    from flamapy.metamodels.pysat_metamodel.transformations import FmToPysat
+
+    with tempfile.NamedTemporaryFile('w', suffix='.uvl', delete=False) as temp_file:
+        temp_file.write(WARMUP_UVL)
+    try:
+        FmToPysat(UVLReader(temp_file.name).transform()).transform()
+    finally:
+        os.remove(temp_file.name)
+
+
+@flamapy_bp.record_once
+def register_warmup(state):
+    warmup = state.app.extensions.get('warmup')
+    if warmup:
+        warmup.register('uvl_grammar', warm_uvl_grammar)
+
+
+@flamapy_bp.record_once
+def setup_conversions(state):
+    from app.modules.flamapy.services import register_conversions
+    register_conversions(state.app)
@@ -1 +1,49 @@
-console.log("Hi, I am a script from flamapy module ;)")
\ No newline at end of file
+console.log("Hi, I am a script from flamapy module ;)")
+
+// Conversions are made in the background after an upload, so an export link can get a 202 while its conversion
+// is pending: the links marked with data-conversion poll until it is ready and only then download it
+var CONVERSION_POLL_LIMIT = 150;
+
+document.addEventListener('click', function (event) {
+    const link = event.target.closest('a[data-conversion]');
+    if (!link) {
+        return;
+    }
+    event.preventDefault();
+    if (link.dataset.pending !== 'true') {
+        link.dataset.pending = 'true';
+        link.dataset.label = link.dataset.label || link.textContent.trim();
+        waitForConversion(link, 0);
+    }
+});
+
+function waitForConversion(link, attempt) {
+    fetch(link.href, {method: 'HEAD'})
+        .then(response => {
+            if (response.status === 202 && attempt < CONVERSION_POLL_LIMIT) {
+                link.textContent = `${link.dataset.label} (converting...)`;
+                const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 2;
+                setTimeout(() => waitForConversion(link, attempt + 1), retryAfter * 1000);
+                return;
+            }
+            conversionFinished(link);
+            if (response.ok && response.status !== 202) {
+                window.location.href = link.href;
+            } else if (response.status === 202) {
+                alert(`The ${link.dataset.label} conversion is taking too long, please try again later.`);
+            } else {
+                return fetch(link.href)
+                    .then(error => error.json())
+                    .then(data => alert(`The ${link.dataset.label} conversion failed: ${data.error}`));
+            }
+        })
+        .catch(error => {
+            conversionFinished(link);
+            console.error('Error:', error);
+        });
+}
+
+function conversionFinished(link) {
+    link.textContent = link.dataset.label;
+    link.dataset.pending = 'false';
+}
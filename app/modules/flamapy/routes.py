@@ -1,22 +1,42 @@
 import logging
+from app.modules.dataset.services import DataSetService
+from app.modules.flamapy.services import (CONVERSIONS, FeatureModelCache, FlamapyService, conversion_path, model_cache,
+                                          stream_conversions_zip)
+from app.modules.hubfile.models import HubfileConversion
 from app.modules.hubfile.services import HubfileService
-from flask import send_file, jsonify
+from flask import Response, abort, send_file, jsonify
 from app.modules.flamapy import flamapy_bp
-from flamapy.metamodels.fm_metamodel.transformations import UVLReader, GlencoeWriter, SPLOTWriter
-from flamapy.metamodels.pysat_metamodel.transformations import FmToPysat, DimacsWriter
-import tempfile
-import os
+from core.tracing.tracer import trace_span
 
-from antlr4 import CommonTokenStream, FileStream
-from uvl.UVLCustomLexer import UVLCustomLexer
-from uvl.UVLPythonParser import UVLPythonParser
-from antlr4.error.ErrorListener import ErrorListener
+# flamapy, pysat and the antlr UVL parser are imported inside the functions using them so that they are only
+# loaded when a model is actually checked or converted, not at every worker boot.
 
 logger = logging.getLogger(__name__)
 
 
 @flamapy_bp.route('/flamapy/check_uvl/<int:file_id>', methods=['GET'])
 def check_uvl(file_id):
+    from flamapy.core.exceptions import FlamaException
+
+    try:
+        hubfile = HubfileService().get_by_id(file_id)
+        # Models that were already read (at upload, by another check) come from the model cache
+        with trace_span('file', hubfile.get_path()):
+            model_cache().feature_model(hubfile.get_path(), FeatureModelCache.hubfile_key(hubfile))
+        return jsonify({"message": "Valid Model"}), 200
+    except FlamaException as e:
+        return jsonify({"errors": syntax_errors(hubfile.get_path()) or [str(e)]}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def syntax_errors(path):
+    """The syntax errors of the UVL file in `path`, parsed again with a listener once it failed to be read."""
+    from antlr4 import CommonTokenStream, FileStream
+    from antlr4.error.ErrorListener import ErrorListener
+    from uvl.UVLCustomLexer import UVLCustomLexer
+    from uvl.UVLPythonParser import UVLPythonParser
+
     class CustomErrorListener(ErrorListener):
         def __init__(self):
             self.errors = []
@@ -36,82 +56,100 @@ def check_uvl(file_id):
                 )
                 self.errors.append(error_message)
 
-    try:
-        hubfile = HubfileService().get_by_id(file_id)
-        input_stream = FileStream(hubfile.get_path())
-        lexer = UVLCustomLexer(input_stream)
-
-        error_listener = CustomErrorListener()
-
-        lexer.removeErrorListeners()
-        lexer.addErrorListener(error_listener)
-
-        stream = CommonTokenStream(lexer)
-        parser = UVLPythonParser(stream)
+    input_stream = FileStream(path)
+    lexer = UVLCustomLexer(input_stream)
 
-        parser.removeErrorListeners()
-        parser.addErrorListener(error_listener)
+    error_listener = CustomErrorListener()
 
-        # tree = parser.featureModel()
+    lexer.removeErrorListeners()
+    lexer.addErrorListener(error_listener)
 
-        if error_listener.errors:
-            return jsonify({"errors": error_listener.errors}), 400
+    stream = CommonTokenStream(lexer)
+    parser = UVLPythonParser(stream)
 
-        # Optional: Print the parse tree
-        # print(tree.toStringTree(recog=parser))
+    parser.removeErrorListeners()
+    parser.addErrorListener(error_listener)
 
-        return jsonify({"message": "Valid Model"}), 200
-
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    parser.featureModel()
+    return error_listener.errors
 
 
 @flamapy_bp.route('/flamapy/valid/<int:file_id>', methods=['GET'])
 def valid(file_id):
-    return jsonify({"success": True, "file_id": file_id})
+    # Whether the model has at least one configuration, solved on the CNF encoding kept in the model cache
+    from flamapy.metamodels.pysat_metamodel.operations import PySATSatisfiable
+
+    hubfile = HubfileService().get_or_404(file_id)
+    try:
+        cnf = model_cache().cnf(hubfile.get_path(), FeatureModelCache.hubfile_key(hubfile))
+    except Exception as e:
+        return jsonify({"success": False, "file_id": file_id, "error": str(e)}), 400
+    return jsonify({"success": True, "file_id": file_id, "valid": PySATSatisfiable().execute(cnf).get_result()})
 
 
 @flamapy_bp.route('/flamapy/to_glencoe/<int:file_id>', methods=['GET'])
 def to_glencoe(file_id):
-    temp_file = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
-    try:
-        hubfile = HubfileService().get_or_404(file_id)
-        fm = UVLReader(hubfile.get_path()).transform()
-        GlencoeWriter(temp_file.name, fm).transform()
-
-        # Return the file in the response
-        return send_file(temp_file.name, as_attachment=True, download_name=f'{hubfile.name}_glencoe.txt')
-    finally:
-        # Clean up the temporary file
-        os.remove(temp_file.name)
+    return send_conversion(file_id, 'glencoe')
 
 
 @flamapy_bp.route('/flamapy/to_splot/<int:file_id>', methods=['GET'])
 def to_splot(file_id):
-    temp_file = tempfile.NamedTemporaryFile(suffix='.splx', delete=False)
-    try:
-        hubfile = HubfileService().get_by_id(file_id)
-        fm = UVLReader(hubfile.get_path()).transform()
-        SPLOTWriter(temp_file.name, fm).transform()
-
-        # Return the file in the response
-        return send_file(temp_file.name, as_attachment=True, download_name=f'{hubfile.name}_splot.txt')
-    finally:
-        # Clean up the temporary file
-        os.remove(temp_file.name)
+    return send_conversion(file_id, 'splot')
 
 
 @flamapy_bp.route('/flamapy/to_cnf/<int:file_id>', methods=['GET'])
 def to_cnf(file_id):
-    temp_file = tempfile.NamedTemporaryFile(suffix='.cnf', delete=False)
-    try:
-        hubfile = HubfileService().get_by_id(file_id)
-        fm = UVLReader(hubfile.get_path()).transform()
-        sat = FmToPysat(fm).transform()
-        DimacsWriter(temp_file.name, sat).transform()
-
-        # Return the file in the response
-        return send_file(temp_file.name, as_attachment=True, download_name=f'{hubfile.name}_cnf.txt')
-    finally:
-        # Clean up the temporary file
-        os.remove(temp_file.name)
+    return send_conversion(file_id, 'cnf')
+
+
+@flamapy_bp.route('/flamapy/to_uvl/<int:file_id>', methods=['GET'])
+def to_uvl(file_id):
+    return send_conversion(file_id, 'uvl')
+
+
+@flamapy_bp.route('/flamapy/dataset/<int:dataset_id>/to_<format>', methods=['GET'])
+def dataset_to_format(dataset_id, format):
+    # Every model of the dataset in one ZIP, made of the stored conversions: while some are still being made
+    # (in parallel, by the flamapy pool) the client gets a 202 with the progress and polls again
+    if format not in CONVERSIONS:
+        abort(404)
+    dataset = DataSetService().get_or_404(dataset_id)
+    flamapy_service = FlamapyService()
+    pairs = flamapy_service.get_dataset_conversions(dataset, format)
+
+    pending = sum(1 for _, conversion in pairs if conversion is None or conversion.status == HubfileConversion.PENDING)
+    if pending:
+        response = jsonify({"status": HubfileConversion.PENDING, "dataset_id": dataset_id, "format": format,
+                            "done": len(pairs) - pending, "total": len(pairs)})
+        response.status_code = 202
+        response.headers['Retry-After'] = '2'
+        return response
+
+    files = [(conversion_path(hubfile.id, format), flamapy_service.download_name(hubfile, format))
+             for hubfile, conversion in pairs if conversion.status == HubfileConversion.DONE]
+    errors = {hubfile.name: conversion.error for hubfile, conversion in pairs
+              if conversion.status == HubfileConversion.FAILED}
+    if errors and not files:
+        return jsonify({"status": HubfileConversion.FAILED, "errors": errors}), 500
+
+    download_name = flamapy_service.dataset_download_name(dataset, format)
+    return Response(stream_conversions_zip(files, download_name[:-4], errors), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename={download_name}'})
+
+
+def send_conversion(file_id, format):
+    # Conversions are made when the dataset is uploaded (see ingest_conversions), this only sends the stored file
+    hubfile = HubfileService().get_or_404(file_id)
+    flamapy_service = FlamapyService()
+    conversion = flamapy_service.get_conversion(hubfile, format)
+
+    if conversion is None or conversion.status == HubfileConversion.PENDING:
+        response = jsonify({"status": HubfileConversion.PENDING, "file_id": file_id, "format": format})
+        response.status_code = 202
+        response.headers['Retry-After'] = '2'
+        return response
+    if conversion.status == HubfileConversion.FAILED:
+        return jsonify({"status": conversion.status, "error": conversion.error}), 500
+
+    return send_file(conversion_path(file_id, format), as_attachment=True,
+                     download_name=flamapy_service.download_name(hubfile, format))
@@ -1,7 +1,382 @@
-from app.modules.flamapy.repositories import FlamapyRepository
-from core.services.BaseService import BaseService
+import io
+import os
+import pickle
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from zipfile import ZIP_DEFLATED, ZipFile
 
+from flask import current_app
+
+from app.modules.dataset.services import calculate_checksum_and_size, dataset_uploads_dir
+from app.modules.hubfile.models import HubfileConversion
+from app.modules.hubfile.repositories import HubfileConversionRepository, HubfileRepository
+from core.cache.backends import FileSystemCache, LRUCache
+from core.metrics.metrics import CACHE_HITS, CACHE_MISSES, registry
+
+# Extension of the stored file and suffix of the downloaded name of each format produced at ingest
+CONVERSIONS = {
+    'glencoe': ('json', 'glencoe.txt'),
+    'splot': ('splx', 'splot.txt'),
+    'cnf': ('cnf', 'cnf.txt'),
+    'uvl': ('uvl', 'normalized.uvl'),
+}
+
+FLAMAPY_POOL_WORKERS = registry.gauge('uvlhub_flamapy_pool_workers', 'Processes of the flamapy conversion pool.')
+FLAMAPY_POOL_IN_FLIGHT = registry.gauge(
+    'uvlhub_flamapy_pool_tasks_in_flight', 'Models submitted to the flamapy pool and not converted yet.')
+FLAMAPY_POOL_TASKS = registry.counter(
+    'uvlhub_flamapy_pool_tasks_total', 'Models converted by the flamapy pool.', labels=('status',))
+MODEL_CACHE_BYTES = registry.gauge(
+    'uvlhub_feature_model_cache_bytes', 'Pickled size of the parsed models cached in memory.')
+MODEL_CACHE_EVICTIONS = registry.counter(
+    'uvlhub_feature_model_cache_evictions_total', 'Parsed models dropped from memory to stay under the limit.')
+
+# Cache of the current process, set up by register_conversions and by the pool initializer in pool processes
+_model_cache = None
+
+
+def conversions_dir(file_id):
+    working_dir = os.getenv('WORKING_DIR', '')
+    return os.path.join(working_dir, 'uploads', 'conversions', f'file_{file_id}')
+
+
+def conversion_path(file_id, format):
+    return os.path.join(conversions_dir(file_id), f'{format}.{CONVERSIONS[format][0]}')
+
+
+class FeatureModelCache:
+    """
+    Parsed feature models and their CNF encodings, keyed by the checksum and size of the UVL file, so that the
+    same model is parsed once per process however often it is converted or analysed, whichever hubfile it comes
+    from. Entries are kept in an LRU bounded by their pickled size (`max_bytes`) and, with a `directory`, pickled
+    there too so that the other processes of the host (the pool, gunicorn workers) load instead of parsing.
+
+    The cached objects are shared: callers must not modify them.
+    """
+
+    KINDS = ('feature_model', 'cnf')
+
+    def __init__(self, max_bytes, directory=None, max_entries=10000):
+        self.memory = LRUCache(max_entries, max_size=max_bytes)
+        self.disk = FileSystemCache(directory, max_entries) if directory else None
+        self.hits = dict.fromkeys(self.KINDS, 0)
+        self.misses = dict.fromkeys(self.KINDS, 0)
+
+    def feature_model(self, uvl_path, file_key=None):
+        """The parsed model in `uvl_path`; `file_key` saves hashing the file when the caller already knows it."""
+        from flamapy.metamodels.fm_metamodel.transformations import UVLReader
+
+        return self._get('feature_model', file_key or self.file_key(uvl_path),
+                         lambda: UVLReader(uvl_path).transform())
+
+    def cnf(self, uvl_path, file_key=None):
+        """The pysat encoding (PySATModel) of the model in `uvl_path`."""
+        from flamapy.metamodels.fm_metamodel.transformations import UVLReader
+        from flamapy.metamodels.pysat_metamodel.transformations import FmToPysat
+
+        file_key = file_key or self.file_key(uvl_path)
+
+        def encode():
+            fm = self._get('feature_model', file_key, lambda: UVLReader(uvl_path).transform())
+            return FmToPysat(fm).transform()
+        return self._get('cnf', file_key, encode)
+
+    @staticmethod
+    def file_key(uvl_path):
+        checksum, size = calculate_checksum_and_size(uvl_path)
+        return f'{checksum}:{size}'
+
+    @staticmethod
+    def hubfile_key(hubfile):
+        """The key of the file of `hubfile`, from the checksum and size stored at upload instead of the file."""
+        return f'{hubfile.checksum}:{hubfile.size}'
+
+    def _get(self, kind, file_key, build):
+        key = f'{kind}:{file_key}'
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits[kind] += 1
+            return value
+
+        data = self.disk.get(key) if self.disk else None
+        if data is not None:
+            self.hits[kind] += 1
+            value = pickle.loads(data)
+        else:
+            self.misses[kind] += 1
+            value = build()
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            if self.disk:
+                self.disk.set(key, data)
+        self.memory.set(key, value, size=len(data))
+        return value
+
+    def stats(self):
+        return {'pid': os.getpid(), 'hits': dict(self.hits), 'misses': dict(self.misses),
+                'bytes': self.memory.size, 'evictions': self.memory.evictions}
+
+
+def setup_model_cache(max_bytes, directory=None):
+    """Sets up the model cache of the current process; the pool runs it in each of its processes."""
+    global _model_cache
+    _model_cache = FeatureModelCache(max_bytes, directory)
+    return _model_cache
+
+
+def model_cache():
+    return _model_cache if _model_cache is not None else setup_model_cache(64 * 1024 * 1024)
+
+
+def convert_uvl(uvl_path, output_dir, file_key=None):
+    """
+    Pool worker: gets the parsed model from the model cache and writes every format of CONVERSIONS to
+    `output_dir`. Returns, for each format, its checksum and size or the error that prevented writing it, and the
+    stats of the model cache of the process. The file is only hashed when no `file_key` is given.
+    """
+    from flamapy.metamodels.fm_metamodel.transformations import GlencoeWriter, SPLOTWriter, UVLWriter
+    from flamapy.metamodels.pysat_metamodel.transformations import DimacsWriter
+
+    cache = model_cache()
+    file_key = file_key or cache.file_key(uvl_path)
+    writers = {
+        'glencoe': lambda fm, path: GlencoeWriter(path, fm).transform(),
+        'splot': lambda fm, path: SPLOTWriter(path, fm).transform(),
+        'cnf': lambda fm, path: DimacsWriter(path, cache.cnf(uvl_path, file_key)).transform(),
+        'uvl': lambda fm, path: UVLWriter(path, fm).transform(),
+    }
+
+    try:
+        fm = cache.feature_model(uvl_path, file_key)
+    except Exception as e:
+        error = {'error': f"The model could not be read: {e}"}
+        return {'formats': {format: error for format in CONVERSIONS}, 'cache': cache.stats()}
+
+    os.makedirs(output_dir, exist_ok=True)
+    results = {}
+    for format, (extension, _) in CONVERSIONS.items():
+        path = os.path.join(output_dir, f'{format}.{extension}')
+        # Write to a temporary file then rename, so downloads never see a half written conversion
+        fd, temp_path = tempfile.mkstemp(dir=output_dir, prefix='.tmp_')
+        os.close(fd)
+        try:
+            writers[format](fm, temp_path)
+            os.replace(temp_path, path)
+            checksum, size = calculate_checksum_and_size(path)
+            results[format] = {'checksum': checksum, 'size': size}
+        except Exception as e:
+            results[format] = {'error': str(e)}
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return {'formats': results, 'cache': cache.stats()}
+
+
+class FlamapyPool:
+    """
+    Processes converting models with flamapy, which is CPU bound and would hold the GIL of a worker thread. The
+    pool is started on first use in each process (pools do not survive gunicorn's fork).
+    """
+
+    def __init__(self, workers, model_cache_bytes, model_cache_dir=None):
+        self.workers = workers
+        self.model_cache_args = (model_cache_bytes, model_cache_dir)
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        # Latest model cache stats reported by each pool process
+        self.process_cache_stats = {}
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def executor(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=setup_model_cache,
+                                                     initargs=self.model_cache_args)
+                self._pid = os.getpid()
+            return self._executor
+
+    def convert(self, tasks):
+        """
+        Converts the (uvl_path, output_dir, file_key) tasks in parallel and yields (task, results) as they finish.
+        """
+        futures = {self.executor().submit(convert_uvl, *task): task for task in tasks}
+        with self._lock:
+            self.in_flight += len(futures)
+        for future in as_completed(futures):
+            with self._lock:
+                self.in_flight -= 1
+            try:
+                outcome = future.result()
+                results = outcome['formats']
+                self.process_cache_stats[outcome['cache']['pid']] = outcome['cache']
+            except Exception as e:
+                # The worker process died, e.g. killed by the OOM killer on a huge model
+                results = {format: {'error': f"The conversion did not finish: {e}"} for format in CONVERSIONS}
+            with self._lock:
+                if any('error' in result for result in results.values()):
+                    self.failed += 1
+                else:
+                    self.completed += 1
+            yield futures[future], results
+
+    def collect_metrics(self):
+        FLAMAPY_POOL_WORKERS.set(self.workers if self._pid == os.getpid() else 0)
+        FLAMAPY_POOL_IN_FLIGHT.set(self.in_flight)
+        FLAMAPY_POOL_TASKS.set_total(self.completed, status='done')
+        FLAMAPY_POOL_TASKS.set_total(self.failed, status='failed')
+
+        # The model caches of this process and of the pool processes it heard from
+        stats = list(self.process_cache_stats.values())
+        if _model_cache is not None:
+            stats.append(_model_cache.stats())
+        for kind in FeatureModelCache.KINDS:
+            CACHE_HITS.set_total(sum(s['hits'][kind] for s in stats), cache=kind)
+            CACHE_MISSES.set_total(sum(s['misses'][kind] for s in stats), cache=kind)
+        MODEL_CACHE_BYTES.set(sum(s['bytes'] for s in stats))
+        MODEL_CACHE_EVICTIONS.set_total(sum(s['evictions'] for s in stats))
+
+
+def ingest_conversions(file_ids):
+    """Ingest hook: stores every format of CONVERSIONS for the UVL files with the given ids."""
+    hubfiles_and_datasets = HubfileRepository().get_with_datasets(file_ids)
+    hubfiles = [hubfile for hubfile, _ in hubfiles_and_datasets]
+    repository = HubfileConversionRepository()
+    repository.bulk_upsert([
+        {'file_id': hubfile.id, 'format': format, 'status': HubfileConversion.PENDING,
+         'source_checksum': hubfile.checksum, 'checksum': None, 'size': None, 'error': None,
+         'updated_at': datetime.now(timezone.utc)}
+        for hubfile in hubfiles for format in CONVERSIONS
+    ], index_elements=['file_id', 'format'])
+
+    tasks = {(os.path.join(dataset_uploads_dir(dataset), hubfile.name), conversions_dir(hubfile.id),
+              FeatureModelCache.hubfile_key(hubfile)): hubfile
+             for hubfile, dataset in hubfiles_and_datasets}
+    for task, results in current_app.extensions['flamapy_pool'].convert(tasks):
+        hubfile = tasks[task]
+        repository.bulk_upsert([
+            {'file_id': hubfile.id, 'format': format, 'source_checksum': hubfile.checksum,
+             'status': HubfileConversion.FAILED if 'error' in result else HubfileConversion.DONE,
+             'checksum': result.get('checksum'), 'size': result.get('size'), 'error': result.get('error'),
+             'updated_at': datetime.now(timezone.utc)}
+            for format, result in results.items()
+        ], index_elements=['file_id', 'format'])
+
+
+def register_conversions(app):
+    model_cache_args = (app.config.get('FEATURE_MODEL_CACHE_MAX_MB', 256) * 1024 * 1024,
+                        app.config.get('FEATURE_MODEL_CACHE_DIR') or None)
+    setup_model_cache(*model_cache_args)
+    pool = FlamapyPool(app.config.get('FLAMAPY_POOL_WORKERS', 2), *model_cache_args)
+    app.extensions['flamapy_pool'] = pool
+    registry.register_collector('flamapy_pool', pool.collect_metrics)
+
+    ingest = app.extensions.get('ingest')
+    if ingest is not None:
+        ingest.register_hook('flamapy_conversions', ingest_conversions)
+    return pool
+
+
+class FlamapyService:
+    # Works on hubfiles only: the flamapy module has no model of its own
+
+    def __init__(self):
+        self.conversion_repository = HubfileConversionRepository()
+        self.hubfile_repository = HubfileRepository()
+
+    def get_conversion(self, hubfile, format):
+        """
+        The stored `format` of `hubfile`, or None when it still has to be made. Missing, stale (made from other
+        file contents) and abandoned conversions are ingested again.
+        """
+        conversion = self.conversion_repository.get_conversion(hubfile.id, format)
+        conversion, needs_ingest = self._check(hubfile, conversion, format)
+        if needs_ingest:
+            self.schedule_conversions(hubfile)
+        return conversion
+
+    def get_dataset_conversions(self, dataset, format):
+        """
+        (hubfile, conversion) pairs of every file of `dataset`, with the same rules as `get_conversion`, looked up
+        in one query. The files whose conversion has to be made again are ingested together.
+        """
+        hubfiles = self.hubfile_repository.get_by_dataset(dataset.id)
+        conversions = {conversion.file_id: conversion for conversion in
+                       self.conversion_repository.get_conversions([hubfile.id for hubfile in hubfiles], format)}
+
+        pairs, to_ingest = [], []
+        for hubfile in hubfiles:
+            conversion, needs_ingest = self._check(hubfile, conversions.get(hubfile.id), format)
+            pairs.append((hubfile, conversion))
+            if needs_ingest:
+                to_ingest.append(hubfile.id)
+
+        ingest = current_app.extensions.get('ingest')
+        if to_ingest and ingest is not None:
+            ingest.ingest(to_ingest, key=f'ingest:dataset:{dataset.id}')
+        return pairs
+
+    @staticmethod
+    def _check(hubfile, conversion, format):
+        """(`conversion`, or None if it cannot be used, and whether it has to be ingested again)."""
+        if conversion is None or conversion.source_checksum != hubfile.checksum:
+            return None, True
+        if conversion.status == HubfileConversion.PENDING:
+            pending_timeout = timedelta(seconds=current_app.config.get('CONVERSION_PENDING_TIMEOUT', 300))
+            updated_at = conversion.updated_at.replace(tzinfo=conversion.updated_at.tzinfo or timezone.utc)
+            return conversion, datetime.now(timezone.utc) - updated_at > pending_timeout
+        if conversion.status == HubfileConversion.DONE and not os.path.exists(conversion_path(hubfile.id, format)):
+            return None, True
+        return conversion, False
+
+    def schedule_conversions(self, hubfile):
+        ingest = current_app.extensions.get('ingest')
+        if ingest is not None:
+            return ingest.ingest([hubfile.id], key=f'ingest:file:{hubfile.id}')
+
+    @staticmethod
+    def download_name(hubfile, format):
+        return f'{hubfile.name}_{CONVERSIONS[format][1]}'
+
+    @staticmethod
+    def dataset_download_name(dataset, format):
+        return f'dataset_{dataset.id}_{format}.zip'
+
+
+class _ZipStream(io.RawIOBase):
+    """Unseekable file collecting what ZipFile writes, so that the archive can be sent while it is written."""
 
-class FlamapyService(BaseService):
     def __init__(self):
-        super().__init__(FlamapyRepository())
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_conversions_zip(files, folder, errors=None):
+    """
+    Yields a ZIP archive of `files`, (path, name in the archive) pairs, inside `folder`, one file at a time, so
+    that neither the archive nor the request waits for all of them. `errors`, {name: error}, are listed in an
+    errors.txt of the archive.
+    """
+    stream = _ZipStream()
+    with ZipFile(stream, 'w', ZIP_DEFLATED) as zipf:
+        for path, name in files:
+            zipf.write(path, arcname=os.path.join(folder, name))
+            yield stream.take()
+        if errors:
+            zipf.writestr(os.path.join(folder, 'errors.txt'),
+                          ''.join(f'{name}: {error}\n' for name, error in errors.items()))
+    yield stream.take()
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from core.seeders.ScaleSeeder import generate_uvl
+
+UVL_EXAMPLES = os.path.join(os.path.dirname(__file__), '..', '..', 'dataset', 'uvl_examples')
+
+
+@pytest.fixture(scope='module', params=['small', 'large'])
+def uvl_path(request, tmp_path_factory):
+    """A model shipped with the repo and a generated one of 300 features and 30 constraints."""
+    if request.param == 'small':
+        return os.path.join(UVL_EXAMPLES, 'file1.uvl')
+    path = tmp_path_factory.mktemp('uvl') / 'large.uvl'
+    path.write_text(generate_uvl(seed=1, number_of_features=300))
+    return str(path)
+
+
+def test_uvl_parsing(benchmark, uvl_path):
+    from flamapy.metamodels.fm_metamodel.transformations import UVLReader
+
+    feature_model = benchmark(lambda: UVLReader(uvl_path).transform())
+
+    assert feature_model.root is not None
+
+
+@pytest.mark.parametrize('conversion', ['glencoe', 'splot', 'cnf'])
+def test_conversion(benchmark, uvl_path, conversion, tmp_path):
+    from flamapy.metamodels.fm_metamodel.transformations import GlencoeWriter, SPLOTWriter, UVLReader
+    from flamapy.metamodels.pysat_metamodel.transformations import DimacsWriter, FmToPysat
+
+    output = str(tmp_path / f'model.{conversion}')
+    feature_model = UVLReader(uvl_path).transform()
+
+    def convert():
+        if conversion == 'glencoe':
+            GlencoeWriter(output, feature_model).transform()
+        elif conversion == 'splot':
+            SPLOTWriter(output, feature_model).transform()
+        else:
+            DimacsWriter(output, FmToPysat(feature_model).transform()).transform()
+
+    benchmark(convert)
+
+    assert os.path.getsize(output) > 0
@@ -1,5 +1,31 @@
+import io
+import os
+import re
+from zipfile import ZipFile
+
 import pytest
 
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.models import DSMetaData, DataSet, PublicationType
+from app.modules.dataset.services import calculate_checksum_and_size, dataset_uploads_dir
+from app.modules.featuremodel.models import FeatureModel, FMMetaData
+from app.modules.flamapy.services import CONVERSIONS, FeatureModelCache, conversion_path, convert_uvl
+from app.modules.hubfile.models import Hubfile, HubfileConversion
+
+MODEL = """features
+    Chat
+        mandatory
+            Connection
+                alternative
+                    "Peer 2 Peer"
+                    Server
+        optional
+            "Data Storage"
+constraints
+    Server => "Data Storage"
+"""
+
 
 @pytest.fixture(scope='module')
 def test_client(test_client):
@@ -22,3 +48,219 @@ def test_sample_assertion(test_client):
     """
     greeting = "Hello, World!"
     assert greeting == "Hello, World!", "The greeting does not coincide with 'Hello, World!'"
+
+
+@pytest.fixture
+def uploaded_dataset(test_client, tmp_path, monkeypatch):
+    """
+    Returns a function storing UVL files ({name: content}) in a new dataset under a temporary WORKING_DIR, as an
+    upload does, and returning the dataset.
+    """
+    monkeypatch.setenv('WORKING_DIR', str(tmp_path))
+
+    def upload(models):
+        ds_meta_data = DSMetaData(title='Models', description='Models', publication_type=PublicationType.NONE)
+        dataset = DataSet(user_id=User.query.first().id, ds_meta_data=ds_meta_data)
+        db.session.add(dataset)
+        db.session.flush()
+        os.makedirs(dataset_uploads_dir(dataset))
+        for name, content in models.items():
+            path = os.path.join(dataset_uploads_dir(dataset), name)
+            with open(path, 'w') as f:
+                f.write(content)
+            checksum, size = calculate_checksum_and_size(path)
+            fm_meta_data = FMMetaData(uvl_filename=name, title=name, description=name,
+                                      publication_type=PublicationType.NONE)
+            hubfile = Hubfile(name=name, checksum=checksum, size=size)
+            dataset.feature_models.append(FeatureModel(fm_meta_data=fm_meta_data, files=[hubfile]))
+        db.session.commit()
+        return dataset
+
+    return upload
+
+
+@pytest.fixture
+def uploaded_file(uploaded_dataset):
+    """Returns a function storing a UVL file in a new dataset and returning the id of its hubfile."""
+
+    def upload(content):
+        return uploaded_dataset({'model.uvl': content}).files()[0].id
+
+    return upload
+
+
+def test_conversions_are_made_at_ingest(test_client, uploaded_file):
+    file_id = uploaded_file(MODEL)
+
+    test_client.application.extensions['ingest'].run_hooks([file_id])
+
+    conversions = {c.format: c for c in HubfileConversion.query.filter_by(file_id=file_id)}
+    assert set(conversions) == set(CONVERSIONS)
+    for format, conversion in conversions.items():
+        assert conversion.status == HubfileConversion.DONE
+        assert (conversion.checksum, conversion.size) == calculate_checksum_and_size(conversion_path(file_id, format))
+
+    response = test_client.get(f'/flamapy/to_cnf/{file_id}')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'].endswith('model.uvl_cnf.txt')
+    assert b'p cnf' in response.data
+    normalized = test_client.get(f'/flamapy/to_uvl/{file_id}').get_data(as_text=True)
+    assert 'Server => "Data Storage"' in normalized
+
+
+def test_exports_report_pending_until_converted(test_client, uploaded_file):
+    file_id = uploaded_file(MODEL)
+    jobs = test_client.application.extensions['jobs']
+
+    response = test_client.get(f'/flamapy/to_splot/{file_id}')
+    assert response.status_code == 202
+    assert response.get_json() == {'status': 'pending', 'file_id': file_id, 'format': 'splot'}
+    # What the export links of the dataset page poll
+    assert test_client.head(f'/flamapy/to_splot/{file_id}').status_code == 202
+
+    assert jobs.join(timeout=60)
+    assert test_client.head(f'/flamapy/to_splot/{file_id}').status_code == 200
+    assert test_client.get(f'/flamapy/to_splot/{file_id}').status_code == 200
+
+
+def test_failed_conversions_report_their_error(test_client, uploaded_file):
+    file_id = uploaded_file('features\n    Root\n        optional\n            "Unclosed\n')
+
+    test_client.application.extensions['ingest'].run_hooks([file_id])
+
+    response = test_client.get(f'/flamapy/to_glencoe/{file_id}')
+    assert response.status_code == 500
+    assert response.get_json()['status'] == HubfileConversion.FAILED
+
+
+def test_checks_read_the_model_through_the_model_cache(test_client, uploaded_file, monkeypatch):
+    cache = FeatureModelCache(max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr('app.modules.flamapy.routes.model_cache', lambda: cache)
+    monkeypatch.setattr(FeatureModelCache, 'file_key', staticmethod(lambda uvl_path: pytest.fail('hashed')))
+    file_id = uploaded_file(MODEL)
+
+    assert test_client.get(f'/flamapy/check_uvl/{file_id}').get_json() == {'message': 'Valid Model'}
+    response = test_client.get(f'/flamapy/valid/{file_id}')
+    assert response.get_json() == {'success': True, 'file_id': file_id, 'valid': True}
+    assert test_client.get(f'/flamapy/valid/{file_id}').get_json()['valid']
+    assert cache.misses == {'feature_model': 1, 'cnf': 1}
+    assert cache.hits == {'feature_model': 1, 'cnf': 1}
+
+
+def test_checks_report_unreadable_models(test_client, uploaded_file):
+    file_id = uploaded_file('features\n    Root\n        optional\n            "Unclosed\n')
+
+    response = test_client.get(f'/flamapy/check_uvl/{file_id}')
+    assert response.status_code == 400
+    assert response.get_json()['errors'][0].startswith('The UVL has the following error')
+    response = test_client.get(f'/flamapy/valid/{file_id}')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_conversions_hash_each_model_once(tmp_path, monkeypatch):
+    (tmp_path / 'model.uvl').write_text(MODEL)
+    cache = FeatureModelCache(max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr('app.modules.flamapy.services._model_cache', cache)
+    hashed = []
+    file_key = FeatureModelCache.file_key
+    monkeypatch.setattr(FeatureModelCache, 'file_key', staticmethod(lambda path: hashed.append(path) or file_key(path)))
+
+    outcome = convert_uvl(str(tmp_path / 'model.uvl'), str(tmp_path / 'out'))
+
+    assert not any('error' in result for result in outcome['formats'].values())
+    assert hashed == [str(tmp_path / 'model.uvl')]
+
+
+def test_feature_model_cache_parses_each_model_once(tmp_path):
+    for name in ('a.uvl', 'copy.uvl'):
+        (tmp_path / name).write_text(MODEL)
+    cache = FeatureModelCache(max_bytes=10 * 1024 * 1024)
+
+    fm = cache.feature_model(str(tmp_path / 'a.uvl'))
+    cnf = cache.cnf(str(tmp_path / 'a.uvl'))
+
+    # Keyed by contents, so another file with the same model is a hit
+    assert cache.feature_model(str(tmp_path / 'copy.uvl')) is fm
+    assert cache.cnf(str(tmp_path / 'copy.uvl')) is cnf
+    assert cache.misses == {'feature_model': 1, 'cnf': 1}
+    assert cache.hits == {'feature_model': 2, 'cnf': 1}
+    assert cache.memory.size > 0
+
+
+def test_feature_model_cache_is_shared_through_its_directory(tmp_path):
+    (tmp_path / 'model.uvl').write_text(MODEL)
+    writer = FeatureModelCache(max_bytes=10 * 1024 * 1024, directory=str(tmp_path / 'pickles'))
+    reader = FeatureModelCache(max_bytes=10 * 1024 * 1024, directory=str(tmp_path / 'pickles'))
+
+    fm = writer.feature_model(str(tmp_path / 'model.uvl'))
+    loaded = reader.feature_model(str(tmp_path / 'model.uvl'))
+
+    assert loaded is not fm
+    assert [feature.name for feature in loaded.get_features()] == [feature.name for feature in fm.get_features()]
+    assert (reader.hits['feature_model'], reader.misses['feature_model']) == (1, 0)
+
+
+def test_feature_model_cache_is_bounded_by_size(tmp_path):
+    (tmp_path / 'small.uvl').write_text('features\n    Root\n')
+    (tmp_path / 'model.uvl').write_text(MODEL)
+    probe = FeatureModelCache(max_bytes=1024 * 1024)
+    probe.feature_model(str(tmp_path / 'model.uvl'))
+    # Room for the bigger model, not for both
+    max_bytes = probe.memory.size + 1
+    cache = FeatureModelCache(max_bytes=max_bytes)
+
+    cache.feature_model(str(tmp_path / 'small.uvl'))
+    cache.feature_model(str(tmp_path / 'model.uvl'))
+
+    assert cache.memory.size <= max_bytes
+    assert cache.memory.evictions == 1
+
+
+def test_model_cache_hit_rates_are_exported(test_client, uploaded_file):
+    first, second = uploaded_file(MODEL), uploaded_file(MODEL)
+
+    test_client.application.extensions['ingest'].run_hooks([first])
+    test_client.application.extensions['ingest'].run_hooks([second])
+
+    metrics = test_client.get('/metrics').get_data(as_text=True)
+    hits = re.search(r'^uvlhub_cache_hits_total\{cache="feature_model"\} (\S+)$', metrics, re.MULTILINE)
+    assert float(hits.group(1)) >= 1
+    assert re.search(r'^uvlhub_feature_model_cache_bytes \d', metrics, re.MULTILINE)
+
+
+def test_dataset_conversions_are_zipped_once_all_are_made(test_client, uploaded_dataset):
+    dataset = uploaded_dataset({f'model_{number}.uvl': MODEL for number in range(3)})
+    dataset_id = dataset.id
+    jobs = test_client.application.extensions['jobs']
+
+    response = test_client.get(f'/flamapy/dataset/{dataset_id}/to_cnf')
+    assert response.status_code == 202
+    assert response.get_json() == {'status': 'pending', 'dataset_id': dataset_id, 'format': 'cnf',
+                                   'done': 0, 'total': 3}
+
+    assert jobs.join(timeout=60)
+    response = test_client.get(f'/flamapy/dataset/{dataset_id}/to_cnf')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.headers['Content-Disposition'].endswith(f'dataset_{dataset_id}_cnf.zip')
+    with ZipFile(io.BytesIO(response.data)) as zipf:
+        assert sorted(zipf.namelist()) == [f'dataset_{dataset_id}_cnf/model_{number}.uvl_cnf.txt'
+                                           for number in range(3)]
+        assert b'p cnf' in zipf.read(f'dataset_{dataset_id}_cnf/model_0.uvl_cnf.txt')
+
+
+def test_dataset_conversions_list_the_models_that_failed(test_client, uploaded_dataset):
+    broken = 'features\n    Root\n        optional\n            "Unclosed\n'
+    dataset = uploaded_dataset({'model.uvl': MODEL, 'broken.uvl': broken})
+    dataset_id = dataset.id
+    test_client.application.extensions['ingest'].run_hooks([hubfile.id for hubfile in dataset.files()])
+
+    response = test_client.get(f'/flamapy/dataset/{dataset_id}/to_splot')
+    assert response.status_code == 200
+    with ZipFile(io.BytesIO(response.data)) as zipf:
+        assert sorted(zipf.namelist()) == [f'dataset_{dataset_id}_splot/errors.txt',
+                                           f'dataset_{dataset_id}_splot/model.uvl_splot.txt']
+        assert zipf.read(f'dataset_{dataset_id}_splot/errors.txt').startswith(b'broken.uvl: ')
+
+    assert test_client.get(f'/flamapy/dataset/{dataset_id}/to_pdf').status_code == 404
@@ -12,6 +12,7 @@ class Hubfile(db.Model):
     checksum = db.Column(db.String(120), nullable=False)
     size = db.Column(db.Integer, nullable=False)
     feature_model_id = db.Column(db.Integer, db.ForeignKey('feature_model.id'), nullable=False)
+    conversions = db.relationship('HubfileConversion', backref='file', lazy=True, cascade="all, delete")
 
     def get_formatted_size(self):
         from app.modules.dataset.services import SizeService
@@ -43,6 +44,32 @@ class Hubfile(db.Model):
         return f'File<{self.id}>'
 
 
+class HubfileConversion(db.Model):
+    """A file derived from a hubfile at ingest (a flamapy export, the normalized UVL...), with its own checksum."""
+    __tablename__ = 'file_conversion'
+
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('file.id'), nullable=False)
+    format = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=PENDING)
+    # Checksum of the hubfile it was made from, a different one means the conversion is stale
+    source_checksum = db.Column(db.String(120), nullable=False)
+    checksum = db.Column(db.String(120))
+    size = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (db.UniqueConstraint('file_id', 'format', name='uq_file_conversion_file_id_format'),)
+
+    def __repr__(self):
+        return f'FileConversion<{self.file_id}, {self.format}, {self.status}>'
+
+
 class HubfileViewRecord(db.Model):
     __tablename__ = 'file_view_record'
     id = db.Column(db.Integer, primary_key=True)
@@ -51,6 +78,9 @@ class HubfileViewRecord(db.Model):
     view_date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     view_cookie = db.Column(db.String(36))
 
+    __table_args__ = (db.Index('ix_file_view_record_user_id_file_id_view_cookie',
+                               'user_id', 'file_id', 'view_cookie'),)
+
     def __repr__(self):
         return '<FileViewRecord {}>'.format(self.id)
 
@@ -63,6 +93,9 @@ class HubfileDownloadRecord(db.Model):
     download_date = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     download_cookie = db.Column(db.String(36), nullable=False)
 
+    __table_args__ = (db.Index('ix_file_download_record_user_id_file_id_download_cookie',
+                               'user_id', 'file_id', 'download_cookie'),)
+
     def __repr__(self):
         return (
             f'<FileDownload id={self.id} '
@@ -1,8 +1,9 @@
+from flask_login import current_user
 from sqlalchemy import func
 from app.modules.auth.models import User
 from app.modules.dataset.models import DataSet
 from app.modules.featuremodel.models import FeatureModel
-from app.modules.hubfile.models import Hubfile, HubfileDownloadRecord, HubfileViewRecord
+from app.modules.hubfile.models import Hubfile, HubfileConversion, HubfileDownloadRecord, HubfileViewRecord
 from core.repositories.BaseRepository import BaseRepository
 from app import db
 
@@ -24,6 +25,26 @@ class HubfileRepository(BaseRepository):
     def get_dataset_by_hubfile(self, hubfile: Hubfile) -> DataSet:
         return db.session.query(DataSet).join(FeatureModel).join(Hubfile).filter(Hubfile.id == hubfile.id).first()
 
+    def get_with_datasets(self, ids) -> list:
+        """(hubfile, dataset) pairs of the given hubfile ids, in one query."""
+        return (
+            db.session.query(Hubfile, DataSet)
+            .join(FeatureModel, Hubfile.feature_model_id == FeatureModel.id)
+            .join(DataSet, FeatureModel.data_set_id == DataSet.id)
+            .filter(Hubfile.id.in_(set(ids)))
+            .order_by(Hubfile.id)
+            .all()
+        )
+
+    def get_by_dataset(self, dataset_id: int) -> list:
+        return (
+            db.session.query(Hubfile)
+            .join(FeatureModel, Hubfile.feature_model_id == FeatureModel.id)
+            .filter(FeatureModel.data_set_id == dataset_id)
+            .order_by(Hubfile.id)
+            .all()
+        )
+
 
 class HubfileViewRecordRepository(BaseRepository):
     def __init__(self):
@@ -33,6 +54,13 @@ class HubfileViewRecordRepository(BaseRepository):
         max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
         return max_id if max_id is not None else 0
 
+    def the_record_exists(self, file_id: int, user_cookie: str):
+        return self.model.query.filter_by(
+            user_id=current_user.id if current_user.is_authenticated else None,
+            file_id=file_id,
+            view_cookie=user_cookie
+        ).first()
+
 
 class HubfileDownloadRecordRepository(BaseRepository):
     def __init__(self):
@@ -41,3 +69,23 @@ class HubfileDownloadRecordRepository(BaseRepository):
     def total_hubfile_downloads(self) -> int:
         max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
         return max_id if max_id is not None else 0
+
+    def the_record_exists(self, file_id: int, user_cookie: str):
+        return self.model.query.filter_by(
+            user_id=current_user.id if current_user.is_authenticated else None,
+            file_id=file_id,
+            download_cookie=user_cookie
+        ).first()
+
+
+class HubfileConversionRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(HubfileConversion)
+
+    def get_conversion(self, file_id: int, format: str):
+        return self.model.query.filter_by(file_id=file_id, format=format).first()
+
+    def get_conversions(self, file_ids, format: str) -> list:
+        if not file_ids:
+            return []
+        return self.model.query.filter(self.model.file_id.in_(set(file_ids)), self.model.format == format).all()
@@ -4,10 +4,11 @@ import uuid
 from flask import current_app, jsonify, make_response, request, send_from_directory
 from flask_login import current_user
 from app.modules.hubfile import hubfile_bp
-from app.modules.hubfile.models import HubfileDownloadRecord, HubfileViewRecord
+from app.modules.hubfile.models import HubfileViewRecord
 from app.modules.hubfile.services import HubfileDownloadRecordService, HubfileService
 
 from app import db
+from core.tracing.tracer import trace_span
 
 
 @hubfile_bp.route("/file/download/<int:file_id>", methods=["GET"])
@@ -25,11 +26,7 @@ def download_file(file_id):
         user_cookie = str(uuid.uuid4())
 
     # Check if the download record already exists for this cookie
-    existing_record = HubfileDownloadRecord.query.filter_by(
-        user_id=current_user.id if current_user.is_authenticated else None,
-        file_id=file_id,
-        download_cookie=user_cookie
-    ).first()
+    existing_record = HubfileDownloadRecordService().the_record_exists(file_id, user_cookie)
 
     if not existing_record:
         # Record the download in your database
@@ -60,7 +57,7 @@ def view_file(file_id):
 
     try:
         if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
+            with trace_span('file', file_path), open(file_path, 'r') as f:
                 content = f.read()
 
             user_cookie = request.cookies.get('view_cookie')
@@ -68,11 +65,7 @@ def view_file(file_id):
                 user_cookie = str(uuid.uuid4())
 
             # Check if the view record already exists for this cookie
-            existing_record = HubfileViewRecord.query.filter_by(
-                user_id=current_user.id if current_user.is_authenticated else None,
-                file_id=file_id,
-                view_cookie=user_cookie
-            ).first()
+            existing_record = HubfileService().view_record_exists(file_id, user_cookie)
 
             if not existing_record:
                 # Register file view
@@ -43,7 +43,13 @@ class HubfileService(BaseService):
         hubfile_download_record_repository = HubfileDownloadRecordRepository()
         return hubfile_download_record_repository.total_hubfile_downloads()
 
+    def view_record_exists(self, file_id: int, user_cookie: str):
+        return self.hubfile_view_record_repository.the_record_exists(file_id, user_cookie)
+
 
 class HubfileDownloadRecordService(BaseService):
     def __init__(self):
         super().__init__(HubfileDownloadRecordRepository())
+
+    def the_record_exists(self, file_id: int, user_cookie: str):
+        return self.repository.the_record_exists(file_id, user_cookie)
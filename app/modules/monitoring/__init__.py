@@ -0,0 +1,3 @@
+from core.blueprints.base_blueprint import BaseBlueprint
+
+monitoring_bp = BaseBlueprint('monitoring', __name__)
@@ -0,0 +1 @@
+console.log("Hi, I am a script loaded from monitoring module");
\ No newline at end of file
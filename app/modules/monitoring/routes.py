@@ -0,0 +1,43 @@
+from flask import Response, abort, current_app, jsonify, request
+
+from app.modules.monitoring import monitoring_bp
+from app.modules.monitoring.services import MonitoringService
+
+
+@monitoring_bp.before_request
+def check_token():
+    token = current_app.config.get('MONITORING_TOKEN')
+    if token:
+        if request.headers.get('Authorization') != f"Bearer {token}":
+            abort(403, description="Unauthorized")
+    elif not (current_app.debug or current_app.testing):
+        # Without a token the endpoints are only exposed in development and testing
+        abort(403, description="Unauthorized")
+
+
+@monitoring_bp.route('/monitoring/pool', methods=['GET'])
+def pool():
+    service = MonitoringService()
+    return jsonify(service.get_pool_stats())
+
+
+@monitoring_bp.route('/metrics', methods=['GET'])
+def metrics():
+    service = MonitoringService()
+    return Response(service.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@monitoring_bp.route('/monitoring/jobs', methods=['GET'])
+def jobs():
+    service = MonitoringService()
+    return jsonify(service.get_jobs())
+
+
+@monitoring_bp.route('/monitoring/jobs/<job_id>', methods=['GET'])
+def job(job_id):
+    service = MonitoringService()
+    job = service.get_job(job_id)
+    if job is None:
+        # Jobs are kept by the worker process that queued them, another worker may know this one
+        abort(404, description="Unknown job in this worker process")
+    return jsonify(job)
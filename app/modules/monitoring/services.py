@@ -0,0 +1,25 @@
+from flask import current_app
+
+
+class MonitoringService:
+
+    def get_pool_stats(self):
+        return current_app.extensions['database'].pool_stats()
+
+    def render_metrics(self):
+        return current_app.extensions['metrics'].render()
+
+    def get_jobs(self):
+        """
+        Queue stats and the most recent background jobs of this process (its pid is in the stats), newest first. The
+        other gunicorn workers have their own jobs, not listed here.
+        """
+        jobs = current_app.extensions.get('jobs')
+        if jobs is None:
+            return {'enabled': False, 'jobs': []}
+        return {'enabled': True, **jobs.stats(), 'jobs': [job.to_dict() for job in jobs.recent()]}
+
+    def get_job(self, job_id):
+        jobs = current_app.extensions.get('jobs')
+        job = jobs.get(job_id) if jobs is not None else None
+        return job.to_dict() if job is not None else None
@@ -0,0 +1,64 @@
+import os
+
+from locust import HttpUser, TaskSet, between, events, task
+from core.environment.host import get_host_for_locust_testing
+
+MONITORING_TOKEN = os.getenv('MONITORING_TOKEN')
+
+pool_peaks = {}
+
+
+class DatabaseHeavyBehavior(TaskSet):
+    """Concurrent DB-bound reads to size the engine pool: run with more users than pool_size + max_overflow."""
+
+    @task(3)
+    def index(self):
+        self.client.get("/")
+
+    @task(2)
+    def explore(self):
+        self.client.post("/explore", json={"query": "", "sorting": "newest", "publication_type": "any", "tags": []},
+                         name="/explore [POST]")
+
+    @task(1)
+    def hubfile(self):
+        self.client.get("/hubfile")
+
+
+class PoolMonitorBehavior(TaskSet):
+
+    @task
+    def pool(self):
+        headers = {'Authorization': f"Bearer {MONITORING_TOKEN}"} if MONITORING_TOKEN else {}
+        response = self.client.get("/monitoring/pool", headers=headers)
+        if response.status_code != 200:
+            print(f"Pool stats failed: {response.status_code}")
+            return
+
+        for bind, stats in response.json().items():
+            peaks = pool_peaks.setdefault(bind, {})
+            for key in ('checked_out', 'overflow', 'timeouts', 'wait_seconds_max'):
+                peaks[key] = max(peaks.get(key, 0), stats.get(key, 0))
+
+
+class DatabaseHeavyUser(HttpUser):
+    tasks = [DatabaseHeavyBehavior]
+    wait_time = between(0.1, 0.5)
+    weight = 20
+    host = get_host_for_locust_testing()
+
+
+class PoolMonitorUser(HttpUser):
+    tasks = [PoolMonitorBehavior]
+    wait_time = between(1, 2)
+    weight = 1
+    fixed_count = 1
+    host = get_host_for_locust_testing()
+
+
+@events.quitting.add_listener
+def print_pool_peaks(environment, **kwargs):
+    # Peaks are per gunicorn worker (each has its own pool); timeouts or a max wait near pool_timeout mean the
+    # pool is too small for the configured threads
+    for bind, peaks in pool_peaks.items():
+        print(f"Pool '{bind}' peaks: {peaks}")
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from app import db
+from app.modules.auth.models import User
+from core.managers.job_manager import Job
+
+
+@pytest.fixture(scope='module')
+def test_client(test_client):
+    """
+    Extends the test_client fixture to add additional specific data for module testing.
+    """
+    with test_client.application.app_context():
+        # Add HERE new elements to the database that you want to exist in the test context.
+        # DO NOT FORGET to use db.session.add(<element>) and db.session.commit() to save the data.
+        pass
+
+    yield test_client
+
+
+def test_pool_stats_report_default_engine(test_client):
+    response = test_client.get('/monitoring/pool')
+
+    assert response.status_code == 200
+    stats = response.get_json()['default']
+    for key in ('pool_size', 'max_overflow', 'checked_out', 'overflow', 'timeouts', 'wait_seconds_max'):
+        assert key in stats
+    assert stats['pool_size'] == test_client.application.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size']
+
+
+def test_pool_stats_count_checkouts(test_client):
+    before = test_client.get('/monitoring/pool').get_json()['default']
+
+    with db.engine.connect() as connection:
+        checked_out = test_client.get('/monitoring/pool').get_json()['default']['checked_out']
+        connection.execute(User.__table__.select())
+
+    after = test_client.get('/monitoring/pool').get_json()['default']
+    assert checked_out == before['checked_out'] + 1
+    assert after['checkouts'] > before['checkouts']
+    assert after['wait_seconds_total'] >= before['wait_seconds_total']
+
+
+def test_pool_stats_require_token_when_configured(test_client):
+    app = test_client.application
+    app.config['MONITORING_TOKEN'] = 'secret'
+    try:
+        assert test_client.get('/monitoring/pool').status_code == 403
+        response = test_client.get('/monitoring/pool', headers={'Authorization': 'Bearer secret'})
+        assert response.status_code == 200
+    finally:
+        app.config['MONITORING_TOKEN'] = None
+
+
+def test_metrics_endpoint_serves_the_exposition_format(test_client):
+    response = test_client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE uvlhub_http_requests_total counter' in response.get_data(as_text=True)
+
+
+def test_monitoring_lists_jobs(test_client):
+    jobs = test_client.application.extensions['jobs']
+    job = jobs.submit('noop', lambda: None)
+    jobs.join(timeout=5)
+
+    listing = test_client.get('/monitoring/jobs').get_json()
+    assert listing['enabled'] and listing['queued'] == 0
+    assert listing['pid'] == os.getpid()
+    assert listing['jobs'][0]['id'] == job.id
+    assert test_client.get(f'/monitoring/jobs/{job.id}').get_json()['status'] == Job.DONE
+    assert test_client.get('/monitoring/jobs/unknown').status_code == 404
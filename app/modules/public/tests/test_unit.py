@@ -0,0 +1,210 @@
+import gzip
+
+import brotli
+import pytest
+from flask import Flask, url_for
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app import db
+
+from core.managers.query_instrumentation_manager import fingerprint
+from core.managers.template_manager import TemplateManager
+
+
+@pytest.fixture(scope='module')
+def test_client(test_client, seed_synchronized_datasets):
+    """
+    Extends the test_client fixture to add additional specific data for module testing.
+    """
+    with test_client.application.app_context():
+        # Add HERE new elements to the database that you want to exist in the test context.
+        # DO NOT FORGET to use db.session.add(<element>) and db.session.commit() to save the data.
+        seed_synchronized_datasets(number_of_datasets=5, models_per_dataset=3)
+
+    yield test_client
+
+
+def test_index_is_not_compressed_without_accept_encoding(test_client):
+    response = test_client.get('/')
+
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_index_is_gzip_compressed(test_client):
+    response = test_client.get('/', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert b'Latest' in gzip.decompress(response.data)
+
+
+def test_index_prefers_brotli(test_client):
+    response = test_client.get('/', headers={'Accept-Encoding': 'gzip, deflate, br'})
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert b'Latest' in brotli.decompress(response.data)
+
+
+def test_static_asset_compressed_variant_is_cached(test_client):
+    compression = test_client.application.extensions['compression']
+    compression.cache.clear()
+
+    first = test_client.get('/static/css/own.css', headers={'Accept-Encoding': 'gzip'})
+    hits_before = compression.cache.hits
+    second = test_client.get('/static/css/own.css', headers={'Accept-Encoding': 'gzip'})
+
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert first.data == second.data
+    assert compression.cache.hits == hits_before + 1
+    first.close()
+    second.close()
+
+
+def test_compressed_static_asset_is_revalidated(test_client):
+    first = test_client.get('/static/css/own.css', headers={'Accept-Encoding': 'gzip'})
+    etag = first.headers['ETag']
+    first.close()
+
+    again = test_client.get('/static/css/own.css', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+
+    # The ETag of another encoding is another representation
+    other = test_client.get('/static/css/own.css', headers={'Accept-Encoding': 'br', 'If-None-Match': etag})
+    assert other.status_code == 200
+    assert other.headers['Content-Encoding'] == 'br'
+    other.close()
+
+
+def test_module_script_url_is_fingerprinted(test_client):
+    script = test_client.application.blueprints['public'].script
+
+    with test_client.application.test_request_context():
+        url = url_for('public.scripts')
+
+    assert url == f'/public/scripts.{script.fingerprint}.js'
+
+    response = test_client.get(url)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert response.data == script.content
+
+    not_modified = test_client.get(url, headers={'If-None-Match': f'"{script.fingerprint}"'})
+    assert not_modified.status_code == 304
+
+
+def test_module_script_stale_fingerprint_is_not_cached(test_client):
+    response = test_client.get('/public/scripts.0123456789ab.js')
+
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+
+def test_index_renders_fingerprinted_script_tag(test_client):
+    script = test_client.application.blueprints['public'].script
+    response = test_client.get('/')
+
+    assert f'/public/scripts.{script.fingerprint}.js'.encode() in response.data
+
+
+def test_module_scripts_bundle_isolates_each_script(test_client):
+    app = test_client.application
+    bundle = app.extensions['module_scripts']
+    app.config['MODULE_SCRIPTS_BUNDLE'] = True
+    try:
+        response = test_client.get('/')
+    finally:
+        app.config['MODULE_SCRIPTS_BUNDLE'] = False
+
+    assert f'/modules/scripts.{bundle.fingerprint}.js'.encode() in response.data
+    assert b'/public/scripts.' not in response.data
+    scripts = [asset for asset in bundle.assets if asset.exists]
+    assert bundle.content.count(b'(function () {\ntry {\n') == len(scripts)
+    for asset in scripts:
+        assert bundle.wrap(asset) in bundle.content
+
+
+def test_index_query_budget(query_budget):
+    # Statistics plus the latest datasets with their authors, feature models and files eagerly loaded
+    query_budget('/', max_queries=11)
+
+
+def test_index_reports_query_stats(test_client):
+    response = test_client.get('/')
+
+    assert int(response.headers['X-Query-Count']) > 0
+    assert response.headers['X-Query-Repeated'] == '0'
+    assert 'db;dur=' in response.headers['Server-Timing']
+    assert b'sql-debug-toolbar' not in response.data
+
+
+def test_index_shows_sql_toolbar_in_debug(test_client):
+    app = test_client.application
+    app.debug = True
+    try:
+        response = test_client.get('/')
+    finally:
+        app.debug = False
+
+    assert b'<details id="sql-debug-toolbar"' in response.data
+    assert response.data.rstrip().endswith(b'</html>')
+
+
+def test_failed_queries_do_not_leave_their_start_time(test_client):
+    connection = db.session.connection()
+
+    with pytest.raises(DBAPIError):
+        connection.execute(text('SELECT * FROM no_such_table'))
+
+    assert connection.info['query_start_time'] == []
+    db.session.rollback()
+
+
+def test_query_fingerprint_ignores_parameters():
+    first = fingerprint("SELECT * FROM file WHERE id IN (?, ?, ?) AND name = 'a.uvl'")
+    second = fingerprint("SELECT *  FROM file\n WHERE id IN (?) AND name = 'b.uvl'")
+
+    assert first == second
+
+
+def test_templates_use_bytecode_cache_without_auto_reload(test_client):
+    app = test_client.application
+
+    assert not app.jinja_env.auto_reload
+    assert isinstance(app.jinja_env.bytecode_cache, FileSystemBytecodeCache)
+
+
+def test_compiled_templates_are_shared_through_bytecode_cache(tmp_path, monkeypatch):
+    (tmp_path / 'templates').mkdir()
+    (tmp_path / 'templates' / 'page.html').write_text('Hello {{ name }}')
+
+    def make_app():
+        app = Flask(__name__, template_folder=str(tmp_path / 'templates'))
+        app.config['JINJA_BYTECODE_CACHE_DIR'] = str(tmp_path / 'cache')
+        TemplateManager(app).configure_templates()
+        return app
+
+    make_app().jinja_env.get_template('page.html')
+    assert len(list((tmp_path / 'cache').glob('__jinja2_*.cache'))) == 1
+
+    # Another worker loads the stored bytecode instead of compiling the template again
+    second = make_app()
+    compiled = []
+    monkeypatch.setattr(second.jinja_env, 'compile', lambda *args, **kwargs: compiled.append(args))
+    assert second.jinja_env.get_template('page.html').render(name='uvlhub') == 'Hello uvlhub'
+    assert compiled == []
+
+
+def test_bytecode_cache_is_disabled_in_a_directory_other_users_can_write(tmp_path):
+    (tmp_path / 'cache').mkdir()
+    (tmp_path / 'cache').chmod(0o777)
+    app = Flask(__name__)
+    app.config['JINJA_BYTECODE_CACHE_DIR'] = str(tmp_path / 'cache')
+
+    TemplateManager(app).configure_templates()
+
+    assert app.jinja_env.bytecode_cache is None
@@ -6,7 +6,15 @@ import subprocess
 import docker
 from datetime import datetime, timezone
 
-client = docker.from_env()
+_client = None
+
+
+def get_docker_client():
+    # Connecting to the Docker daemon is deferred until a deployment is actually requested
+    global _client
+    if _client is None:
+        _client = docker.from_env()
+    return _client
 
 
 class WebhookService(BaseService):
@@ -15,7 +23,7 @@ class WebhookService(BaseService):
 
     def get_web_container(self):
         try:
-            return client.containers.get('web_app_container')
+            return get_docker_client().containers.get('web_app_container')
         except docker.errors.NotFound:
             abort(404, description="Web container not found.")
 
@@ -17,3 +17,6 @@ function test_zenodo_connection() {
     };
     xhr.send();
 }
+
+// Called from the dataset upload script
+window.test_zenodo_connection = test_zenodo_connection;
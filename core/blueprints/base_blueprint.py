@@ -1,5 +1,143 @@
-from flask import Blueprint, Response
+import hashlib
+import json
 import os
+import threading
+import time
+
+from flask import Blueprint, Response, current_app, g, request, url_for
+from markupsafe import Markup
+
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class ScriptAsset:
+    """A module's assets/scripts.js, read once and fingerprinted by the hash of its content."""
+
+    instances = []
+    _watcher = None
+    _watcher_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self.content = None
+        self.fingerprint = None
+        self.mtime = None
+        self.load()
+        ScriptAsset.instances.append(self)
+
+    @property
+    def exists(self):
+        return self.content is not None
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as file:
+                content = file.read()
+                mtime = os.fstat(file.fileno()).st_mtime_ns
+        except FileNotFoundError:
+            content, mtime = None, None
+
+        self.content = content
+        self.mtime = mtime
+        self.fingerprint = hashlib.md5(content).hexdigest()[:12] if content is not None else None
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self.mtime:
+            self.load()
+            return True
+        return False
+
+    @classmethod
+    def start_watcher(cls, interval=1.0):
+        """Polls every loaded script for changes so edits are picked up without restarting (development only)."""
+        with cls._watcher_lock:
+            if cls._watcher is not None:
+                return
+
+            def watch():
+                while True:
+                    time.sleep(interval)
+                    for asset in list(cls.instances):
+                        asset.reload_if_changed()
+
+            cls._watcher = threading.Thread(target=watch, name='script-asset-watcher', daemon=True)
+            cls._watcher.start()
+
+
+class ScriptBundle:
+    """All module scripts registered in an app, concatenated into a single asset."""
+
+    def __init__(self):
+        self.assets = []
+        self._fingerprint = None
+        self._content = None
+
+    def add(self, asset):
+        self.assets.append(asset)
+
+    def _key(self):
+        return tuple(asset.fingerprint for asset in self.assets if asset.exists)
+
+    @property
+    def fingerprint(self):
+        key = self._key()
+        if self._fingerprint is None or self._fingerprint[0] != key:
+            digest = hashlib.md5(''.join(key).encode()).hexdigest()[:12]
+            self._fingerprint = (key, digest)
+            self._content = None
+        return self._fingerprint[1]
+
+    @property
+    def content(self):
+        fingerprint = self.fingerprint
+        if self._content is None or self._content[0] != fingerprint:
+            parts = [self.wrap(asset) for asset in self.assets if asset.exists]
+            self._content = (fingerprint, b'\n'.join(parts))
+        return self._content[1]
+
+    @staticmethod
+    def wrap(asset):
+        """
+        Runs a module's script in its own function scope and reports its errors, so that, as with separate
+        <script> tags, a script failing on a page it was not written for does not stop the others. Functions
+        that pages or other modules call must be set on `window` by the script.
+        """
+        path = os.path.relpath(asset.path)
+        return (f'/* {path} */\n(function () {{\ntry {{\n'.encode() + asset.content
+                + f'\n}} catch (error) {{\nconsole.error({json.dumps(path)}, error);\n}}\n}})();\n'.encode())
+
+
+def send_script_bundle(fingerprint):
+    bundle = current_app.extensions['module_scripts']
+    return script_response(bundle.content, bundle.fingerprint, fingerprint)
+
+
+def script_response(content, current_fingerprint, requested_fingerprint):
+    response = Response(content, mimetype='application/javascript')
+    response.set_etag(current_fingerprint)
+    if requested_fingerprint == current_fingerprint:
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        # Stale or hand-written URL: serve the current content but do not let it be cached under this name
+        response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+def module_scripts(*module_names):
+    """Jinja helper rendering the <script> tags of the given modules, or the app bundle when enabled."""
+    if current_app.config.get('MODULE_SCRIPTS_BUNDLE'):
+        if g.get('_module_scripts_bundle_rendered'):
+            return Markup('')
+        g._module_scripts_bundle_rendered = True
+        urls = [url_for('module_scripts_bundle')]
+    else:
+        urls = [url_for(f'{name}.scripts') for name in module_names]
+    return Markup(''.join(f'<script src="{url}"></script>' for url in urls))
 
 
 class BaseBlueprint(Blueprint):
@@ -11,21 +149,39 @@ class BaseBlueprint(Blueprint):
                          url_prefix=url_prefix, subdomain=subdomain,
                          url_defaults=url_defaults, root_path=root_path)
         self.module_path = os.path.join(os.getenv('WORKING_DIR', ''), 'app', 'modules', name)
+        self.script = ScriptAsset(os.path.join(self.module_path, 'assets', 'scripts.js'))
         self.add_script_route()
 
     def add_script_route(self):
-        script_path = os.path.join(self.module_path, 'assets', 'scripts.js')
-        if os.path.exists(script_path):
-            self.add_url_rule(f'/{self.name}/scripts.js', 'scripts', self.send_script)
-        else:
-            print(f"(BaseBlueprint) -> {script_path} does not exist.")
+        if not self.script.exists:
+            print(f"(BaseBlueprint) -> {self.script.path} does not exist.")
+            return
 
-    def send_script(self):
-        script_path = os.path.join(self.module_path, 'assets', 'scripts.js')
+        self.add_url_rule(f'/{self.name}/scripts.<fingerprint>.js', 'scripts', self.send_script)
+        self.url_defaults(self.inject_script_fingerprint)
+        self.record_once(self.register_script_asset)
 
-        try:
-            with open(script_path, 'r') as file:
-                script_content = file.read()
-            return Response(script_content, mimetype='application/javascript')
-        except FileNotFoundError:
-            return Response(f"File not found: {script_path}", status=404)
+    def inject_script_fingerprint(self, endpoint, values):
+        if endpoint == f'{self.name}.scripts':
+            values.setdefault('fingerprint', self.script.fingerprint)
+
+    def register_script_asset(self, state):
+        app = state.app
+        if 'module_scripts' not in app.extensions:
+            app.extensions['module_scripts'] = ScriptBundle()
+            app.add_url_rule('/modules/scripts.<fingerprint>.js', 'module_scripts_bundle', send_script_bundle)
+            app.add_template_global(module_scripts, 'module_scripts')
+            app.url_defaults(inject_bundle_fingerprint)
+            if app.debug:
+                ScriptAsset.start_watcher()
+        app.extensions['module_scripts'].add(self.script)
+
+    def send_script(self, fingerprint):
+        if not self.script.exists:
+            return Response(f"File not found: {self.script.path}", status=404)
+        return script_response(self.script.content, self.script.fingerprint, fingerprint)
+
+
+def inject_bundle_fingerprint(endpoint, values):
+    if endpoint == 'module_scripts_bundle':
+        values.setdefault('fingerprint', current_app.extensions['module_scripts'].fingerprint)
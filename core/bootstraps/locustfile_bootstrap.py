@@ -5,6 +5,8 @@ import importlib.util
 from locust import HttpUser
 from dotenv import load_dotenv
 
+from core.locust import reporting  # noqa: F401 (adds --slo-report)
+
 
 def load_locustfiles():
     load_dotenv()
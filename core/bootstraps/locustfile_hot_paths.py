@@ -0,0 +1,135 @@
+import os
+import random
+
+from gevent.lock import Semaphore
+from locust import HttpUser, between, task
+
+from core.environment.host import get_host_for_locust_testing
+from core.locust import reporting
+from core.locust.slo import SLO
+
+# Loosen every latency objective at once on slow machines, e.g. LOCUST_SLO_FACTOR=2
+SLO_FACTOR = float(os.getenv('LOCUST_SLO_FACTOR', '1'))
+
+reporting.slos.update({
+    name: SLO(p95_ms * SLO_FACTOR, max_failure_ratio)
+    for name, (p95_ms, max_failure_ratio) in {
+        '/': (300, 0.01),
+        '/explore': (200, 0.01),
+        '/explore [POST]': (800, 0.01),
+        '/doi/[doi]/': (400, 0.01),
+        '/file/view/[id]': (300, 0.01),
+        '/file/download/[id]': (300, 0.01),
+        '/dataset/download/[id]': (2000, 0.01),
+        '/flamapy/to_glencoe/[id]': (2000, 0.01),
+        '/flamapy/to_splot/[id]': (2000, 0.01),
+        '/flamapy/to_cnf/[id]': (2000, 0.01),
+    }.items()
+})
+
+# Words and types that occur in the datasets generated by `rosemary db:seed --scale`
+SEARCH_WORDS = ['audio', 'camera', 'cloud', 'engine', 'network', 'parser', 'security', 'sensor', 'storage', 'video',
+                'model', 'dataset', 'linux', 'embedded', 'zzzz']
+PUBLICATION_TYPES = ['article', 'report', 'datamanagementplan', 'softwaredocumentation', 'thesis']
+CONVERSIONS = ['to_glencoe', 'to_splot', 'to_cnf']
+
+# Published datasets ({'doi', 'id', 'files'}), shared by the users of this process
+catalogue = []
+catalogue_lock = Semaphore()
+
+
+def search_criteria():
+    """A mix of what people type in explore: mostly one word, some two, empty searches and type filters."""
+    criteria = {'query': '', 'sorting': 'newest', 'publication_type': 'any', 'tags': []}
+    roll = random.random()
+    if roll < 0.5:
+        criteria['query'] = random.choice(SEARCH_WORDS)
+    elif roll < 0.65:
+        criteria['query'] = ' '.join(random.sample(SEARCH_WORDS, 2))
+    elif roll < 0.8:
+        criteria['publication_type'] = random.choice(PUBLICATION_TYPES)
+    if random.random() < 0.2:
+        criteria['sorting'] = 'oldest'
+    return criteria
+
+
+class HotPathsUser(HttpUser):
+    """
+    Anonymous visitors on the pages that get the most traffic. Task weights follow how often each page is
+    reached; a fifth of the datasets get most of the visits, as popular datasets do.
+    """
+
+    wait_time = between(0.5, 2)
+    host = get_host_for_locust_testing()
+
+    def on_start(self):
+        with catalogue_lock:
+            if not catalogue:
+                self.load_catalogue()
+
+    def load_catalogue(self):
+        response = self.client.post('/explore', json={'query': '', 'sorting': 'newest', 'publication_type': 'any',
+                                                      'tags': []}, name='/explore [catalogue]')
+        if response.status_code != 200:
+            return
+        for dataset in response.json()[:500]:
+            catalogue.append({'doi': dataset['dataset_doi'], 'id': dataset['id'],
+                              'files': [file['id'] for file in dataset['files']]})
+
+    def dataset(self):
+        if not catalogue:
+            return None
+        popular = catalogue[:max(1, len(catalogue) // 5)]
+        return random.choice(popular if random.random() < 0.8 else catalogue)
+
+    def file_id(self):
+        dataset = self.dataset()
+        return random.choice(dataset['files']) if dataset and dataset['files'] else None
+
+    @task(10)
+    def index(self):
+        self.client.get('/')
+
+    @task(2)
+    def explore_page(self):
+        self.client.get('/explore')
+
+    @task(8)
+    def explore_search(self):
+        self.client.post('/explore', json=search_criteria(), name='/explore [POST]')
+
+    @task(6)
+    def doi_landing_page(self):
+        dataset = self.dataset()
+        if dataset:
+            self.client.get(f"/doi/{dataset['doi']}/", name='/doi/[doi]/')
+
+    @task(4)
+    def file_view(self):
+        file_id = self.file_id()
+        if file_id:
+            self.client.get(f'/file/view/{file_id}', name='/file/view/[id]')
+
+    @task(2)
+    def file_download(self):
+        file_id = self.file_id()
+        if file_id:
+            self.client.get(f'/file/download/{file_id}', name='/file/download/[id]')
+
+    @task(1)
+    def dataset_download(self):
+        dataset = self.dataset()
+        if dataset:
+            self.client.get(f"/dataset/download/{dataset['id']}", name='/dataset/download/[id]')
+
+    @task(2)
+    def flamapy_conversion(self):
+        file_id = self.file_id()
+        if file_id:
+            conversion = random.choice(CONVERSIONS)
+            name = f'/flamapy/{conversion}/[id]'
+            with self.client.get(f'/flamapy/{conversion}/{file_id}', name=name, catch_response=True) as response:
+                # A 202 means the conversion is still being made: counted under its own name, apart from the
+                # downloads the objective is about
+                if response.status_code == 202:
+                    response.request_meta['name'] = f'{name} [pending]'
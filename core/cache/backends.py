@@ -0,0 +1,228 @@
+import glob
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def private_directory(directory):
+    """
+    Creates `directory` accessible to the user of this process only, or checks that an existing one is, and
+    returns it. Caches load what they find in their directory (pickles, bytecode, archives), so one that another
+    local user can write to would let them run code in the app or replace what it serves.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"'{directory}' is not a directory")
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"'{directory}' is owned by uid {info.st_uid}, not by this process ({os.getuid()})")
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"'{directory}' can be written by other users (mode {stat.filemode(info.st_mode)})")
+    return directory
+
+
+class BaseCache:
+    """
+    Key/value cache with optional expiry. `timeout` is in seconds, None (or 0) keeps entries until they are
+    evicted or deleted. Subclasses count hits and misses so they can be exported as metrics.
+    """
+
+    def __init__(self, default_timeout=None):
+        self.default_timeout = default_timeout
+        self.hits = 0
+        self.misses = 0
+
+    def _expires_at(self, timeout):
+        timeout = self.default_timeout if timeout is None else timeout
+        return time.time() + timeout if timeout else None
+
+    def _count(self, found):
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, timeout=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get_or_set(self, key, func, timeout=None):
+        value = self.get(key)
+        if value is None:
+            value = func()
+            if value is not None:
+                self.set(key, value, timeout)
+        return value
+
+
+class NullCache(BaseCache):
+    """Caches nothing, to disable caching without changing the callers."""
+
+    def get(self, key):
+        self._count(False)
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUCache(BaseCache):
+    """
+    Bounded in-process cache evicting the least recently used entry. Every gunicorn worker has its own copy, so
+    deleting an entry only affects the process that does it; pair it with a timeout when running several workers.
+
+    With `max_size`, the sizes given to `set` (e.g. bytes) are added up and entries are evicted to keep the total
+    under it as well; a value larger than `max_size` is not cached.
+    """
+
+    def __init__(self, max_entries=1000, default_timeout=None, max_size=None):
+        super().__init__(default_timeout)
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+            self._count(entry is not None)
+            return entry[1] if entry is not None else None
+
+    def set(self, key, value, timeout=None, size=0):
+        with self._lock:
+            self._remove(key)
+            if self.max_size is not None and size > self.max_size:
+                return
+            self._entries[key] = (self._expires_at(timeout), value, size)
+            self.size += size
+            while len(self._entries) > self.max_entries or (self.max_size is not None and self.size > self.max_size):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileSystemCache(BaseCache):
+    """
+    One pickle file per key in `directory`. Processes sharing the directory (the gunicorn workers of a host)
+    share the entries and see each other's deletions. When more than `max_entries` files exist, the oldest ones
+    are removed. The directory must be private to the user of the app (see `private_directory`), since the
+    files in it are unpickled.
+    """
+
+    FILE_PREFIX = 'cache_'
+
+    def __init__(self, directory, max_entries=1000, default_timeout=None):
+        super().__init__(default_timeout)
+        self.directory = directory
+        self.max_entries = max_entries
+        private_directory(directory)
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{self.FILE_PREFIX}{digest}')
+
+    def _paths(self):
+        return glob.glob(os.path.join(self.directory, f'{self.FILE_PREFIX}*'))
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            self._count(False)
+            return None
+        if expires_at is not None and expires_at <= time.time():
+            self.delete(key)
+            self._count(False)
+            return None
+        self._count(True)
+        return value
+
+    def set(self, key, value, timeout=None):
+        # Write then rename, so readers never see a half written file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp_')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((self._expires_at(timeout), value), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self._path(key))
+        self._prune()
+
+    def _prune(self):
+        paths = self._paths()
+        if len(paths) <= self.max_entries:
+            return
+        paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        for path in paths[:len(paths) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for path in self._paths():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def create_cache(cache_type, directory=None, max_entries=1000, default_timeout=None):
+    """Builds the backend named by a *_CACHE_TYPE setting: 'lru', 'filesystem' or 'null'."""
+    if cache_type == 'lru':
+        return LRUCache(max_entries, default_timeout)
+    if cache_type == 'filesystem':
+        if not directory:
+            raise ValueError("The 'filesystem' cache backend needs a directory")
+        return FileSystemCache(directory, max_entries, default_timeout)
+    if cache_type == 'null':
+        return NullCache(default_timeout)
+    raise ValueError(f"Unknown cache type '{cache_type}', expected 'lru', 'filesystem' or 'null'")
@@ -0,0 +1,82 @@
+"""
+Gunicorn settings for production, loaded with `gunicorn -c python:core.configuration.gunicorn_config app:app`.
+
+With `preload_app` the app is imported once in the master process and warmed (module manifest, compiled Jinja
+templates, UVL grammar and any state registered with the WarmupManager) before the workers are forked, so that
+state is shared copy-on-write instead of being rebuilt by every worker. Database connections must never be shared
+across processes, so every worker disposes the engine pools it inherited right after the fork.
+
+Worker and thread counts
+------------------------
+Defaults are (2 x CPU cores) + 1 workers with 2 threads each (gthread). Requests are mostly I/O bound (MariaDB,
+file sends) with some CPU bound flamapy conversions, so a few threads per worker help while the workers cover the
+CPU bound part.
+
+These defaults are the usual gunicorn starting point, NOT measured values: they have not been load tested on
+uvlhub's hardware with MariaDB, and no numbers back them yet. Before relying on them, run the hot paths suite
+(`rosemary locust`, core/bootstraps/locustfile_hot_paths.py, with `--report`) against the target machine and a
+database seeded with `rosemary db:seed --scale`, then tune GUNICORN_WORKERS and GUNICORN_THREADS: raise threads
+while p95 latency stays flat, raise workers while CPU is not saturated. Record the results here.
+
+Keep workers x threads below the database pool size (see SQLALCHEMY_ENGINE_OPTIONS) times the number of workers
+to avoid waiting on connections.
+"""
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = _env_int('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1)
+threads = _env_int('GUNICORN_THREADS', 2)
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync')
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+timeout = _env_int('GUNICORN_TIMEOUT', 3600)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 0)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 0)
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    # Metric snapshots of a previous run would otherwise be merged into the new one (see core/metrics)
+    metrics_dir = os.getenv('METRICS_DIR')
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.startswith('metrics_') and name.endswith('.json'):
+                os.remove(os.path.join(metrics_dir, name))
+
+
+def _warm_app(server):
+    from app import app
+
+    timings = app.extensions['warmup'].warm()
+    for name, seconds in timings.items():
+        server.log.info(f"Warmed {name} in {seconds * 1000:.1f} ms")
+
+
+def when_ready(server):
+    # Runs in the master once the app has been loaded; with preload_app the warm state is inherited by the workers
+    if server.cfg.preload_app:
+        _warm_app(server)
+
+
+def post_fork(server, worker):
+    from app import app, db
+
+    if server.cfg.preload_app:
+        # Drop connections inherited from the master without closing them, the master still owns the sockets
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    # Without preload every worker loads its own copy of the app, so warm it there instead
+    if not worker.cfg.preload_app:
+        _warm_app(worker)
@@ -0,0 +1,2 @@
+# The core tests run against the same test app as the modules
+from app.modules.conftest import test_app, test_client  # noqa: F401
@@ -2,6 +2,8 @@ from functools import wraps
 
 from flask import abort
 
+from core.managers.database_manager import replica_reads
+
 
 def pass_or_abort(condition):
 
@@ -15,3 +17,13 @@ def pass_or_abort(condition):
         return decorated_function
 
     return decorator
+
+
+def read_from_replica(f):
+    """Runs the queries of a read-only repository method against the read replica, when one is configured."""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with replica_reads():
+            return f(*args, **kwargs)
+    return decorated_function
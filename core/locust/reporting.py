@@ -0,0 +1,44 @@
+import json
+
+from locust import events
+from locust.runners import WorkerRunner
+
+from core.locust.slo import build_report, endpoint_report
+
+# Endpoint name -> SLO, filled by the suites that define objectives
+slos = {}
+
+
+@events.init_command_line_parser.add_listener
+def add_report_argument(parser):
+    parser.add_argument('--slo-report', default='', help="Write the stats and SLO results of the run as JSON here.")
+
+
+@events.quitting.add_listener
+def report_slos(environment, **kwargs):
+    # Workers only hold their share of the stats, the master reports the aggregate
+    if isinstance(environment.runner, WorkerRunner):
+        return
+
+    options = environment.parsed_options
+    report = build_report(
+        environment.stats.entries.values(), slos,
+        host=environment.host,
+        users=getattr(options, 'num_users', None),
+        run_time=getattr(options, 'run_time', None),
+        total=endpoint_report(environment.stats.total),
+    )
+
+    for name in report['failed']:
+        print(f"SLO failed for {name}: {', '.join(report['endpoints'][name]['violations'])}")
+    for name in report['missing']:
+        print(f"SLO not exercised for {name}: no requests")
+
+    report_path = getattr(options, 'slo_report', '')
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"Report written to {report_path}")
+
+    if slos and not report['passed']:
+        environment.process_exit_code = 1
@@ -0,0 +1,57 @@
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+
+class SLO(NamedTuple):
+    """Service level objective of one endpoint: 95th percentile latency and share of failed requests."""
+    p95_ms: float
+    max_failure_ratio: float = 0.01
+
+
+def endpoint_report(entry, slo=None):
+    """
+    Summarises a locust stats entry (anything with its num_requests, num_failures, avg_response_time,
+    total_rps and get_response_time_percentile) and checks it against `slo`. `passed` is None without an SLO
+    or when the endpoint got no requests.
+    """
+    requests = entry.num_requests
+    failure_ratio = entry.num_failures / requests if requests else 0.0
+    report = {
+        'method': entry.method,
+        'requests': requests,
+        'failures': entry.num_failures,
+        'failure_ratio': round(failure_ratio, 4),
+        'rps': round(entry.total_rps, 2),
+        'avg_ms': round(entry.avg_response_time, 1),
+        'p50_ms': entry.get_response_time_percentile(0.5) if requests else None,
+        'p95_ms': entry.get_response_time_percentile(0.95) if requests else None,
+        'p99_ms': entry.get_response_time_percentile(0.99) if requests else None,
+        'slo': slo._asdict() if slo else None,
+        'passed': None,
+        'violations': [],
+    }
+    if slo and requests:
+        if report['p95_ms'] > slo.p95_ms:
+            report['violations'].append(f"p95 {report['p95_ms']:.0f} ms > {slo.p95_ms:.0f} ms")
+        if failure_ratio > slo.max_failure_ratio:
+            report['violations'].append(f"failures {failure_ratio:.1%} > {slo.max_failure_ratio:.1%}")
+        report['passed'] = not report['violations']
+    return report
+
+
+def build_report(entries, slos, **meta):
+    """
+    Builds the machine readable report of a run from the locust stats entries. The run passes when every
+    endpoint with an SLO got requests and met it; `missing` lists the SLO endpoints that got none.
+    """
+    endpoints = {entry.name: endpoint_report(entry, slos.get(entry.name)) for entry in entries}
+    missing = sorted(name for name in slos if not endpoints.get(name, {}).get('requests'))
+    failed = sorted(name for name, endpoint in endpoints.items() if endpoint['passed'] is False)
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        **meta,
+        'passed': not failed and not missing,
+        'failed': failed,
+        'missing': missing,
+        'endpoints': endpoints,
+    }
@@ -0,0 +1,40 @@
+import json
+
+from core.locust.slo import SLO, build_report
+
+
+class FakeStatsEntry:
+    """The part of a locust StatsEntry the SLO report reads."""
+
+    def __init__(self, name, response_times, failures=0):
+        self.name, self.method, self.num_failures = name, 'GET', failures
+        self.response_times = sorted(response_times)
+        self.num_requests = len(response_times)
+        self.avg_response_time = sum(response_times) / len(response_times) if response_times else 0
+        self.total_rps = self.num_requests / 10
+
+    def get_response_time_percentile(self, percent):
+        return self.response_times[min(int(percent * self.num_requests), self.num_requests - 1)]
+
+
+def test_slo_report_flags_latency_failures_and_missing_endpoints():
+    slos = {'/': SLO(100), '/doi/[doi]/': SLO(500, max_failure_ratio=0.1), '/flamapy/to_cnf/[id]': SLO(1000)}
+    entries = [FakeStatsEntry('/', [20] * 95 + [300] * 5),
+               FakeStatsEntry('/doi/[doi]/', [50] * 10, failures=2),
+               FakeStatsEntry('/explore [catalogue]', [900])]
+
+    report = build_report(entries, slos, host='http://localhost')
+
+    assert not report['passed']
+    assert report['failed'] == ['/', '/doi/[doi]/']
+    assert report['missing'] == ['/flamapy/to_cnf/[id]']
+    assert report['endpoints']['/']['violations'] == ['p95 300 ms > 100 ms']
+    assert report['endpoints']['/doi/[doi]/']['violations'] == ['failures 20.0% > 10.0%']
+    assert report['endpoints']['/explore [catalogue]']['passed'] is None
+    json.dumps(report)
+
+
+def test_slo_report_passes_when_objectives_are_met():
+    report = build_report([FakeStatsEntry('/', [20] * 100)], {'/': SLO(100)})
+
+    assert report['passed'] and report['endpoints']['/']['p95_ms'] == 20
@@ -0,0 +1,178 @@
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+from flask import request
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - Brotli is pinned in requirements.txt
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/xml',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+}
+
+
+class CompressedAssetCache:
+    """Bounded in-process cache of compressed variants of static and module assets."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def set(self, key, data):
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CompressionManager:
+    def __init__(self, app):
+        self.app = app
+        self.cache = CompressedAssetCache(app.config.get('COMPRESSION_CACHE_MAX_ENTRIES', 256))
+
+    def register_compression(self):
+        if not self.app.config.get('COMPRESSION_ENABLED', True):
+            return
+
+        self.app.extensions['compression'] = self
+
+        @self.app.after_request
+        def compress_response(response):
+            return self.compress(response)
+
+    def available_encodings(self):
+        return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def negotiate_encoding(self):
+        return request.accept_encodings.best_match(self.available_encodings())
+
+    def compress(self, response):
+        if not self._is_compressible(response):
+            return response
+
+        encoding = self.negotiate_encoding()
+        if not encoding:
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        if response.direct_passthrough:
+            # Files served with send_file() (static folder); compress from disk so the variant can be cached
+            file_path = self._static_file_path()
+            if file_path is None:
+                return response
+            data = self._compress_static_file(file_path, encoding)
+            if data is None:
+                return response
+            if hasattr(response.response, 'close'):
+                response.response.close()
+            response.direct_passthrough = False
+        else:
+            data = self._compress_body(response, encoding)
+            if data is None:
+                return response
+
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        response.headers.pop('Accept-Ranges', None)
+
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak=weak)
+            # send_file compared If-None-Match with the ETag of the uncompressed file, so a client revalidating
+            # this variant was never answered 304: compare again with the ETag it was given
+            response.make_conditional(request.environ)
+
+        return response
+
+    def _is_compressible(self, response):
+        if response.status_code != 200 or 'Content-Encoding' in response.headers:
+            return False
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            # ZIP downloads, UVL attachments and images are already compressed or binary
+            return False
+        if response.is_streamed and not response.direct_passthrough:
+            return False
+        content_length = response.content_length
+        if content_length is not None and content_length < self.app.config.get('COMPRESSION_MIN_SIZE', 500):
+            return False
+        return True
+
+    def _is_cacheable_asset(self):
+        endpoint = request.endpoint or ''
+        return endpoint == 'static' or endpoint.endswith('.scripts')
+
+    def _static_file_path(self):
+        if request.endpoint != 'static' or not self.app.static_folder:
+            return None
+        filename = (request.view_args or {}).get('filename')
+        if not filename:
+            return None
+        return safe_join(self.app.static_folder, filename)
+
+    def _compress_static_file(self, file_path, encoding):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+
+        key = (file_path, stat.st_mtime_ns, stat.st_size, encoding)
+        data = self.cache.get(key)
+        if data is None:
+            with open(file_path, 'rb') as file:
+                data = self._encode(file.read(), encoding)
+            self.cache.set(key, data)
+        return data
+
+    def _compress_body(self, response, encoding):
+        body = response.get_data()
+        if len(body) < self.app.config.get('COMPRESSION_MIN_SIZE', 500):
+            return None
+
+        etag, _ = response.get_etag()
+        if not (etag and self._is_cacheable_asset()):
+            return self._encode(body, encoding)
+
+        key = (request.path, etag, encoding)
+        data = self.cache.get(key)
+        if data is None:
+            data = self._encode(body, encoding)
+            self.cache.set(key, data)
+        return data
+
+    def _encode(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.app.config.get('COMPRESSION_BROTLI_QUALITY', 5))
+        return gzip.compress(data, compresslevel=self.app.config.get('COMPRESSION_GZIP_LEVEL', 6))
@@ -1,5 +1,15 @@
 import os
 import secrets
+import tempfile
+
+from core.managers.database_manager import InstrumentedQueuePool
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def project_path(path):
+    """`path` under WORKING_DIR, or under the checkout when it is unset, rather than under the current directory."""
+    return os.path.join(os.getenv('WORKING_DIR') or PROJECT_ROOT, path)
 
 
 class ConfigManager:
@@ -20,6 +30,38 @@ class ConfigManager:
             self.app.config.from_object(DevelopmentConfig)
 
 
+def engine_options(pool_size, max_overflow, pool_recycle=1800, pool_pre_ping=True, pool_timeout=30):
+    """
+    Builds SQLALCHEMY_ENGINE_OPTIONS from the given defaults, each of which can be overridden with its
+    SQLALCHEMY_* environment variable. Size the pool for the threads of one gunicorn worker: every worker has its own
+    pool, so MariaDB sees up to workers x (pool_size + max_overflow) connections.
+    """
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.getenv('SQLALCHEMY_POOL_SIZE', pool_size)),
+        'max_overflow': int(os.getenv('SQLALCHEMY_MAX_OVERFLOW', max_overflow)),
+        # Recycle before MariaDB's wait_timeout drops idle connections
+        'pool_recycle': int(os.getenv('SQLALCHEMY_POOL_RECYCLE', pool_recycle)),
+        'pool_pre_ping': os.getenv('SQLALCHEMY_POOL_PRE_PING', str(pool_pre_ping)).lower() == 'true',
+        'pool_timeout': int(os.getenv('SQLALCHEMY_POOL_TIMEOUT', pool_timeout)),
+    }
+
+
+def replica_binds(database_env='MARIADB_DATABASE'):
+    """Adds the 'replica' bind used by repository reads when MARIADB_REPLICA_HOSTNAME is set."""
+    if not os.getenv('MARIADB_REPLICA_HOSTNAME'):
+        return {}
+    return {
+        'replica': (
+            f"mysql+pymysql://{os.getenv('MARIADB_REPLICA_USER', os.getenv('MARIADB_USER', 'default_user'))}:"
+            f"{os.getenv('MARIADB_REPLICA_PASSWORD', os.getenv('MARIADB_PASSWORD', 'default_password'))}@"
+            f"{os.getenv('MARIADB_REPLICA_HOSTNAME')}:"
+            f"{os.getenv('MARIADB_REPLICA_PORT', '3306')}/"
+            f"{os.getenv(database_env, 'default_db')}"
+        )
+    }
+
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', secrets.token_bytes())
     SQLALCHEMY_DATABASE_URI = (
@@ -30,13 +72,83 @@ class Config:
         f"{os.getenv('MARIADB_DATABASE', 'default_db')}"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(pool_size=5, max_overflow=10)
+    SQLALCHEMY_BINDS = replica_binds()
+    # Seconds during which a user's reads go to the primary after they write, to hide replication lag
+    SQLALCHEMY_REPLICA_STICKINESS = float(os.getenv('SQLALCHEMY_REPLICA_STICKINESS', 5))
+    # Seconds after which MariaDB aborts a statement, 0 disables it
+    SQLALCHEMY_STATEMENT_TIMEOUT = float(os.getenv('SQLALCHEMY_STATEMENT_TIMEOUT', 0))
     TIMEZONE = 'Europe/Madrid'
-    TEMPLATES_AUTO_RELOAD = True
+    # Checking every template's mtime on each render is only worth it while editing them
+    TEMPLATES_AUTO_RELOAD = os.getenv('TEMPLATES_AUTO_RELOAD', 'False').lower() == 'true'
+    # Compiled templates shared by the gunicorn workers of a host, in a directory private to the app's user
+    # (created with mode 0700) since the bytecode is loaded with marshal; empty to disable
+    JINJA_BYTECODE_CACHE_DIR = os.getenv('JINJA_BYTECODE_CACHE_DIR', 'cache/jinja')
+    if JINJA_BYTECODE_CACHE_DIR:
+        JINJA_BYTECODE_CACHE_DIR = project_path(JINJA_BYTECODE_CACHE_DIR)
     UPLOAD_FOLDER = 'uploads'
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = 500
+    COMPRESSION_GZIP_LEVEL = 6
+    COMPRESSION_BROTLI_QUALITY = 5
+    COMPRESSION_CACHE_MAX_ENTRIES = 256
+    MODULE_SCRIPTS_BUNDLE = os.getenv('MODULE_SCRIPTS_BUNDLE', 'False').lower() == 'true'
+    MONITORING_TOKEN = os.getenv('MONITORING_TOKEN')
+    # Per-request query count/time in X-Query-Count and Server-Timing headers, plus a toolbar in debug mode
+    SQL_INSTRUMENTATION_ENABLED = os.getenv('SQL_INSTRUMENTATION_ENABLED', 'False').lower() == 'true'
+    SQL_REPEATED_QUERY_THRESHOLD = 5
+    LOG_FILE = os.getenv('LOG_FILE', 'app.log')
+    LOG_FILE_LEVEL = os.getenv('LOG_FILE_LEVEL', 'ERROR')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 10))
+    LOG_QUEUE_SIZE = 10000
+    # One INFO record per request with its status and duration
+    LOG_REQUESTS = os.getenv('LOG_REQUESTS', 'False').lower() == 'true'
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    # Directory shared by the gunicorn workers so /metrics aggregates all of them, unset for a single process
+    METRICS_DIR = os.getenv('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = 5
+    # Rendered fragments of published dataset pages: 'lru' (per worker), 'filesystem' (shared) or 'null'
+    FRAGMENT_CACHE_TYPE = os.getenv('FRAGMENT_CACHE_TYPE', 'lru')
+    # Private to the app's user (created with mode 0700), since the cached fragments are unpickled
+    FRAGMENT_CACHE_DIR = project_path(os.getenv('FRAGMENT_CACHE_DIR', 'cache/fragments'))
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', 1000))
+    # Seconds a fragment is kept, bounds how long another 'lru' worker can serve it after an invalidation
+    FRAGMENT_CACHE_TIMEOUT = int(os.getenv('FRAGMENT_CACHE_TIMEOUT', 3600))
+    # Per-worker cache of DOI landing page resolutions; unknown DOIs are kept for the shorter negative timeout
+    DOI_CACHE_MAX_ENTRIES = 10000
+    DOI_CACHE_TIMEOUT = int(os.getenv('DOI_CACHE_TIMEOUT', 300))
+    DOI_CACHE_NEGATIVE_TIMEOUT = int(os.getenv('DOI_CACHE_NEGATIVE_TIMEOUT', 30))
+    # Background jobs: worker threads per process, jobs that can wait before new ones are rejected, jobs kept
+    JOBS_ENABLED = os.getenv('JOBS_ENABLED', 'True').lower() == 'true'
+    JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))
+    JOBS_QUEUE_SIZE = int(os.getenv('JOBS_QUEUE_SIZE', 100))
+    JOBS_HISTORY = 1000
+    # ZIP archives of the datasets, built after an upload or on the first download, in a directory private to the
+    # app's user (created with mode 0700) since they are served as they are found
+    ARCHIVE_CACHE_DIR = project_path(os.getenv('ARCHIVE_CACHE_DIR', 'cache/archives'))
+    # Processes converting the models of new datasets with flamapy, and seconds after which a conversion still
+    # pending is considered lost and started again
+    FLAMAPY_POOL_WORKERS = int(os.getenv('FLAMAPY_POOL_WORKERS', 2))
+    CONVERSION_PENDING_TIMEOUT = 300
+    # Parsed models and CNF encodings kept by each process (MB of pickled size), and a directory where they are
+    # pickled to be shared by the processes of the host, empty to keep them in memory only
+    FEATURE_MODEL_CACHE_MAX_MB = int(os.getenv('FEATURE_MODEL_CACHE_MAX_MB', 256))
+    FEATURE_MODEL_CACHE_DIR = os.getenv('FEATURE_MODEL_CACHE_DIR', '')
+    # Wall-time traces of requests sent with 'X-Profile: <PROFILING_TOKEN>' or sampled at PROFILING_SAMPLE_RATE
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'True').lower() == 'true'
+    PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', os.getenv('MONITORING_TOKEN'))
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0.0))
+    PROFILING_TRACES_DIR = os.path.join(os.getenv('WORKING_DIR', ''), os.getenv('PROFILING_TRACES_DIR', 'traces'))
+    PROFILING_MAX_TRACES = int(os.getenv('PROFILING_MAX_TRACES', 500))
+    PROFILING_MAX_SPANS = 2000
 
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    TEMPLATES_AUTO_RELOAD = os.getenv('TEMPLATES_AUTO_RELOAD', 'True').lower() == 'true'
+    SQL_INSTRUMENTATION_ENABLED = os.getenv('SQL_INSTRUMENTATION_ENABLED', 'True').lower() == 'true'
 
 
 class TestingConfig(Config):
@@ -48,8 +160,19 @@ class TestingConfig(Config):
         f"{os.getenv('MARIADB_PORT', '3306')}/"
         f"{os.getenv('MARIADB_TEST_DATABASE', 'default_db')}"
     )
+    SQLALCHEMY_BINDS = replica_binds('MARIADB_TEST_DATABASE')
     WTF_CSRF_ENABLED = False
+    SQL_INSTRUMENTATION_ENABLED = True
+    PROFILING_TRACES_DIR = os.path.join(tempfile.gettempdir(), 'uvlhub_test_traces')
+    # Every test module recreates the database and reuses ids, tests enable the cache where they need it
+    FRAGMENT_CACHE_TYPE = 'null'
+    ARCHIVE_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'uvlhub_test_archives')
+    JINJA_BYTECODE_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'uvlhub_test_jinja')
 
 
 class ProductionConfig(Config):
     DEBUG = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(pool_size=10, max_overflow=20, pool_timeout=10)
+    SQLALCHEMY_STATEMENT_TIMEOUT = float(os.getenv('SQLALCHEMY_STATEMENT_TIMEOUT', 60))
+    # Shared by the workers, so an invalidation in one of them is seen by all
+    FRAGMENT_CACHE_TYPE = os.getenv('FRAGMENT_CACHE_TYPE', 'filesystem')
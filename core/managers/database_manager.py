@@ -0,0 +1,152 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+REPLICA_BIND_KEY = 'replica'
+PRIMARY_UNTIL_SESSION_KEY = '_db_primary_until'
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads():
+    """Routes the queries run inside the block to the read replica, if one is configured."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def is_primary_sticky():
+    return has_request_context() and flask_session.get(PRIMARY_UNTIL_SESSION_KEY, 0) > time.time()
+
+
+class RoutingSession(Session):
+    """
+    Session sending reads made inside `replica_reads()` to the 'replica' bind and everything else to the primary.
+    Reads stay on the primary while the current transaction has written, and for SQLALCHEMY_REPLICA_STICKINESS
+    seconds after a user commits, so users always see their own writes despite replication lag.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or not _replica_reads.get():
+            return engine
+
+        engines = self._db.engines
+        replica = engines.get(REPLICA_BIND_KEY)
+        # Only queries for the default bind are routed; models with their own bind key keep it
+        if replica is None or engine is not engines.get(None):
+            return engine
+        if self._flushing or self.info.get('has_writes') or is_primary_sticky():
+            return engine
+        return replica
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_writes(session, flush_context):
+    session.info['has_writes'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_to_primary(session):
+    if not session.info.pop('has_writes', False):
+        return
+    if has_request_context() and REPLICA_BIND_KEY in session._db.engines:
+        flask_session[PRIMARY_UNTIL_SESSION_KEY] = time.time() + current_app.config['SQLALCHEMY_REPLICA_STICKINESS']
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_writes(session):
+    session.info.pop('has_writes', None)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that also records how long callers wait for a connection, so pool exhaustion shows up as wait time
+    instead of only as slow requests.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+    def stats(self):
+        with self._stats_lock:
+            checkouts, timeouts = self._checkouts, self._timeouts
+            wait_total, wait_max = self._wait_total, self._wait_max
+
+        return {
+            'pool_size': self.size(),
+            'max_overflow': self._max_overflow,
+            'checked_in': self.checkedin(),
+            'checked_out': self.checkedout(),
+            'overflow': max(self.overflow(), 0),
+            'checkouts': checkouts,
+            'timeouts': timeouts,
+            'wait_seconds_total': wait_total,
+            'wait_seconds_max': wait_max,
+            'wait_seconds_avg': wait_total / checkouts if checkouts else 0.0,
+        }
+
+
+class DatabaseManager:
+    def __init__(self, app, db):
+        self.app = app
+        self.db = db
+
+    def register_engine_events(self):
+        self.app.extensions['database'] = self
+        statement_timeout = self.app.config.get('SQLALCHEMY_STATEMENT_TIMEOUT')
+
+        with self.app.app_context():
+            for engine in self.db.engines.values():
+                if statement_timeout and engine.dialect.name in ('mysql', 'mariadb'):
+                    event.listen(engine, 'connect', self._statement_timeout_setter(statement_timeout))
+
+    @staticmethod
+    def _statement_timeout_setter(seconds):
+        def set_statement_timeout(dbapi_connection, connection_record):
+            # MariaDB aborts any statement running longer than max_statement_time (in seconds)
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"SET SESSION max_statement_time = {float(seconds)}")
+
+        return set_statement_timeout
+
+    def pool_stats(self):
+        stats = {}
+        with self.app.app_context():
+            for bind_key, engine in self.db.engines.items():
+                pool = engine.pool
+                if isinstance(pool, InstrumentedQueuePool):
+                    stats[bind_key or 'default'] = pool.stats()
+                else:
+                    stats[bind_key or 'default'] = {'status': pool.status()}
+        return stats
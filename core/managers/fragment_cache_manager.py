@@ -0,0 +1,160 @@
+import hashlib
+import uuid
+
+from flask import current_app, has_app_context, render_template
+from markupsafe import Markup
+from sqlalchemy import event
+
+from core.cache.backends import NullCache, create_cache
+from core.configuration.configuration import get_app_version
+from core.metrics.metrics import CACHE_HITS, CACHE_MISSES, registry
+
+INVALIDATIONS_KEY = 'fragment_cache_invalidations'
+INVALIDATE_ALL_KEY = 'fragment_cache_invalidate_all'
+
+
+class FragmentCacheManager:
+    """
+    Caches rendered template fragments (the parts of a page that only depend on database content) in the
+    backend chosen by FRAGMENT_CACHE_TYPE: 'lru' (per process), 'filesystem' (shared by the workers of a host,
+    FRAGMENT_CACHE_DIR) or 'null'. Keys include a version derived from the fragment template and the app
+    version, so a deploy never serves HTML rendered by an older template, and a generation of the fragment that
+    invalidating it replaces, so a rendering that was in progress during the invalidation is stored under the
+    old generation and never served.
+
+    Modules register invalidators that map the instances written by a flush to the fragments to drop; they are
+    dropped once the transaction commits. Bulk statements (executemany inserts, ORM updates and deletes) on the
+    tables an invalidator watches drop every fragment.
+    """
+
+    def __init__(self, app, db):
+        self.app = app
+        self.db = db
+        config = app.config
+        self.cache = create_cache(config.get('FRAGMENT_CACHE_TYPE', 'lru'),
+                                  directory=config.get('FRAGMENT_CACHE_DIR'),
+                                  max_entries=config.get('FRAGMENT_CACHE_MAX_ENTRIES', 1000),
+                                  default_timeout=config.get('FRAGMENT_CACHE_TIMEOUT'))
+        self.invalidators = []
+        self.watched_tables = set()
+        self.hits = 0
+        self.misses = 0
+        self._versions = {}
+
+    def register_fragment_cache(self):
+        self.app.extensions['fragment_cache'] = self
+        registry.register_collector('fragment_cache', self.collect_metrics)
+
+        session_class = self.db.session.session_factory.class_
+        for name, listener in (('after_flush', _collect_invalidations), ('after_commit', _apply_invalidations),
+                               ('after_rollback', _discard_invalidations), ('do_orm_execute', _watch_bulk_statements)):
+            if not event.contains(session_class, name, listener):
+                event.listen(session_class, name, listener)
+
+    def register_invalidator(self, tables, invalidator):
+        """
+        `invalidator(connection, instances)` receives the new, changed and deleted instances of a flush and returns
+        the (template name, key) pairs of the fragments to drop. `tables` are the names of the tables it depends on.
+        """
+        self.invalidators.append(invalidator)
+        self.watched_tables.update(tables)
+
+    def version(self, template_name):
+        version = self._versions.get(template_name)
+        # Templates edited while the app runs (debug mode) must not be served from the renderings of the old ones
+        if version is None or self.app.jinja_env.auto_reload:
+            source, _, _ = self.app.jinja_env.loader.get_source(self.app.jinja_env, template_name)
+            digest = hashlib.sha1(f'{get_app_version()}:{source}'.encode('utf-8')).hexdigest()[:12]
+            version = self._versions[template_name] = digest
+        return version
+
+    def generation_key(self, template_name, key):
+        return f'{template_name}:generation:{key}'
+
+    def fragment_key(self, template_name, key, generation):
+        return f'{template_name}:{self.version(template_name)}:{generation}:{key}'
+
+    def render(self, template_name, key, context_func):
+        """
+        Returns the cached rendering of `template_name` for `key`, rendering it with the context returned by
+        `context_func` on a miss. Loading the context lazily lets a hit skip the queries the fragment needs.
+        """
+        generation_key = self.generation_key(template_name, key)
+        generation = self.cache.get(generation_key)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            self.cache.set(generation_key, generation)
+
+        cache_key = self.fragment_key(template_name, key, generation)
+        html = self.cache.get(cache_key)
+        if html is None:
+            self.misses += 1
+            html = render_template(template_name, **context_func())
+            self.cache.set(cache_key, html)
+        else:
+            self.hits += 1
+        return Markup(html)
+
+    def invalidate(self, template_name, key):
+        generation_key = self.generation_key(template_name, key)
+        generation = self.cache.get(generation_key)
+        self.cache.delete(generation_key)
+        if generation is not None:
+            self.cache.delete(self.fragment_key(template_name, key, generation))
+
+    def invalidate_all(self):
+        self.cache.clear()
+
+    def collect_metrics(self):
+        CACHE_HITS.set_total(self.hits, cache='fragments')
+        CACHE_MISSES.set_total(self.misses, cache='fragments')
+
+
+def _fragment_cache():
+    if not has_app_context():
+        return None
+    manager = current_app.extensions.get('fragment_cache')
+    if manager is None or not manager.invalidators or isinstance(manager.cache, NullCache):
+        return None
+    return manager
+
+
+def _collect_invalidations(session, flush_context):
+    manager = _fragment_cache()
+    if manager is None:
+        return
+    # Still the pre-flush state here, but new instances already have their primary keys
+    instances = list(session.new) + list(session.dirty) + list(session.deleted)
+    if not instances:
+        return
+    connection = session.connection()
+    keys = session.info.setdefault(INVALIDATIONS_KEY, set())
+    for invalidator in manager.invalidators:
+        keys.update(invalidator(connection, instances))
+
+
+def _watch_bulk_statements(orm_execute_state):
+    if orm_execute_state.is_select:
+        return
+    manager = _fragment_cache()
+    mapper = orm_execute_state.bind_mapper
+    if manager is not None and mapper is not None and mapper.local_table.name in manager.watched_tables:
+        orm_execute_state.session.info[INVALIDATE_ALL_KEY] = True
+
+
+def _apply_invalidations(session):
+    keys = session.info.pop(INVALIDATIONS_KEY, None)
+    invalidate_all = session.info.pop(INVALIDATE_ALL_KEY, False)
+    manager = _fragment_cache()
+    if manager is None:
+        return
+    if invalidate_all:
+        manager.invalidate_all()
+        return
+    for template_name, key in keys or ():
+        manager.invalidate(template_name, key)
+
+
+def _discard_invalidations(session):
+    session.info.pop(INVALIDATIONS_KEY, None)
+    session.info.pop(INVALIDATE_ALL_KEY, None)
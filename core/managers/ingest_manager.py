@@ -0,0 +1,52 @@
+import logging
+
+from core.managers.job_manager import JobQueueFull
+
+logger = logging.getLogger(__name__)
+
+
+class IngestManager:
+    """
+    Runs hooks on the UVL files stored in uploads (the models of a new dataset...), to compute once what would
+    otherwise be computed on each request. Modules register `hook(file_ids)` with `register_hook`; all hooks run
+    one after the other in a background job per `ingest` call, or inline when background jobs are disabled.
+
+    Hooks must be idempotent: a file can be ingested again, e.g. when a request finds that a result is missing.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.hooks = {}
+
+    def register_ingest(self):
+        self.app.extensions['ingest'] = self
+
+    def register_hook(self, name, hook):
+        self.hooks[name] = hook
+
+    def ingest(self, file_ids, key=None):
+        """Runs the hooks on the files with the given ids. Returns the job, or None when they were not queued."""
+        file_ids = list(file_ids)
+        if not file_ids or not self.hooks:
+            return None
+
+        jobs = self.app.extensions.get('jobs')
+        if jobs is None:
+            self.run_hooks(file_ids)
+            return None
+        try:
+            return jobs.submit('ingest', self.run_hooks, file_ids, key=key)
+        except JobQueueFull as e:
+            logger.warning(f"Not ingesting files {file_ids}: {e}")
+            return None
+
+    def run_hooks(self, file_ids):
+        failed = []
+        for name, hook in self.hooks.items():
+            try:
+                hook(file_ids)
+            except Exception as e:
+                logger.exception(f"Ingest hook '{name}' failed for files {file_ids}: {e}")
+                failed.append(name)
+        if failed:
+            raise RuntimeError(f"Ingest hooks failed: {', '.join(failed)}")
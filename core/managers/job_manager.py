@@ -0,0 +1,192 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from core.metrics.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+JOBS_QUEUED = registry.gauge('uvlhub_jobs_queued', 'Background jobs waiting for a worker thread.')
+JOBS_RUNNING = registry.gauge('uvlhub_jobs_running', 'Background jobs being run.')
+JOBS_TOTAL = registry.counter('uvlhub_jobs_total', 'Background jobs finished.', labels=('name', 'status'))
+JOBS_REJECTED = registry.counter(
+    'uvlhub_jobs_rejected_total', 'Background jobs not queued because the queue was full.', labels=('name',))
+JOB_DURATION = registry.histogram('uvlhub_job_duration_seconds', 'Time spent running background jobs.',
+                                  labels=('name',))
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, name, func, args, kwargs, key=None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = Job.QUEUED
+        self.error = None
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at = None
+        self.finished_at = None
+        self.finished = threading.Event()
+
+    @property
+    def pending(self):
+        return self.status in (Job.QUEUED, Job.RUNNING)
+
+    def wait(self, timeout=None):
+        return self.finished.wait(timeout)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'key': self.key,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobManager:
+    """
+    Runs background work (archive builds, conversions...) in JOBS_WORKERS threads of each process, every job in
+    its own app context. The queue holds at most JOBS_QUEUE_SIZE jobs: `submit` raises JobQueueFull beyond that,
+    so a burst of uploads sheds work instead of piling it up. Jobs should only warm state that is also built on
+    demand, since queued jobs are lost when the process exits.
+
+    Submitting a job with the key of a queued or running one returns that job instead of queueing another. The
+    last JOBS_HISTORY jobs are kept for /monitoring/jobs. Jobs only exist in the process that queued them: with
+    several gunicorn workers, /monitoring/jobs lists the jobs of the worker answering it and /monitoring/jobs/<id>
+    is a 404 on the others.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.workers = app.config.get('JOBS_WORKERS', 2)
+        self.history = app.config.get('JOBS_HISTORY', 1000)
+        self.queue = queue.Queue(maxsize=app.config.get('JOBS_QUEUE_SIZE', 100))
+        self.jobs = OrderedDict()
+        self.pending_keys = {}
+        self.running = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._workers_pid = None
+
+    def register_jobs(self):
+        if not self.app.config.get('JOBS_ENABLED', True):
+            return
+
+        self.app.extensions['jobs'] = self
+        registry.register_collector('jobs', self.collect_metrics)
+
+    def submit(self, name, func, *args, key=None, **kwargs):
+        """Queues `func(*args, **kwargs)` and returns its Job. Raises JobQueueFull when the queue is full."""
+        self.ensure_workers()
+        with self._lock:
+            if key is not None and key in self.pending_keys:
+                return self.pending_keys[key]
+
+            job = Job(name, func, args, kwargs, key)
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                JOBS_REJECTED.inc(name=name)
+                raise JobQueueFull(f"The job queue is full ({self.queue.maxsize} jobs), '{name}' was not queued")
+
+            if key is not None:
+                self.pending_keys[key] = job
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.history:
+                oldest_id = next(iter(self.jobs))
+                if self.jobs[oldest_id].pending:
+                    break
+                del self.jobs[oldest_id]
+            return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def recent(self):
+        """The kept jobs, newest first."""
+        with self._lock:
+            return list(reversed(self.jobs.values()))
+
+    def join(self, timeout=None):
+        """Waits until no job is queued or running. Returns False if `timeout` seconds passed first."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._idle:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+            return True
+
+    def stats(self):
+        return {
+            'pid': os.getpid(),
+            'workers': self.workers,
+            'queue_size': self.queue.maxsize,
+            'queued': self.queue.qsize(),
+            'running': self.running,
+        }
+
+    def ensure_workers(self):
+        """Starts the worker threads once per process (threads do not survive gunicorn's fork)."""
+        if self._workers_pid == os.getpid():
+            return
+        with self._lock:
+            if self._workers_pid == os.getpid():
+                return
+            self._workers_pid = os.getpid()
+            for number in range(self.workers):
+                threading.Thread(target=self._work, name=f'job-worker-{number}', daemon=True).start()
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            with self._lock:
+                self.running += 1
+            job.status = Job.RUNNING
+            job.started_at = datetime.now(timezone.utc)
+            start = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    job.func(*job.args, **job.kwargs)
+                job.status = Job.DONE
+            except Exception as e:
+                logger.exception(f"Job '{job.name}' ({job.id}) failed: {e}")
+                job.status = Job.FAILED
+                job.error = str(e)
+            finally:
+                job.finished_at = datetime.now(timezone.utc)
+                JOB_DURATION.observe(time.perf_counter() - start, name=job.name)
+                JOBS_TOTAL.inc(name=job.name, status=job.status)
+                with self._idle:
+                    self.running -= 1
+                    if job.key is not None and self.pending_keys.get(job.key) is job:
+                        del self.pending_keys[job.key]
+                    self.queue.task_done()
+                    self._idle.notify_all()
+                job.finished.set()
+
+    def collect_metrics(self):
+        JOBS_QUEUED.set(self.queue.qsize())
+        JOBS_RUNNING.set(self.running)
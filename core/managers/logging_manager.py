@@ -1,5 +1,141 @@
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, has_request_context, request
+
+from core.metrics.metrics import registry
+
+LOG_RECORDS = registry.counter('uvlhub_log_records_total', 'Log records emitted.', labels=('level',))
+LOG_RECORDS_DROPPED = registry.counter(
+    'uvlhub_log_records_dropped_total', 'Log records dropped because the logging queue was full.')
+LOG_EMIT_SECONDS = registry.counter(
+    'uvlhub_log_emit_seconds_total', 'Time request threads spent handing log records to the logging queue.')
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+
+class RequestContextFilter(logging.Filter):
+    """Adds the request id, method, path and elapsed time to records logged while handling a request."""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+            start = g.get('request_start_time')
+            record.elapsed_ms = round((time.perf_counter() - start) * 1000, 2) if start else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    FIELDS = ('request_id', 'method', 'path', 'elapsed_ms', 'status', 'duration_ms')
+
+    def format(self, record):
+        data = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class PerProcessRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler whose file name may contain {pid}, resolved again in each process that writes to it: under
+    gunicorn's preload_app the handler is created in the master, before the workers are forked.
+    """
+
+    def __init__(self, filename_template, **kwargs):
+        self.filename_template = filename_template
+        super().__init__(filename_template.format(pid=os.getpid()), delay=True, **kwargs)
+
+    def use_process_file(self):
+        filename = os.path.abspath(self.filename_template.format(pid=os.getpid()))
+        if filename == self.baseFilename:
+            return
+        with self.lock:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+            self.baseFilename = filename
+
+
+class ProcessSafeQueueHandler(QueueHandler):
+    """
+    QueueHandler whose listener thread is (re)started in the process that logs, because threads and queue locks
+    do not survive gunicorn forking the workers. Request threads only pay for a put on an in-memory queue.
+    """
+
+    def __init__(self, handlers, queue_size):
+        super().__init__(queue.Queue(queue_size))
+        self.handlers = handlers
+        self.queue_size = queue_size
+        self.listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            for handler in self.handlers:
+                if isinstance(handler, PerProcessRotatingFileHandler):
+                    handler.use_process_file()
+            self.queue = queue.Queue(self.queue_size)
+            self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+        self._pid = None
+
+    def prepare(self, record):
+        # Keep the traceback apart from the message so the JSON formatter can put it in its own field
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+    def emit(self, record):
+        start = time.perf_counter()
+        self.ensure_listener()
+        super().emit(record)
+        LOG_RECORDS.inc(level=record.levelname)
+        LOG_EMIT_SECONDS.inc(time.perf_counter() - start)
 
 
 class LoggingManager:
@@ -7,23 +143,66 @@ class LoggingManager:
         self.app = app
 
     def setup_logging(self):
+        config = self.app.config
+
         # Configure log format
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        if config.get('LOG_FORMAT', 'json') == 'json':
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-        # Configure the log file with file rotation
-        file_handler = RotatingFileHandler('app.log', maxBytes=10240, backupCount=10)
-        file_handler.setLevel(logging.ERROR)
+        # Configure the log file with size-based rotation; use {pid} in LOG_FILE to give each worker its own file,
+        # rotating a file shared by several processes is not safe
+        file_handler = PerProcessRotatingFileHandler(config.get('LOG_FILE', 'app.log'),
+                                                     maxBytes=config.get('LOG_MAX_BYTES', 10 * 1024 * 1024),
+                                                     backupCount=config.get('LOG_BACKUP_COUNT', 10))
+        file_handler.setLevel(config.get('LOG_FILE_LEVEL', 'ERROR'))
         file_handler.setFormatter(formatter)
-
-        # Add handler to app logger
-        self.app.logger.addHandler(file_handler)
+        handlers = [file_handler]
 
         # Configure console log if necessary
         if self.app.debug:
             stream_handler = logging.StreamHandler()
             stream_handler.setLevel(logging.INFO)
             stream_handler.setFormatter(formatter)
-            self.app.logger.addHandler(stream_handler)
+            handlers.append(stream_handler)
+
+        # Records are queued by the logging thread and written by a listener thread
+        queue_handler = ProcessSafeQueueHandler(handlers, config.get('LOG_QUEUE_SIZE', 10000))
+        queue_handler.addFilter(RequestContextFilter())
+        self._replace_queue_handler(queue_handler)
+        atexit.register(queue_handler.stop)
 
         # Set the overall log level
         self.app.logger.setLevel(logging.INFO)
+
+        self.register_request_id()
+
+    def _replace_queue_handler(self, queue_handler):
+        # create_app may run more than once per process (tests), keep a single pipeline on the shared logger
+        for handler in list(self.app.logger.handlers):
+            if isinstance(handler, ProcessSafeQueueHandler):
+                handler.stop()
+                self.app.logger.removeHandler(handler)
+        self.app.logger.addHandler(queue_handler)
+
+    def register_request_id(self):
+        log_requests = self.app.config.get('LOG_REQUESTS', False)
+
+        @self.app.before_request
+        def assign_request_id():
+            g.request_start_time = time.perf_counter()
+            # Reuse the id given by nginx or the caller so records can be correlated across services
+            request_id = request.headers.get(REQUEST_ID_HEADER, '')
+            g.request_id = request_id if VALID_REQUEST_ID.match(request_id) else uuid.uuid4().hex
+
+        @self.app.after_request
+        def add_request_id(response):
+            request_id = g.get('request_id')
+            if request_id:
+                response.headers[REQUEST_ID_HEADER] = request_id
+            if log_requests and g.get('request_start_time'):
+                duration_ms = round((time.perf_counter() - g.request_start_time) * 1000, 2)
+                self.app.logger.info(f'{request.method} {request.path} {response.status_code} {duration_ms} ms',
+                                     extra={'status': response.status_code, 'duration_ms': duration_ms})
+            return response
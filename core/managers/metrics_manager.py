@@ -0,0 +1,108 @@
+import atexit
+import os
+import threading
+import time
+
+from flask import g, request
+
+from core.metrics.metrics import CACHE_HITS, CACHE_MISSES, registry
+
+REQUESTS = registry.counter(
+    'uvlhub_http_requests_total', 'HTTP requests handled.', labels=('method', 'endpoint', 'status'))
+REQUEST_LATENCY = registry.histogram(
+    'uvlhub_http_request_duration_seconds', 'Time spent handling HTTP requests.', labels=('method', 'endpoint'))
+REQUESTS_IN_FLIGHT = registry.gauge('uvlhub_http_requests_in_flight', 'HTTP requests being handled right now.')
+
+DB_POOL_SIZE = registry.gauge('uvlhub_db_pool_size', 'Connections kept by the pool.', labels=('bind',))
+DB_POOL_CHECKED_OUT = registry.gauge('uvlhub_db_pool_checked_out', 'Connections in use.', labels=('bind',))
+DB_POOL_OVERFLOW = registry.gauge('uvlhub_db_pool_overflow', 'Connections open over pool_size.', labels=('bind',))
+DB_POOL_CHECKOUTS = registry.counter('uvlhub_db_pool_checkouts_total', 'Connection checkouts.', labels=('bind',))
+DB_POOL_TIMEOUTS = registry.counter(
+    'uvlhub_db_pool_timeouts_total', 'Checkouts that gave up after pool_timeout.', labels=('bind',))
+DB_POOL_WAIT = registry.counter(
+    'uvlhub_db_pool_wait_seconds_total', 'Time spent waiting for a connection.', labels=('bind',))
+
+
+class MetricsManager:
+    """
+    Records request metrics and exposes them, with the values of other subsystems, for /metrics. Under gunicorn
+    set METRICS_DIR to a directory shared by the workers; each one flushes its values there every
+    METRICS_FLUSH_INTERVAL seconds and a scrape merges them all.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 5)
+        self._flusher_pid = None
+        self._flusher_lock = threading.Lock()
+
+    def register_metrics(self):
+        if not self.app.config.get('METRICS_ENABLED', True):
+            return
+
+        self.app.extensions['metrics'] = self
+        registry.directory = self.app.config.get('METRICS_DIR') or None
+        registry.register_collector('db_pool', self.collect_pool_stats)
+        registry.register_collector('compression_cache', self.collect_compression_cache)
+
+        @self.app.before_request
+        def start_request_metrics():
+            self.ensure_flusher()
+            g._metrics_start_time = time.perf_counter()
+            g._metrics_in_flight = True
+            REQUESTS_IN_FLIGHT.inc()
+
+        @self.app.after_request
+        def record_request_metrics(response):
+            start = g.pop('_metrics_start_time', None)
+            if start is not None:
+                endpoint = request.endpoint or 'unmatched'
+                REQUEST_LATENCY.observe(time.perf_counter() - start, method=request.method, endpoint=endpoint)
+                REQUESTS.inc(method=request.method, endpoint=endpoint, status=response.status_code)
+            return response
+
+        @self.app.teardown_request
+        def end_request_metrics(exc):
+            if g.pop('_metrics_in_flight', False):
+                REQUESTS_IN_FLIGHT.dec()
+
+    def ensure_flusher(self):
+        """Starts the snapshot thread once per process (threads do not survive gunicorn's fork)."""
+        if not registry.directory or self._flusher_pid == os.getpid():
+            return
+        with self._flusher_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+
+            def flush():
+                while True:
+                    time.sleep(self.flush_interval)
+                    registry.write_snapshot()
+
+            threading.Thread(target=flush, name='metrics-flusher', daemon=True).start()
+            atexit.register(registry.write_snapshot)
+
+    def render(self):
+        return registry.render()
+
+    def collect_pool_stats(self):
+        database = self.app.extensions.get('database')
+        if database is None:
+            return
+        for bind, stats in database.pool_stats().items():
+            if 'checked_out' not in stats:
+                continue
+            DB_POOL_SIZE.set(stats['pool_size'], bind=bind)
+            DB_POOL_CHECKED_OUT.set(stats['checked_out'], bind=bind)
+            DB_POOL_OVERFLOW.set(stats['overflow'], bind=bind)
+            DB_POOL_CHECKOUTS.set_total(stats['checkouts'], bind=bind)
+            DB_POOL_TIMEOUTS.set_total(stats['timeouts'], bind=bind)
+            DB_POOL_WAIT.set_total(stats['wait_seconds_total'], bind=bind)
+
+    def collect_compression_cache(self):
+        compression = self.app.extensions.get('compression')
+        if compression is None:
+            return
+        CACHE_HITS.set_total(compression.cache.hits, cache='compression')
+        CACHE_MISSES.set_total(compression.cache.misses, cache='compression')
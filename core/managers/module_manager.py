@@ -1,11 +1,16 @@
 # module_manager.py
+import json
+import logging
 import os
 import importlib.util
+import time
 from flask import Blueprint
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 class ModuleManager:
     def __init__(self, app):
@@ -14,6 +19,7 @@ class ModuleManager:
         working_dir = os.getenv('WORKING_DIR', '')
         self.modules_dir = os.path.join(working_dir, 'app/modules')
         self.ignored_modules_file = os.path.join(working_dir, '.moduleignore')
+        self.manifest_file = os.getenv('MODULE_MANIFEST_FILE', os.path.join(working_dir, '.module_manifest.json'))
         self.ignored_modules = self._load_ignored_modules()
 
     def _load_ignored_modules(self):
@@ -23,42 +29,75 @@ class ModuleManager:
                 ignored_modules = [line.strip() for line in f.readlines()]
         return ignored_modules
 
+    def _is_module(self, module_name):
+        module_path = os.path.join(self.modules_dir, module_name)
+        return (os.path.isdir(module_path) and not module_name.startswith('__') and
+                os.path.exists(os.path.join(module_path, '__init__.py')) and
+                module_name != '.pytest_cache')
+
+    def _scan_modules(self):
+        return sorted(module_name for module_name in os.listdir(self.modules_dir) if self._is_module(module_name))
+
+    def _manifest_signature(self):
+        # Creating or removing a module changes the mtime of app/modules; editing .moduleignore changes its own
+        signature = [os.stat(self.modules_dir).st_mtime_ns]
+        if os.path.exists(self.ignored_modules_file):
+            signature.append(os.stat(self.ignored_modules_file).st_mtime_ns)
+        return signature
+
+    def discover_modules(self):
+        """
+        Returns the names of all modules in app/modules, using the manifest file when it is still up to date
+        so that the directory does not have to be scanned on every boot.
+        """
+        signature = self._manifest_signature()
+        try:
+            with open(self.manifest_file, 'r') as f:
+                manifest = json.load(f)
+            if manifest.get('signature') == signature:
+                return manifest['modules']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        modules = self._scan_modules()
+        try:
+            with open(self.manifest_file, 'w') as f:
+                json.dump({'signature': signature, 'modules': modules}, f)
+        except OSError as e:
+            logger.warning(f"Could not write module manifest '{self.manifest_file}': {e}")
+        return modules
+
     def register_modules(self):
         self.app.modules = {}
         self.app.blueprint_url_prefixes = {}
+        self.app.module_registration_times = {}
 
-        for module_name in os.listdir(self.modules_dir):
+        for module_name in self.discover_modules():
 
             if module_name in self.ignored_modules:
                 continue
 
-            module_path = os.path.join(self.modules_dir, module_name)
-            if (os.path.isdir(module_path) and not module_name.startswith('__') and
-                    os.path.exists(os.path.join(module_path, '__init__.py')) and
-                    module_name != '.pytest_cache'):
-                try:
-                    routes_module = importlib.import_module(f'app.modules.{module_name}.routes')
-                    for item in dir(routes_module):
-                        if isinstance(getattr(routes_module, item), Blueprint):
-                            blueprint = getattr(routes_module, item)
-                            self.app.register_blueprint(blueprint)
-                except ModuleNotFoundError as e:
-                    print(
-                        f"Error registering modules: Could not load the module "
-                        f"for Module '{module_name}': {e}")
+            self.register_module(module_name)
+
+        if os.getenv('STARTUP_PROFILE', 'False').lower() == 'true':
+            self.print_registration_times()
 
     def register_module(self, module_name):
-        module_path = os.path.join(self.modules_dir, module_name)
-        if os.path.isdir(module_path) and not module_name.startswith('__'):
-            try:
-                routes_module = importlib.import_module(f'app.modules.{module_name}.routes')
-                for item in dir(routes_module):
-                    if isinstance(getattr(routes_module, item), Blueprint):
-                        blueprint = getattr(routes_module, item)
-                        self.app.register_module(blueprint)
-                return
-            except ModuleNotFoundError as e:
-                print(f"Could not load the module for Blueprint '{module_name}': {e}")
+        start = time.perf_counter()
+        try:
+            routes_module = importlib.import_module(f'app.modules.{module_name}.routes')
+            for item in dir(routes_module):
+                if isinstance(getattr(routes_module, item), Blueprint):
+                    blueprint = getattr(routes_module, item)
+                    self.app.register_blueprint(blueprint)
+                    self.app.modules[blueprint.name] = blueprint
+                    self.app.blueprint_url_prefixes[blueprint.name] = blueprint.url_prefix
+        except ModuleNotFoundError as e:
+            print(
+                f"Error registering modules: Could not load the module "
+                f"for Module '{module_name}': {e}")
+        finally:
+            self.app.module_registration_times[module_name] = time.perf_counter() - start
 
     def unregister_blueprints(self):
         for name, blueprint in list(self.app.modules.items()):
@@ -75,13 +114,13 @@ class ModuleManager:
             url_prefix = self.app.blueprint_url_prefixes.get(name, 'No URL prefix set')
             print(f"Name: {name}, URL prefix: {url_prefix}")
 
+    def print_registration_times(self):
+        print("Module registration times")
+        times = sorted(self.app.module_registration_times.items(), key=lambda item: item[1], reverse=True)
+        for name, seconds in times:
+            print(f"{name:<20} {seconds * 1000:>8.1f} ms")
+
     def get_modules(self):
-        all_modules = []
-        for module_name in os.listdir(self.modules_dir):
-            module_path = os.path.join(self.modules_dir, module_name)
-            if (os.path.isdir(module_path) and not module_name.startswith('__') and
-                    os.path.exists(os.path.join(module_path, '__init__.py')) and
-                    module_name != '.pytest_cache'):
-                all_modules.append(module_name)
+        all_modules = self._scan_modules()
         loaded_modules = [m for m in all_modules if m not in self.ignored_modules]
         return loaded_modules, self.ignored_modules
@@ -0,0 +1,137 @@
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+
+from flask import g, has_request_context
+from markupsafe import escape
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def fingerprint(statement):
+    """Normalizes a SQL statement so that executions differing only in parameters or IN-list size match."""
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _NUMBER_LITERAL.sub('?', statement)
+    return _PLACEHOLDER_LIST.sub('(?)', statement)
+
+
+class RequestQueryStats:
+    """Queries executed while handling one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints = Counter()
+        self.fingerprint_times = defaultdict(float)
+
+    def record(self, statement, duration):
+        key = fingerprint(statement)
+        self.count += 1
+        self.total_time += duration
+        self.fingerprints[key] += 1
+        self.fingerprint_times[key] += duration
+
+    def repeated(self, threshold):
+        """Fingerprints executed at least `threshold` times, the usual sign of an N+1 query in a loop."""
+        return [(key, count) for key, count in self.fingerprints.most_common() if count >= threshold]
+
+
+class QueryInstrumentationManager:
+    def __init__(self, app, db):
+        self.app = app
+        self.db = db
+        self.repeated_threshold = app.config.get('SQL_REPEATED_QUERY_THRESHOLD', 5)
+
+    def register_instrumentation(self):
+        if not self.app.config.get('SQL_INSTRUMENTATION_ENABLED', False):
+            return
+
+        self.app.extensions['sql_instrumentation'] = self
+
+        with self.app.app_context():
+            for engine in self.db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self.after_cursor_execute)
+                event.listen(engine, 'handle_error', self.handle_error)
+
+        @self.app.before_request
+        def start_query_stats():
+            g._query_stats = RequestQueryStats()
+
+        @self.app.after_request
+        def report_query_stats(response):
+            stats = g.pop('_query_stats', None)
+            if stats is None:
+                return response
+            self.add_headers(response, stats)
+            self.warn_repeated(stats)
+            if self.app.debug:
+                self.inject_toolbar(response, stats)
+            return response
+
+    @staticmethod
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @staticmethod
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        QueryInstrumentationManager.record(conn, statement)
+
+    @staticmethod
+    def handle_error(exception_context):
+        # A statement that raised never reaches after_cursor_execute, its start time must not stay behind
+        conn = exception_context.connection
+        if conn is not None and exception_context.execution_context is not None and conn.info.get('query_start_time'):
+            QueryInstrumentationManager.record(conn, exception_context.statement or '')
+
+    @staticmethod
+    def record(conn, statement):
+        start = conn.info['query_start_time'].pop()
+        if has_request_context():
+            stats = g.get('_query_stats')
+            if stats is not None:
+                stats.record(statement, time.perf_counter() - start)
+
+    def add_headers(self, response, stats):
+        response.headers['X-Query-Count'] = str(stats.count)
+        response.headers['X-Query-Repeated'] = str(len(stats.repeated(self.repeated_threshold)))
+        server_timing = f'db;dur={stats.total_time * 1000:.2f};desc="{stats.count} queries"'
+        if 'Server-Timing' in response.headers:
+            server_timing = f"{response.headers['Server-Timing']}, {server_timing}"
+        response.headers['Server-Timing'] = server_timing
+
+    def warn_repeated(self, stats):
+        for key, count in stats.repeated(self.repeated_threshold):
+            logger.warning(f"Possible N+1: {count} executions of: {key[:300]}")
+
+    def inject_toolbar(self, response, stats):
+        if response.mimetype != 'text/html' or response.direct_passthrough or response.is_streamed:
+            return
+
+        rows = ''.join(
+            f'<tr><td style="padding-right:8px">{count}x</td>'
+            f'<td style="padding-right:8px">{stats.fingerprint_times[key] * 1000:.1f} ms</td>'
+            f'<td><code>{escape(key[:200])}</code></td></tr>'
+            for key, count in stats.fingerprints.most_common(10)
+        )
+        repeated = len(stats.repeated(self.repeated_threshold))
+        toolbar = (
+            '<details id="sql-debug-toolbar" style="position:fixed;bottom:0;right:0;z-index:9999;max-width:60%;'
+            'max-height:50%;overflow:auto;background:#222;color:#eee;font:12px monospace;padding:6px 10px">'
+            f'<summary>SQL: {stats.count} queries, {stats.total_time * 1000:.1f} ms'
+            f'{f", {repeated} repeated" if repeated else ""}</summary>'
+            f'<table>{rows}</table></details>'
+        )
+
+        data = response.get_data(as_text=True)
+        index = data.rfind('</body>')
+        if index != -1:
+            response.set_data(data[:index] + toolbar + data[index:])
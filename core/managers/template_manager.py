@@ -0,0 +1,33 @@
+import logging
+
+from jinja2 import FileSystemBytecodeCache
+
+from core.cache.backends import private_directory
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateManager:
+    """
+    Stores compiled templates in JINJA_BYTECODE_CACHE_DIR, so gunicorn workers and restarts load the bytecode
+    compiled by the first process instead of parsing every template again. Jinja checks the source checksum of
+    each cached entry, so a changed template is recompiled rather than served stale. Jinja loads the bytecode
+    with marshal, so the directory must be private to the user of the app (see `private_directory`).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.bytecode_cache = None
+
+    def configure_templates(self):
+        # jinja_options only apply to the environment created on first use of app.jinja_env
+        cache_dir = self.app.config.get('JINJA_BYTECODE_CACHE_DIR')
+        if cache_dir:
+            try:
+                private_directory(cache_dir)
+            except OSError as e:
+                logger.warning(f"Jinja bytecode cache disabled, cannot use '{cache_dir}': {e}")
+            else:
+                self.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+                self.app.jinja_options = {**self.app.jinja_options, 'bytecode_cache': self.bytecode_cache}
+        self.app.extensions['templates'] = self
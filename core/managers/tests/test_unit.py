@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import re
+import threading
+
+import pytest
+from flask import Flask
+
+from core.managers.config_manager import PROJECT_ROOT, project_path
+from core.managers.job_manager import Job, JobManager, JobQueueFull
+from core.managers.logging_manager import (
+    JsonFormatter,
+    PerProcessRotatingFileHandler,
+    ProcessSafeQueueHandler,
+    RequestContextFilter
+)
+
+
+def test_request_id_is_generated_or_propagated(test_client):
+    generated = test_client.get('/team').headers['X-Request-ID']
+    propagated = test_client.get('/team', headers={'X-Request-ID': 'abc-123'}).headers['X-Request-ID']
+    rejected = test_client.get('/team', headers={'X-Request-ID': '<script>' + 'x' * 200}).headers['X-Request-ID']
+
+    assert re.fullmatch(r'[0-9a-f]{32}', generated)
+    assert propagated == 'abc-123'
+    assert re.fullmatch(r'[0-9a-f]{32}', rejected)
+
+
+def test_queued_json_logging_includes_request_context(test_client):
+    records = []
+    memory_handler = logging.Handler()
+    memory_handler.emit = lambda record: records.append(memory_handler.format(record))
+    memory_handler.setFormatter(JsonFormatter())
+
+    queue_handler = ProcessSafeQueueHandler([memory_handler], queue_size=10)
+    queue_handler.addFilter(RequestContextFilter())
+    logger = logging.getLogger('uvlhub.test.queued')
+    logger.addHandler(queue_handler)
+    try:
+        with test_client.application.test_request_context('/dataset/list', headers={'X-Request-ID': 'req-1'}):
+            test_client.application.preprocess_request()
+            try:
+                raise ValueError('boom')
+            except ValueError:
+                logger.exception('Something failed for %s', 'dataset 1')
+    finally:
+        logger.removeHandler(queue_handler)
+        # Stopping the listener drains the queue
+        queue_handler.stop()
+
+    record = json.loads(records[0])
+    assert record['message'] == 'Something failed for dataset 1'
+    assert record['level'] == 'ERROR'
+    assert record['request_id'] == 'req-1'
+    assert record['path'] == '/dataset/list'
+    assert record['elapsed_ms'] >= 0
+    assert 'ValueError: boom' in record['exception']
+
+
+def test_log_file_pid_is_resolved_in_each_worker(tmp_path, monkeypatch):
+    file_handler = PerProcessRotatingFileHandler(str(tmp_path / 'app-{pid}.log'))
+    file_handler.setFormatter(logging.Formatter('%(message)s'))
+    queue_handler = ProcessSafeQueueHandler([file_handler], queue_size=10)
+    logger = logging.getLogger('uvlhub.test.per_process')
+    logger.addHandler(queue_handler)
+
+    # The handler was created in the master; a forked worker writes to the file of its own pid
+    monkeypatch.setattr(os, 'getpid', lambda: 12345)
+    try:
+        logger.error('from the worker')
+    finally:
+        logger.removeHandler(queue_handler)
+        queue_handler.stop()
+        file_handler.close()
+
+    assert (tmp_path / 'app-12345.log').read_text() == 'from the worker\n'
+
+
+@pytest.fixture
+def job_manager():
+    app = Flask('jobs')
+    app.config.update(JOBS_WORKERS=1, JOBS_QUEUE_SIZE=2, JOBS_HISTORY=10)
+    manager = JobManager(app)
+    manager.register_jobs()
+    return manager
+
+
+def test_jobs_reject_work_beyond_the_queue_size(job_manager):
+    release = threading.Event()
+    running = job_manager.submit('block', release.wait)
+    while running.status != Job.RUNNING:
+        running.wait(0.01)
+    queued = [job_manager.submit('noop', lambda: None) for _ in range(2)]
+
+    with pytest.raises(JobQueueFull):
+        job_manager.submit('noop', lambda: None)
+    assert job_manager.stats()['queued'] == 2
+
+    release.set()
+    assert job_manager.join(timeout=5)
+    assert [job.status for job in [running] + queued] == [Job.DONE] * 3
+
+
+def test_jobs_with_the_same_key_are_queued_once(job_manager):
+    release = threading.Event()
+    calls = []
+    job_manager.submit('block', release.wait)
+    first = job_manager.submit('count', calls.append, 1, key='dataset:1')
+    second = job_manager.submit('count', calls.append, 2, key='dataset:1')
+
+    release.set()
+    job_manager.join(timeout=5)
+
+    assert first is second
+    assert calls == [1]
+    # Once finished, the key can be queued again
+    assert job_manager.submit('count', calls.append, 3, key='dataset:1') is not first
+
+
+def test_failed_jobs_report_their_error(job_manager):
+    def fail():
+        raise ValueError('broken archive')
+
+    job = job_manager.submit('fail', fail)
+    job.wait(5)
+
+    assert job.to_dict()['status'] == Job.FAILED
+    assert job.error == 'broken archive'
+
+
+def test_cache_directories_do_not_depend_on_the_current_directory(monkeypatch):
+    monkeypatch.delenv('WORKING_DIR', raising=False)
+    assert project_path('cache/jinja') == os.path.join(PROJECT_ROOT, 'cache/jinja')
+    assert os.path.isabs(project_path('cache/jinja'))
+
+    monkeypatch.setenv('WORKING_DIR', '/app/')
+    assert project_path('cache/jinja') == '/app/cache/jinja'
+    assert project_path('/var/cache/uvlhub') == '/var/cache/uvlhub'
@@ -0,0 +1,162 @@
+import functools
+import hmac
+import logging
+import random
+
+from flask import before_render_template, g, request, template_rendered
+from sqlalchemy import event
+
+from core.tracing.tracer import Trace, TraceStore, activate, current_trace, deactivate
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+TRACE_ID_HEADER = 'X-Trace-Id'
+
+
+class TracingManager:
+    """
+    Samples requests and records where their wall time goes: SQL statements, Jinja rendering, file reads and
+    outgoing HTTP calls. A request is traced when it sends the X-Profile header with PROFILING_TOKEN, or at random
+    with probability PROFILING_SAMPLE_RATE. Finished traces are written to PROFILING_TRACES_DIR and can be read
+    with `rosemary profile:traces`. Requests that are not traced only pay for a context variable lookup per hook.
+    """
+
+    def __init__(self, app, db):
+        self.app = app
+        self.db = db
+        self.token = app.config.get('PROFILING_TOKEN')
+        self.sample_rate = float(app.config.get('PROFILING_SAMPLE_RATE', 0.0))
+        self.max_spans = app.config.get('PROFILING_MAX_SPANS', 2000)
+        self.store = TraceStore(app.config.get('PROFILING_TRACES_DIR', 'traces'),
+                                app.config.get('PROFILING_MAX_TRACES', 500))
+
+    def register_tracing(self):
+        if not self.app.config.get('PROFILING_ENABLED', True):
+            return
+
+        self.app.extensions['tracing'] = self
+
+        with self.app.app_context():
+            for engine in self.db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self.after_cursor_execute)
+                event.listen(engine, 'handle_error', self.handle_error)
+
+        before_render_template.connect(self.before_render_template, self.app)
+        template_rendered.connect(self.template_rendered, self.app)
+        instrument_requests()
+
+        @self.app.before_request
+        def start_trace():
+            reason = self.sampling_reason()
+            if reason is None:
+                return
+            trace = Trace(request.method, request.full_path.rstrip('?'), reason, self.max_spans)
+            g._trace = trace
+            g._trace_token = activate(trace)
+
+        @self.app.after_request
+        def add_trace_header(response):
+            trace = g.get('_trace')
+            if trace is not None:
+                response.headers[TRACE_ID_HEADER] = trace.id
+                trace.status = response.status_code
+            return response
+
+        @self.app.teardown_request
+        def finish_trace(exc):
+            trace = g.pop('_trace', None)
+            token = g.pop('_trace_token', None)
+            if token is not None:
+                deactivate(token)
+            if trace is None:
+                return
+            trace.finish(trace.status or 500)
+            try:
+                self.store.save(trace)
+            except OSError:
+                logger.exception('Could not save trace %s', trace.id)
+
+    def sampling_reason(self):
+        header = request.headers.get(PROFILE_HEADER)
+        if header is not None:
+            if self.token:
+                if hmac.compare_digest(header, self.token):
+                    return 'header'
+            elif self.app.debug or self.app.testing:
+                # Without a token, profiling on demand is only allowed in development and testing
+                return 'header'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    @staticmethod
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        trace = current_trace()
+        if trace is None:
+            return
+        name = ' '.join(statement.split())[:500]
+        span = trace.start_span('sql', name, {'executemany': True} if executemany else None)
+        conn.info.setdefault('trace_spans', []).append((trace, span))
+
+    @staticmethod
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get('trace_spans')
+        if spans:
+            trace, span = spans.pop()
+            trace.end_span(span)
+
+    @staticmethod
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        spans = connection.info.get('trace_spans') if connection is not None else None
+        if spans:
+            trace, span = spans.pop()
+            trace.end_span(span)
+            if span is not None:
+                span.meta = {'error': type(exception_context.original_exception).__name__}
+
+    @staticmethod
+    def before_render_template(sender, template, context, **extra):
+        trace = current_trace()
+        if trace is None:
+            return
+        g.setdefault('_trace_template_spans', []).append(trace.start_span('template', template.name or '<string>'))
+
+    @staticmethod
+    def template_rendered(sender, template, context, **extra):
+        trace = current_trace()
+        spans = g.get('_trace_template_spans')
+        if trace is not None and spans:
+            trace.end_span(spans.pop())
+
+
+def instrument_requests():
+    """Wraps requests.Session.send, which every requests call goes through, once per process."""
+    try:
+        import requests
+    except ImportError:
+        return
+
+    send = requests.Session.send
+    if getattr(send, '_traced', False):
+        return
+
+    @functools.wraps(send)
+    def traced_send(session, prepared_request, **kwargs):
+        trace = current_trace()
+        if trace is None:
+            return send(session, prepared_request, **kwargs)
+        url = prepared_request.url.split('?', 1)[0]
+        span = trace.start_span('http', f'{prepared_request.method} {url}')
+        try:
+            response = send(session, prepared_request, **kwargs)
+            if span is not None:
+                span.meta = {'status': response.status_code}
+            return response
+        finally:
+            trace.end_span(span)
+
+    traced_send._traced = True
+    requests.Session.send = traced_send
@@ -0,0 +1,43 @@
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupManager:
+    """
+    Loads shared read-only state (module manifest, compiled templates, parsers...) up front. When gunicorn runs
+    with --preload this happens once in the master, so forked workers share the warm state copy-on-write.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.warmers = {}
+        self.timings = {}
+
+    def register_warmup(self):
+        self.app.extensions['warmup'] = self
+        self.register('templates', self.warm_templates)
+
+    def register(self, name, func):
+        """Registers a callable taking the app; modules use it to warm their own state."""
+        self.warmers[name] = func
+
+    def warm(self):
+        with self.app.app_context():
+            for name, func in self.warmers.items():
+                start = time.perf_counter()
+                try:
+                    func(self.app)
+                except Exception as e:
+                    logger.warning(f"Warmup '{name}' failed: {e}")
+                finally:
+                    self.timings[name] = time.perf_counter() - start
+        return self.timings
+
+    @staticmethod
+    def warm_templates(app):
+        # Also fills the shared Jinja bytecode cache (TemplateManager), so workers load instead of compiling
+        for template_name in app.jinja_env.list_templates(extensions=['html']):
+            app.jinja_env.get_template(template_name)
@@ -0,0 +1,247 @@
+import glob
+import json
+import math
+import os
+import tempfile
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    return repr(float(value))
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric '{self.name}' expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, **labels):
+        """For collectors mirroring a cumulative count kept elsewhere (e.g. a cache's hit counter)."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down. `multiprocess_mode` decides how the values of several worker processes are
+    combined: 'sum' (e.g. in-flight requests), 'max' or 'min'. Values of dead processes are dropped.
+    """
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), multiprocess_mode='sum'):
+        super().__init__(name, documentation, labels)
+        self.multiprocess_mode = multiprocess_mode
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Per-bucket (non-cumulative) counts, then sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+
+class MetricsRegistry:
+    """
+    Process-local metrics. With a `directory`, every process writes its values to its own snapshot file and
+    rendering merges the snapshots of all processes, so any gunicorn worker can answer a scrape for all of them.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = {}
+        self.directory = None
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+                    raise ValueError(f"Metric '{metric.name}' is already registered with a different definition")
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=(), multiprocess_mode='sum'):
+        return self._register(Gauge(name, documentation, labels, multiprocess_mode))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def register_collector(self, name, collector):
+        """
+        Registers a callable run before every snapshot, used to copy values kept elsewhere (pool stats, cache
+        counters, queue depths...) into metrics. Registering the same name again replaces the collector.
+        """
+        self.collectors[name] = collector
+
+    def collect(self):
+        for collector in list(self.collectors.values()):
+            collector()
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.directory, f'metrics_{pid}.json')
+
+    def write_snapshot(self):
+        if not self.directory:
+            return
+        self.collect()
+        os.makedirs(self.directory, exist_ok=True)
+        data = json.dumps({'pid': os.getpid(), 'metrics': self.snapshot()})
+        # Write then rename, so readers never see a half written file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.metrics_')
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        os.replace(temp_path, self._snapshot_path(os.getpid()))
+
+    def _read_snapshots(self):
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics_*.json')):
+            try:
+                with open(path, 'r') as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    @staticmethod
+    def _is_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def merged_values(self):
+        """Values of every metric, combined across all the processes that wrote a snapshot."""
+        if not self.directory:
+            self.collect()
+            return self.snapshot()
+
+        self.write_snapshot()
+        merged = {name: {} for name in self.metrics}
+        for snapshot in self._read_snapshots():
+            alive = self._is_alive(snapshot['pid'])
+            for name, samples in snapshot['metrics'].items():
+                metric = self.metrics.get(name)
+                if metric is None or (isinstance(metric, Gauge) and not alive):
+                    continue
+                values = merged[name]
+                for key, value in samples:
+                    key = tuple(key)
+                    if key not in values:
+                        values[key] = list(value) if isinstance(value, list) else value
+                    elif isinstance(metric, Histogram):
+                        values[key] = [a + b for a, b in zip(values[key], value)]
+                    elif isinstance(metric, Gauge) and metric.multiprocess_mode == 'max':
+                        values[key] = max(values[key], value)
+                    elif isinstance(metric, Gauge) and metric.multiprocess_mode == 'min':
+                        values[key] = min(values[key], value)
+                    else:
+                        values[key] = values[key] + value
+        return {name: [[list(key), value] for key, value in values.items()] for name, values in merged.items()}
+
+    def render(self):
+        """Renders all metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        values = self.merged_values()
+        for name in sorted(self.metrics):
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for key, value in sorted(values.get(name, []), key=lambda sample: sample[0]):
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    bounds = list(metric.buckets) + [math.inf]
+                    for bound, count in zip(bounds, value[:-1]):
+                        cumulative += count
+                        labels = _format_labels(metric.label_names, key, [('le', _format_value(bound))])
+                        lines.append(f'{name}_bucket{labels} {_format_value(cumulative)}')
+                    labels = _format_labels(metric.label_names, key)
+                    lines.append(f'{name}_sum{labels} {_format_value(value[-1])}')
+                    lines.append(f'{name}_count{labels} {_format_value(cumulative)}')
+                else:
+                    lines.append(f'{name}{_format_labels(metric.label_names, key)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+CACHE_HITS = registry.counter('uvlhub_cache_hits_total', 'Cache lookups that found an entry.', labels=('cache',))
+CACHE_MISSES = registry.counter('uvlhub_cache_misses_total', 'Cache lookups that found nothing.', labels=('cache',))
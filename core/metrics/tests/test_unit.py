@@ -0,0 +1,92 @@
+import json
+import os
+import re
+
+from core.metrics.metrics import registry
+
+
+METRIC_NAME = r'[a-zA-Z_:][a-zA-Z0-9_:]*'
+LABELS = r'(\{[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\.)*"(?:,[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\.)*")*\})?'
+VALUE = r'(?:[-+]?(?:\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|Inf)|NaN)'
+SAMPLE_LINE = re.compile(rf'^({METRIC_NAME}){LABELS} ({VALUE})$')
+TYPE_LINE = re.compile(rf'^# TYPE ({METRIC_NAME}) (counter|gauge|histogram|summary|untyped)$')
+HELP_LINE = re.compile(rf'^# HELP ({METRIC_NAME}) .*$')
+
+
+def parse_exposition(text):
+    """
+    Validates the Prometheus text format line by line and returns {family: (type, [(name, labels, value)])}.
+    Every sample must belong to a family declared by a preceding TYPE line.
+    """
+    assert text.endswith('\n')
+    families = {}
+    for line in text.splitlines():
+        if match := TYPE_LINE.match(line):
+            assert match.group(1) not in families, f"Duplicated TYPE for {match.group(1)}"
+            families[match.group(1)] = (match.group(2), [])
+            continue
+        if HELP_LINE.match(line):
+            continue
+        match = SAMPLE_LINE.match(line)
+        assert match, f"Invalid exposition line: {line!r}"
+        name, labels, value = match.groups()
+        family = next((f for f in families if name in (f, f + '_bucket', f + '_sum', f + '_count')), None)
+        assert family is not None, f"Sample {name} has no TYPE"
+        families[family][1].append((name, labels or '', float(value)))
+    return families
+
+
+def render(test_client):
+    return test_client.application.extensions['metrics'].render()
+
+
+def test_metrics_exposition_format(test_client):
+    test_client.get('/team')
+    families = parse_exposition(render(test_client))
+
+    metric_type, samples = families['uvlhub_http_request_duration_seconds']
+    assert metric_type == 'histogram'
+    series = [s for s in samples if 'endpoint="team.index"' in s[1]]
+    buckets = [value for name, labels, value in series if name.endswith('_bucket')]
+    count = next(value for name, labels, value in series if name.endswith('_count'))
+    assert buckets == sorted(buckets), "Histogram buckets must be cumulative"
+    assert series[len(buckets) - 1][1].endswith('le="+Inf"}') and buckets[-1] == count
+
+    assert families['uvlhub_http_requests_in_flight'][0] == 'gauge'
+    assert families['uvlhub_db_pool_checked_out'][1]
+
+
+def test_metrics_count_requests(test_client):
+    def requests_to_team():
+        families = parse_exposition(render(test_client))
+        return sum(value for name, labels, value in families['uvlhub_http_requests_total'][1]
+                   if 'endpoint="team.index"' in labels and 'status="200"' in labels)
+
+    before = requests_to_team()
+    test_client.get('/team')
+    assert requests_to_team() == before + 1
+
+
+def test_metrics_are_merged_across_processes(test_client, tmp_path):
+    counter = registry.counter('uvlhub_test_events_total', 'Test events.', labels=('kind',))
+    gauge = registry.gauge('uvlhub_test_busy', 'Test busy workers.')
+    counter.inc(2, kind='a')
+    gauge.set(1)
+
+    def other_process_snapshot(pid):
+        return {'pid': pid, 'metrics': {'uvlhub_test_events_total': [[['a'], 3]], 'uvlhub_test_busy': [[[], 4]]}}
+
+    (tmp_path / 'metrics_1.json').write_text(json.dumps(other_process_snapshot(os.getppid())))
+    # A worker that already exited: its counters still count, its gauges are dropped
+    (tmp_path / 'metrics_2.json').write_text(json.dumps(other_process_snapshot(2 ** 22 + 1)))
+
+    registry.directory = str(tmp_path)
+    try:
+        families = parse_exposition(render(test_client))
+    finally:
+        registry.directory = None
+        registry.metrics.pop('uvlhub_test_events_total')
+        registry.metrics.pop('uvlhub_test_busy')
+
+    assert families['uvlhub_test_events_total'][1] == [('uvlhub_test_events_total', '{kind="a"}', 8.0)]
+    assert families['uvlhub_test_busy'][1] == [('uvlhub_test_busy', '', 5.0)]
@@ -1,6 +1,10 @@
-from typing import Generic, List, NoReturn, Optional, TypeVar, Union
+from typing import Generic, Iterable, List, NoReturn, Optional, TypeVar, Union
+
+from sqlalchemy import bindparam, delete, insert, inspect, select, tuple_, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 
 import app
+from core.decorators.decorators import read_from_replica
 
 T = TypeVar('T')
 
@@ -19,11 +23,33 @@ class BaseRepository(Generic[T]):
             self.session.flush()
         return instance
 
+    @read_from_replica
     def get_by_id(self, id: int) -> Optional[T]:
+        return self._get_by_id(id)
+
+    @read_from_replica
+    def get_by_ids(self, ids: Iterable[int]) -> List[T]:
+        """Fetches all the given primary keys in one query, in the order given. Missing ids are skipped."""
+        ids = list(ids)
+        if not ids:
+            return []
+        primary_key = inspect(self.model).primary_key[0]
+        instances = self.session.query(self.model).filter(primary_key.in_(set(ids))).all()
+        by_id = {getattr(instance, primary_key.key): instance for instance in instances}
+        return [by_id[id] for id in ids if id in by_id]
+
+    @read_from_replica
+    def get_by_column(self, column_name: str, value) -> List[T]:
+        return self._get_by_column(column_name, value)
+
+    # Lookups of read-modify-write methods, always on the primary: a lagging replica could miss a row just written
+    # or return stale values that the write would then save over the current ones
+
+    def _get_by_id(self, id: int) -> Optional[T]:
         instance: Optional[T] = self.model.query.get(id)
         return instance
 
-    def get_by_column(self, column_name: str, value) -> List[T]:
+    def _get_by_column(self, column_name: str, value) -> List[T]:
         instances: List[T] = self.session.query(self.model).filter(getattr(self.model, column_name) == value).all()
         return instances
 
@@ -31,7 +57,7 @@ class BaseRepository(Generic[T]):
         return self.model.query.get_or_404(id)
 
     def update(self, id: int, **kwargs) -> Optional[T]:
-        instance: Optional[T] = self.get_by_id(id)
+        instance: Optional[T] = self._get_by_id(id)
         if instance:
             for key, value in kwargs.items():
                 setattr(instance, key, value)
@@ -40,7 +66,7 @@ class BaseRepository(Generic[T]):
         return None
 
     def delete(self, id: int) -> bool:
-        instance: Optional[T] = self.get_by_id(id)
+        instance: Optional[T] = self._get_by_id(id)
         if instance:
             self.session.delete(instance)
             self.session.commit()
@@ -48,14 +74,125 @@ class BaseRepository(Generic[T]):
         return False
 
     def delete_by_column(self, column_name: str, value) -> bool:
-        instances: List[T] = self.get_by_column(column_name, value)
-        if not instances:
-            return False
+        """Deletes the matching rows with a single DELETE, so ORM-level cascades do not run (see `delete_where`)."""
+        return self.delete_where(getattr(self.model, column_name) == value) > 0
 
-        for instance in instances:
-            self.session.delete(instance)
-        self.session.commit()
-        return True
+    def bulk_create(self, rows: List[dict], commit: bool = True, return_instances: bool = True) -> List[T]:
+        """
+        Inserts one row per dict. Without `return_instances` this is a single executemany INSERT, which the MySQL
+        drivers send as one multi-row statement. Otherwise the instances are fetched with INSERT ... RETURNING in
+        parameter order when the database supports it, or through a flush of all of them at once.
+        """
+        if not rows:
+            return []
+
+        instances: List[T] = []
+        dialect = self.session.get_bind(mapper=self.model).dialect
+        # None values are sent as NULL, so that rows with and without them share the statement
+        if not return_instances:
+            self.session.execute(insert(self.model), rows, execution_options={'render_nulls': True})
+        elif dialect.insert_executemany_returning_sort_by_parameter_order:
+            statement = insert(self.model).returning(self.model, sort_by_parameter_order=True)
+            instances = list(self.session.scalars(statement, rows, execution_options={'render_nulls': True}))
+        else:
+            instances = [self.model(**row) for row in rows]
+            self.session.add_all(instances)
+            self.session.flush()
+
+        if commit:
+            self.session.commit()
+        return instances
+
+    def bulk_update(self, rows: List[dict], commit: bool = True) -> None:
+        """Updates many rows by primary key in one executemany UPDATE; every dict must include the primary key."""
+        if not rows:
+            return
+        self.session.execute(update(self.model), rows)
+        if commit:
+            self.session.commit()
+
+    def bulk_upsert(self, rows: List[dict], index_elements: Optional[List[str]] = None, commit: bool = True) -> int:
+        """
+        Inserts the rows, or updates the existing ones, with a single multi-row statement. `index_elements` are the
+        unique columns identifying a row (the primary key by default); the rest of the given columns are updated.
+        Dialects without an upsert statement select the existing keys first, then insert and update in two
+        executemany statements.
+        """
+        if not rows:
+            return 0
+
+        table = self.model.__table__
+        index_elements = index_elements or [column.name for column in table.primary_key]
+        update_columns = [key for key in rows[0] if key not in index_elements]
+        dialect_name = self.session.get_bind(mapper=self.model).dialect.name
+
+        if dialect_name in ('mysql', 'mariadb'):
+            statement = mysql.insert(table).values(rows)
+            statement = statement.on_duplicate_key_update(
+                {column: statement.inserted[column] for column in update_columns or index_elements})
+        elif dialect_name in ('sqlite', 'postgresql'):
+            dialect_insert = sqlite.insert if dialect_name == 'sqlite' else postgresql.insert
+            statement = dialect_insert(table).values(rows)
+            if update_columns:
+                statement = statement.on_conflict_do_update(
+                    index_elements=index_elements,
+                    set_={column: statement.excluded[column] for column in update_columns})
+            else:
+                statement = statement.on_conflict_do_nothing(index_elements=index_elements)
+        else:
+            return self._upsert_by_select(rows, index_elements, update_columns, commit)
+
+        result = self.session.execute(statement)
+        if commit:
+            self.session.commit()
+        return result.rowcount
+
+    def _upsert_by_select(self, rows, index_elements, update_columns, commit):
+        table = self.model.__table__
+        keys = tuple_(*(table.c[column] for column in index_elements))
+        wanted = {tuple(row[column] for column in index_elements) for row in rows}
+        existing = {tuple(key) for key in self.session.execute(select(*keys.clauses).where(keys.in_(wanted)))}
+
+        new_rows = [row for row in rows if tuple(row[column] for column in index_elements) not in existing]
+        old_rows = [row for row in rows if tuple(row[column] for column in index_elements) in existing]
+        if new_rows:
+            self.session.execute(insert(table), new_rows)
+        if old_rows and update_columns:
+            statement = (
+                update(table)
+                .where(*(table.c[column] == bindparam(f'key_{column}') for column in index_elements))
+                .values({column: bindparam(f'value_{column}') for column in update_columns})
+            )
+            self.session.execute(statement, [
+                {**{f'key_{column}': row[column] for column in index_elements},
+                 **{f'value_{column}': row[column] for column in update_columns}}
+                for row in old_rows
+            ])
+
+        if commit:
+            self.session.commit()
+        return len(rows)
+
+    def delete_where(self, *criteria, commit: bool = True, **filters) -> int:
+        """
+        Deletes every matching row with a single DELETE and returns how many were deleted. Rows are not loaded,
+        so ORM-level cascades do not run; use `delete` for instances that rely on them. Raises ValueError without
+        criteria or filters, use `delete_all` to empty the table.
+        """
+        if not criteria and not filters:
+            raise ValueError("delete_where needs criteria or filters, use delete_all to delete every row")
+        return self._delete(delete(self.model).where(*criteria).filter_by(**filters), commit)
+
+    def delete_all(self, commit: bool = True) -> int:
+        """Deletes every row of the table with a single DELETE and returns how many were deleted."""
+        return self._delete(delete(self.model), commit)
+
+    def _delete(self, statement, commit):
+        result = self.session.execute(statement, execution_options={'synchronize_session': 'fetch'})
+        if commit:
+            self.session.commit()
+        return result.rowcount
 
+    @read_from_replica
     def count(self) -> int:
         return self.model.query.count()
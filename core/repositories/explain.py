@@ -0,0 +1,53 @@
+from typing import List, NamedTuple
+
+from sqlalchemy import event
+
+
+class QueryPlan(NamedTuple):
+    statement: str
+    steps: List[str]
+    full_scans: List[str]
+
+
+class StatementRecorder:
+    """Records the SELECT statements sent to the given engines, with their parameters, while the block runs."""
+
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self.statements = []
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, 'before_cursor_execute', self.record)
+        return self
+
+    def __exit__(self, *exc_info):
+        for engine in self.engines:
+            event.remove(engine, 'before_cursor_execute', self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            self.statements.append((conn.engine, statement, parameters))
+
+
+def explain(engine, statement, parameters=()) -> QueryPlan:
+    """
+    Asks the database how it runs `statement`. A step reading every row of a table is a full scan: `type` ALL
+    in the MySQL/MariaDB plan, or a `SCAN` without an index in the SQLite one.
+    """
+    with engine.connect() as connection:
+        if engine.dialect.name == 'sqlite':
+            rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).mappings().all()
+            steps = [row['detail'] for row in rows]
+            full_scans = [step for step in steps if step.startswith('SCAN ') and ' USING ' not in step]
+        else:
+            rows = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters).mappings().all()
+            steps, full_scans = [], []
+            for row in rows:
+                row = {key.lower(): value for key, value in row.items()}
+                step = (f"{row.get('table')}: type={row.get('type')} key={row.get('key')} rows={row.get('rows')} "
+                        f"{row.get('extra') or ''}").rstrip()
+                steps.append(step)
+                if row.get('type') == 'ALL':
+                    full_scans.append(step)
+    return QueryPlan(statement, steps, full_scans)
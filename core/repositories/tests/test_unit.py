@@ -0,0 +1,115 @@
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.modules.dataset.models import Author
+from app.modules.dataset.repositories import AuthorRepository
+
+
+@pytest.fixture
+def statements(test_client):
+    """Records the SQL statements sent to the database while the test runs."""
+    recorded = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        recorded.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield recorded
+    event.remove(db.engine, 'before_cursor_execute', record)
+    AuthorRepository().delete_all()
+
+
+def test_bulk_create_returns_instances_in_order(statements):
+    authors = AuthorRepository().bulk_create([{'name': f'Author {i}'} for i in range(5)])
+
+    assert [author.name for author in authors] == [f'Author {i}' for i in range(5)]
+    assert all(author.id is not None for author in authors)
+    assert [author.id for author in authors] == sorted(author.id for author in authors)
+
+
+def test_bulk_create_without_instances(statements):
+    assert AuthorRepository().bulk_create([{'name': 'A'}, {'name': 'B'}], return_instances=False) == []
+
+    assert len([s for s in statements if s.startswith('INSERT')]) == 1
+    assert Author.query.count() == 2
+
+
+def test_bulk_update(statements):
+    repository = AuthorRepository()
+    authors = repository.bulk_create([{'name': 'A'}, {'name': 'B'}])
+    statements.clear()
+
+    repository.bulk_update([{'id': author.id, 'affiliation': f'Affiliation {author.name}'} for author in authors])
+
+    assert len([s for s in statements if s.startswith('UPDATE')]) == 1
+    assert sorted(a.affiliation for a in Author.query.all()) == ['Affiliation A', 'Affiliation B']
+
+
+def test_get_by_ids_preserves_order(statements):
+    repository = AuthorRepository()
+    authors = repository.bulk_create([{'name': name} for name in 'ABC'])
+    ids = [authors[2].id, authors[0].id, 999999, authors[1].id]
+    statements.clear()
+
+    assert [author.name for author in repository.get_by_ids(ids)] == ['C', 'A', 'B']
+    assert len(statements) == 1
+
+
+def test_bulk_upsert_inserts_and_updates(statements):
+    repository = AuthorRepository()
+    existing = repository.bulk_create([{'name': 'A'}])[0]
+    statements.clear()
+
+    repository.bulk_upsert([{'id': existing.id, 'name': 'A updated'}, {'id': existing.id + 1, 'name': 'B'}])
+
+    assert len([s for s in statements if s.startswith('INSERT')]) == 1
+    db.session.expire_all()
+    assert sorted(a.name for a in Author.query.all()) == ['A updated', 'B']
+
+
+def test_bulk_upsert_without_upsert_statement(statements, monkeypatch):
+    repository = AuthorRepository()
+    a, b = (author.id for author in repository.bulk_create([{'name': 'A', 'orcid': 'a'}, {'name': 'B', 'orcid': 'b'}]))
+    statements.clear()
+    monkeypatch.setattr(db.engine.dialect, 'name', 'unknown')
+
+    repository.bulk_upsert([{'id': a, 'name': 'A updated'}, {'id': b, 'name': 'B updated'}, {'id': b + 1, 'name': 'C'}])
+
+    assert [s.split()[0] for s in statements] == ['SELECT', 'INSERT', 'UPDATE']
+    db.session.expire_all()
+    authors = sorted((author.name, author.orcid) for author in Author.query.all())
+    assert authors == [('A updated', 'a'), ('B updated', 'b'), ('C', None)]
+
+
+def test_delete_where_is_set_based(statements):
+    repository = AuthorRepository()
+    repository.bulk_create([{'name': 'A', 'orcid': 'x'}, {'name': 'B', 'orcid': 'x'}, {'name': 'C'}])
+    statements.clear()
+
+    assert repository.delete_where(orcid='x') == 2
+    assert [s.split()[0] for s in statements] == ['DELETE']
+    assert [a.name for a in Author.query.all()] == ['C']
+
+
+def test_delete_where_needs_criteria(statements):
+    repository = AuthorRepository()
+    repository.bulk_create([{'name': 'A'}])
+
+    with pytest.raises(ValueError):
+        repository.delete_where()
+    assert Author.query.count() == 1
+
+    assert repository.delete_all() == 1
+    assert Author.query.count() == 0
+
+
+def test_delete_by_column_is_set_based(statements):
+    repository = AuthorRepository()
+    repository.bulk_create([{'name': 'A', 'orcid': 'x'}, {'name': 'B', 'orcid': 'x'}, {'name': 'C'}])
+    statements.clear()
+
+    assert repository.delete_by_column('orcid', 'x')
+    assert not repository.delete_by_column('orcid', 'x')
+    assert [s.split()[0] for s in statements] == ['DELETE', 'DELETE']
+    assert [a.name for a in Author.query.all()] == ['C']
@@ -1,22 +1,41 @@
+import itertools
+
+from sqlalchemy import insert, inspect, text
 from sqlalchemy.exc import IntegrityError
 from app import db
+from core.repositories.BaseRepository import BaseRepository
 
 
 class BaseSeeder:
     priority = 10  # Default priority
 
+    # Class names of the seeders that must run before this one. None means every seeder with a lower priority, so
+    # declaring it lets `db:seed --parallel` run unrelated seeders at the same time.
+    depends_on = None
+
+    # Insert the objects passed to `seed` in multi-row statements instead of one INSERT per object
+    bulk = False
+    chunk_size = 1000
+
+    _consecutive_autoincrement = None
+
     def __init__(self):
         self.db = db
 
     def run(self):
         raise NotImplementedError("The 'run' method must be implemented by the child class.")
 
-    def seed(self, data):
+    def seed(self, data, bulk=None):
         """
         Attempts to insert a list of model objects and returns them with their IDs assigned after insertion.
         Throws an exception if data insertion fails.
 
+        In bulk mode (`bulk=True` or the `bulk` class attribute) the column values of the objects are inserted in
+        chunks of `chunk_size` rows and the IDs are read back per chunk. The objects are not added to the session,
+        so only their columns can be used afterwards, not their relationships.
+
         :param data: List of model objects to insert.
+        :param bulk: Overrides the `bulk` class attribute.
         :return: List of model objects with IDs assigned.
         """
         if not data:
@@ -27,7 +46,10 @@ class BaseSeeder:
             raise ValueError("All objects must be of the same model.")
 
         try:
-            self.db.session.add_all(data)
+            if self.bulk if bulk is None else bulk:
+                self._bulk_insert(model, data)
+            else:
+                self.db.session.add_all(data)
             self.db.session.commit()
         except IntegrityError as e:
             self.db.session.rollback()
@@ -35,3 +57,46 @@ class BaseSeeder:
 
         # After committing, the `data` objects should have their IDs assigned.
         return data
+
+    def _bulk_insert(self, model, data):
+        mapper = inspect(model)
+        repository = BaseRepository(model)
+        primary_key = mapper.get_property_by_column(mapper.primary_key[0]).key
+        attributes = {prop.key for prop in mapper.column_attrs}
+        # Only the attributes that were set, so that column defaults apply to the rest
+        rows = [{key: value for key, value in inspect(obj).dict.items() if key in attributes} for obj in data]
+
+        # An executemany needs the same columns in every row
+        pairs = zip(data, rows)
+        for _, group in itertools.groupby(pairs, key=lambda pair: sorted(pair[1])):
+            group = list(group)
+            for start in range(0, len(group), self.chunk_size):
+                chunk = group[start:start + self.chunk_size]
+                ids = self._insert_chunk(repository, mapper, primary_key, [row for _, row in chunk])
+                for (obj, _), value in zip(chunk, ids):
+                    setattr(obj, primary_key, value)
+
+    def _insert_chunk(self, repository, mapper, primary_key, rows):
+        if primary_key in rows[0]:
+            repository.bulk_create(rows, commit=False, return_instances=False)
+            return [row[primary_key] for row in rows]
+
+        session = self.db.session
+        dialect = session.get_bind(mapper=mapper).dialect
+        if (not dialect.insert_executemany_returning_sort_by_parameter_order
+                and dialect.name in ('mysql', 'mariadb') and self._has_consecutive_autoincrement()):
+            # A single multi-row INSERT gets consecutive ids starting at LAST_INSERT_ID()
+            columns = {prop.key: prop.columns[0].key for prop in mapper.column_attrs}
+            statement = insert(mapper.local_table).values([
+                {columns[key]: value for key, value in row.items()} for row in rows
+            ])
+            first_id = session.execute(statement).lastrowid
+            return list(range(first_id, first_id + len(rows)))
+        return [getattr(instance, primary_key) for instance in repository.bulk_create(rows, commit=False)]
+
+    def _has_consecutive_autoincrement(self):
+        # InnoDB only guarantees consecutive ids within a statement with the traditional or consecutive lock modes
+        if BaseSeeder._consecutive_autoincrement is None:
+            lock_mode = self.db.session.execute(text('SELECT @@innodb_autoinc_lock_mode')).scalar()
+            BaseSeeder._consecutive_autoincrement = int(lock_mode) in (0, 1)
+        return BaseSeeder._consecutive_autoincrement
@@ -0,0 +1,266 @@
+import hashlib
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert
+from werkzeug.security import generate_password_hash
+
+from app.modules.auth.models import User
+from app.modules.dataset.models import (
+    Author,
+    DSDownloadRecord,
+    DSMetaData,
+    DSMetrics,
+    DSViewRecord,
+    DataSet,
+    PublicationType
+)
+from app.modules.featuremodel.models import FMMetaData, FeatureModel
+from app.modules.hubfile.models import Hubfile, HubfileDownloadRecord, HubfileViewRecord
+from app.modules.profile.models import UserProfile
+from core.seeders.BaseSeeder import BaseSeeder
+
+WORDS = (
+    'Audio', 'Battery', 'Bluetooth', 'Camera', 'Cache', 'Cloud', 'Codec', 'Compression', 'Display', 'Driver',
+    'Editor', 'Encryption', 'Engine', 'Filter', 'Firmware', 'Gateway', 'Graphics', 'Kernel', 'Keyboard', 'Logging',
+    'Memory', 'Network', 'Parser', 'Payment', 'Plugin', 'Printer', 'Protocol', 'Router', 'Scheduler', 'Search',
+    'Security', 'Sensor', 'Server', 'Storage', 'Streaming', 'Sync', 'Theme', 'Touch', 'Video', 'Wireless',
+)
+TAGS = ('automotive', 'embedded', 'linux', 'mobile', 'web', 'iot', 'cloud', 'robotics', 'games', 'security')
+PUBLICATION_TYPES = [kind for kind in PublicationType if kind != PublicationType.NONE]
+
+
+def generate_uvl(seed, number_of_features, number_of_constraints=None):
+    """
+    Builds a random but well formed UVL model: a feature tree of `number_of_features` features under mandatory,
+    optional, alternative and or groups, plus cross-tree constraints (a tenth of the features by default).
+    """
+    rng = random.Random(seed)
+    names = ['Root'] + [f'{rng.choice(WORDS)}{i}' for i in range(1, number_of_features)]
+
+    children = {index: [] for index in range(len(names))}
+    for index in range(1, len(names)):
+        # Favour recent parents, which gives deeper trees than a uniform choice
+        parent = max(rng.randrange(index), rng.randrange(index))
+        children[parent].append(index)
+
+    lines = ['features']
+
+    def write_feature(index, depth):
+        lines.append('    ' * depth + names[index])
+        remaining = list(children[index])
+        while remaining:
+            size = rng.randint(1, len(remaining))
+            group, remaining = remaining[:size], remaining[size:]
+            if len(group) > 1:
+                kind = rng.choice(('mandatory', 'optional', 'alternative', 'or'))
+            else:
+                kind = rng.choice(('mandatory', 'optional'))
+            lines.append('    ' * (depth + 1) + kind)
+            for child in group:
+                write_feature(child, depth + 2)
+
+    write_feature(0, 1)
+
+    if number_of_constraints is None:
+        number_of_constraints = number_of_features // 10
+    if number_of_constraints and len(names) > 2:
+        lines.extend(['', 'constraints'])
+        for _ in range(number_of_constraints):
+            first, second, third = rng.sample(names[1:], 3) if len(names) > 3 else (names[1], names[2], names[1])
+            form = rng.randrange(3)
+            if form == 0:
+                lines.append(f'    {first} => {second}')
+            elif form == 1:
+                lines.append(f'    {first} | {second} => {third}')
+            else:
+                lines.append(f'    !({first} & {second})')
+
+    return '\n'.join(lines) + '\n'
+
+
+def write_uvl_file(task):
+    """Pool worker: writes one generated model and returns its checksum and size, like calculate_checksum_and_size."""
+    path, seed, number_of_features = task
+    content = generate_uvl(seed, number_of_features).encode('utf-8')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    return hashlib.md5(content).hexdigest(), len(content)
+
+
+class ScaleSeeder(BaseSeeder):
+    """
+    Seeds a database big enough to show performance problems: `scale` published datasets, one user per
+    `datasets_per_user` of them, `models` feature models per dataset with generated UVL files of `features` features
+    and `records` dataset views per dataset (plus a share of downloads and file views and downloads).
+
+    Rows are inserted with executemany in chunks of `chunk_size`, with primary keys assigned here after the current
+    maximum, so no ids are fetched back. The UVL files are written by a pool of `processes` workers while the rows
+    are inserted. It appends to the existing data and assumes nothing else writes to the database meanwhile.
+    """
+
+    priority = 100
+
+    def __init__(self, scale, models=3, features=50, records=100, datasets_per_user=5, processes=None,
+                 chunk_size=10000, seed=0, uploads_dir=None, progress=None):
+        super().__init__()
+        self.scale = scale
+        self.models = models
+        self.features = features
+        self.records = records
+        self.datasets_per_user = datasets_per_user
+        self.processes = processes if processes is not None else os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.rng = random.Random(seed)
+        self.seed_value = seed
+        self.uploads_dir = uploads_dir or os.path.join(os.getenv('WORKING_DIR', ''), 'uploads')
+        self.progress = progress or (lambda message: None)
+        self.counts = {}
+
+    def next_id(self, model):
+        return (self.db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+    def insert(self, model, rows):
+        """Inserts the rows of an iterable in executemany chunks and commits; returns how many were inserted."""
+        rows = iter(rows)
+        total = 0
+        while True:
+            chunk = list(itertools.islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.db.session.execute(insert(model.__table__), chunk)
+            self.db.session.commit()
+            total += len(chunk)
+        self.counts[model.__tablename__] = self.counts.get(model.__tablename__, 0) + total
+        self.progress(f'{model.__tablename__}: {total} rows')
+        return total
+
+    def random_date(self, now):
+        return now - timedelta(seconds=self.rng.randrange(365 * 24 * 3600))
+
+    def text(self, words):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words))
+
+    def run(self):
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        number_of_users = math.ceil(self.scale / self.datasets_per_user)
+        number_of_models = self.scale * self.models
+
+        first_user = self.next_id(User)
+        first_dataset = self.next_id(DataSet)
+        first_ds_meta_data = self.next_id(DSMetaData)
+        first_fm_meta_data = self.next_id(FMMetaData)
+        first_feature_model = self.next_id(FeatureModel)
+        first_file = self.next_id(Hubfile)
+
+        user_ids = range(first_user, first_user + number_of_users)
+        dataset_ids = range(first_dataset, first_dataset + self.scale)
+        dataset_owner = {dataset_id: user_ids[index // self.datasets_per_user]
+                         for index, dataset_id in enumerate(dataset_ids)}
+
+        # Start writing the files first, the rows below do not depend on them
+        tasks = []
+        for index in range(number_of_models):
+            dataset_id = dataset_ids[index // self.models]
+            path = os.path.join(self.uploads_dir, f'user_{dataset_owner[dataset_id]}', f'dataset_{dataset_id}',
+                                f'file{index % self.models + 1}.uvl')
+            tasks.append((path, self.seed_value * 1_000_003 + first_file + index, self.features))
+
+        pool = multiprocessing.Pool(self.processes) if self.processes > 1 and len(tasks) > 1 else None
+        try:
+            if pool is not None:
+                chunksize = max(1, len(tasks) // (self.processes * 8))
+                file_results = pool.map_async(write_uvl_file, tasks, chunksize=chunksize)
+            self.seed_metadata(now, user_ids, dataset_ids, dataset_owner, first_ds_meta_data, first_fm_meta_data,
+                               first_feature_model)
+            self.insert(DSViewRecord, self.record_rows(now, dataset_ids, user_ids, 'dataset_id', 'view_date',
+                                                       'view_cookie', self.records))
+            self.insert(DSDownloadRecord, self.record_rows(now, dataset_ids, user_ids, 'dataset_id', 'download_date',
+                                                           'download_cookie', self.records // 4))
+
+            checksums = file_results.get() if pool is not None else [write_uvl_file(task) for task in tasks]
+            self.progress(f'{len(tasks)} UVL files written')
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        file_ids = range(first_file, first_file + number_of_models)
+        self.insert(Hubfile, (
+            {'id': file_id, 'name': os.path.basename(task[0]), 'checksum': checksum, 'size': size,
+             'feature_model_id': first_feature_model + index}
+            for index, (file_id, task, (checksum, size)) in enumerate(zip(file_ids, tasks, checksums))
+        ))
+        self.insert(HubfileViewRecord, self.record_rows(now, file_ids, user_ids, 'file_id', 'view_date', 'view_cookie',
+                                                        self.records // (2 * self.models)))
+        self.insert(HubfileDownloadRecord, self.record_rows(now, file_ids, user_ids, 'file_id', 'download_date',
+                                                            'download_cookie', self.records // (8 * self.models)))
+
+    def seed_metadata(self, now, user_ids, dataset_ids, dataset_owner, first_ds_meta_data, first_fm_meta_data,
+                      first_feature_model):
+        # Hashing is deliberately slow, every generated user shares the password '1234'
+        password = generate_password_hash('1234')
+        self.insert(User, ({'id': user_id, 'email': f'scale_user{user_id}@example.com', 'password': password,
+                            'created_at': self.random_date(now)} for user_id in user_ids))
+        self.insert(UserProfile, ({'user_id': user_id, 'orcid': '', 'affiliation': f'{self.text(1)} University',
+                                   'name': f'Name{user_id}', 'surname': f'Surname{user_id}'} for user_id in user_ids))
+
+        ds_metrics_id = self.next_id(DSMetrics)
+        self.insert(DSMetrics, [{'id': ds_metrics_id, 'number_of_models': str(self.models),
+                                 'number_of_features': str(self.features)}])
+
+        ds_meta_data_ids = range(first_ds_meta_data, first_ds_meta_data + len(dataset_ids))
+        self.insert(DSMetaData, (
+            {'id': ds_meta_data_id, 'deposition_id': ds_meta_data_id, 'title': f'{self.text(3)} dataset',
+             'description': self.text(30), 'publication_type': self.rng.choice(PUBLICATION_TYPES),
+             'publication_doi': f'10.1234/scale.{ds_meta_data_id}', 'dataset_doi': f'10.1234/scale.{ds_meta_data_id}',
+             'tags': ', '.join(self.rng.sample(TAGS, 2)), 'ds_metrics_id': ds_metrics_id}
+            for ds_meta_data_id in ds_meta_data_ids
+        ))
+        self.insert(DataSet, (
+            {'id': dataset_id, 'user_id': dataset_owner[dataset_id], 'ds_meta_data_id': ds_meta_data_id,
+             'created_at': self.random_date(now)}
+            for dataset_id, ds_meta_data_id in zip(dataset_ids, ds_meta_data_ids)
+        ))
+
+        number_of_models = len(dataset_ids) * self.models
+        fm_meta_data_ids = range(first_fm_meta_data, first_fm_meta_data + number_of_models)
+        self.insert(FMMetaData, (
+            {'id': fm_meta_data_id, 'uvl_filename': f'file{index % self.models + 1}.uvl',
+             'title': f'{self.text(2)} model', 'description': self.text(15),
+             'publication_type': self.rng.choice(PUBLICATION_TYPES), 'publication_doi': None,
+             'tags': ', '.join(self.rng.sample(TAGS, 2)), 'uvl_version': '1.0'}
+            for index, fm_meta_data_id in enumerate(fm_meta_data_ids)
+        ))
+        self.insert(FeatureModel, (
+            {'id': first_feature_model + index, 'data_set_id': dataset_ids[index // self.models],
+             'fm_meta_data_id': fm_meta_data_id}
+            for index, fm_meta_data_id in enumerate(fm_meta_data_ids)
+        ))
+
+        author_rows = itertools.chain(
+            ({'name': f'{self.text(1)} Author', 'affiliation': f'{self.text(1)} University',
+              'orcid': f'0000-0000-{ds_meta_data_id % 10000:04d}-{position:04d}', 'ds_meta_data_id': ds_meta_data_id}
+             for ds_meta_data_id in ds_meta_data_ids for position in range(2)),
+            ({'name': f'{self.text(1)} Author', 'affiliation': f'{self.text(1)} University', 'orcid': None,
+              'fm_meta_data_id': fm_meta_data_id} for fm_meta_data_id in fm_meta_data_ids),
+        )
+        # Both kinds of author share an executemany statement, so every row needs the same keys
+        self.insert(Author, ({'ds_meta_data_id': None, 'fm_meta_data_id': None, **row} for row in author_rows))
+
+    def record_rows(self, now, target_ids, user_ids, target_column, date_column, cookie_column, per_target):
+        """Anonymous visits mostly, with a random registered user for a fifth of them."""
+        for target_id in target_ids:
+            for _ in range(per_target):
+                yield {
+                    'user_id': self.rng.choice(user_ids) if self.rng.random() < 0.2 else None,
+                    target_column: target_id,
+                    date_column: self.random_date(now),
+                    cookie_column: str(uuid.UUID(int=self.rng.getrandbits(128), version=4)),
+                }
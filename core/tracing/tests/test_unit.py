@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from core.tracing.tracer import Trace, activate, deactivate, trace_span
+
+
+@pytest.fixture
+def trace_store(test_client):
+    store = test_client.application.extensions['tracing'].store
+    if os.path.isdir(store.directory):
+        store.clear()
+    yield store
+    if os.path.isdir(store.directory):
+        store.clear()
+
+
+def test_profile_header_records_a_trace(test_client, trace_store):
+    response = test_client.get('/', headers={'X-Profile': '1'})
+
+    assert response.status_code == 200
+    trace = trace_store.get(response.headers['X-Trace-Id'])
+    assert trace['path'] == '/'
+    assert trace['status'] == 200
+    assert trace['reason'] == 'header'
+    assert trace['summary']['sql']['count'] == int(response.headers['X-Query-Count'])
+    assert 'public/index.html' in [span['name'] for span in trace['spans'] if span['kind'] == 'template']
+    assert trace['summary']['template']['duration_ms'] <= trace['duration_ms']
+
+
+def test_requests_are_not_traced_by_default(test_client, trace_store):
+    response = test_client.get('/')
+
+    assert 'X-Trace-Id' not in response.headers
+    assert trace_store.list() == []
+
+
+def test_profile_header_requires_token_when_configured(test_client, trace_store):
+    tracing = test_client.application.extensions['tracing']
+    tracing.token = 'secret'
+    try:
+        assert 'X-Trace-Id' not in test_client.get('/team', headers={'X-Profile': 'wrong'}).headers
+        assert 'X-Trace-Id' in test_client.get('/team', headers={'X-Profile': 'secret'}).headers
+    finally:
+        tracing.token = None
+
+
+def test_trace_span_nests_and_is_a_no_op_without_trace():
+    with trace_span('file', 'ignored'):
+        pass
+
+    trace = Trace('GET', '/x', 'test')
+    token = activate(trace)
+    try:
+        with trace_span('flamapy', 'to_cnf', file_id=1):
+            with trace_span('file', 'model.uvl'):
+                pass
+    finally:
+        deactivate(token)
+
+    spans = trace.to_dict()['spans']
+    assert [(span['kind'], span['depth']) for span in spans] == [('flamapy', 0), ('file', 1)]
+    assert spans[0]['meta'] == {'file_id': 1}
+    assert spans[0]['duration_ms'] >= spans[1]['duration_ms']
@@ -0,0 +1,182 @@
+import contextvars
+import glob
+import json
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class Span:
+    __slots__ = ('kind', 'name', 'start', 'duration', 'depth', 'meta')
+
+    def __init__(self, kind, name, start, depth, meta=None):
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.duration = None
+        self.depth = depth
+        self.meta = meta
+
+    def to_dict(self, origin):
+        data = {
+            'kind': self.kind,
+            'name': self.name,
+            'start_ms': round((self.start - origin) * 1000, 3),
+            'duration_ms': round((self.duration or 0.0) * 1000, 3),
+            'depth': self.depth,
+        }
+        if self.meta:
+            data['meta'] = self.meta
+        return data
+
+
+class Trace:
+    """Wall-time spans (SQL, template rendering, file reads, HTTP calls...) recorded while handling one request."""
+
+    def __init__(self, method, path, reason, max_spans=2000):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.max_spans = max_spans
+        self.timestamp = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.duration = None
+        self.status = None
+        self.spans = []
+        self.dropped = 0
+        self._depth = 0
+
+    def start_span(self, kind, name, meta=None):
+        if len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return None
+        span = Span(kind, name, time.perf_counter(), self._depth, meta)
+        self.spans.append(span)
+        self._depth += 1
+        return span
+
+    def end_span(self, span):
+        if span is not None:
+            self._depth -= 1
+            span.duration = time.perf_counter() - span.start
+
+    def finish(self, status):
+        self.status = status
+        self.duration = time.perf_counter() - self.start
+
+    def summary(self):
+        """Total time and count per span kind, counting only outermost spans so nested ones are not added twice."""
+        totals = {}
+        open_until = {}
+        for span in self.spans:
+            end = span.start + (span.duration or 0.0)
+            if open_until.get(span.kind, 0) >= end:
+                continue
+            open_until[span.kind] = end
+            entry = totals.setdefault(span.kind, {'count': 0, 'duration_ms': 0.0})
+            entry['count'] += 1
+            entry['duration_ms'] = round(entry['duration_ms'] + (span.duration or 0.0) * 1000, 3)
+        return totals
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'timestamp': self.timestamp.isoformat(timespec='milliseconds'),
+            'pid': os.getpid(),
+            'method': self.method,
+            'path': self.path,
+            'status': self.status,
+            'reason': self.reason,
+            'duration_ms': round((self.duration or 0.0) * 1000, 3),
+            'summary': self.summary(),
+            'dropped_spans': self.dropped,
+            'spans': [span.to_dict(self.start) for span in self.spans],
+        }
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def activate(trace):
+    return _current_trace.set(trace)
+
+
+def deactivate(token):
+    _current_trace.reset(token)
+
+
+@contextmanager
+def trace_span(kind, name, **meta):
+    """
+    Records the block as a span of the request being traced. When the request is not sampled this costs a
+    single context variable lookup.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    span = trace.start_span(kind, name, meta or None)
+    try:
+        yield
+    finally:
+        trace.end_span(span)
+
+
+class TraceStore:
+    """Finished traces, one JSON file each, keeping only the newest `max_traces` files."""
+
+    def __init__(self, directory, max_traces=500):
+        self.directory = directory
+        self.max_traces = max_traces
+
+    def save(self, trace):
+        os.makedirs(self.directory, exist_ok=True)
+        data = trace.to_dict()
+        filename = f"trace_{trace.timestamp.strftime('%Y%m%dT%H%M%S%f')}_{trace.id}.json"
+        # Write then rename, so readers never see a half written file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.trace_')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, os.path.join(self.directory, filename))
+        self.prune()
+        return data
+
+    def _paths(self):
+        # File names start with the timestamp, so sorting them sorts the traces by age
+        return sorted(glob.glob(os.path.join(self.directory, 'trace_*.json')))
+
+    def prune(self):
+        paths = self._paths()
+        for path in paths[:max(len(paths) - self.max_traces, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def list(self):
+        """All stored traces, newest first."""
+        traces = []
+        for path in reversed(self._paths()):
+            try:
+                with open(path, 'r') as f:
+                    traces.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return traces
+
+    def get(self, trace_id):
+        for path in glob.glob(os.path.join(self.directory, f'trace_*_{trace_id}*.json')):
+            with open(path, 'r') as f:
+                return json.load(f)
+        return None
+
+    def clear(self):
+        for path in self._paths():
+            os.remove(path)
@@ -55,5 +55,5 @@ else
 fi
 
 # Start the application using Gunicorn, binding it to port 5000
-# Set the logging level to info and the timeout to 3600 seconds
-exec gunicorn --bind 0.0.0.0:5000 app:app --log-level info --timeout 3600
+# Workers, threads, preloading and timeouts are set in core/configuration/gunicorn_config.py
+exec gunicorn -c python:core.configuration.gunicorn_config --bind 0.0.0.0:5000 app:app
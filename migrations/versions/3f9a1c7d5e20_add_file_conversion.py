@@ -0,0 +1,37 @@
+"""add_file_conversion
+
+Revision ID: 3f9a1c7d5e20
+Revises: c41d7e92a6b5
+Create Date: 2026-10-19 14:21:05.118412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c7d5e20'
+down_revision = 'c41d7e92a6b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('file_conversion',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('file_id', sa.Integer(), nullable=False),
+    sa.Column('format', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('source_checksum', sa.String(length=120), nullable=False),
+    sa.Column('checksum', sa.String(length=120), nullable=True),
+    sa.Column('size', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['file_id'], ['file.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('file_id', 'format', name='uq_file_conversion_file_id_format')
+    )
+
+
+def downgrade():
+    op.drop_table('file_conversion')
@@ -0,0 +1,28 @@
+"""add_doi_indexes
+
+Revision ID: 8ea043f71b3b
+Revises: 5489afc350dd
+Create Date: 2026-10-19 09:12:41.118204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8ea043f71b3b'
+down_revision = '5489afc350dd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # DOI landing pages look datasets up by their DOI and old DOIs up in the mapping table
+    op.create_index(op.f('ix_ds_meta_data_dataset_doi'), 'ds_meta_data', ['dataset_doi'], unique=False)
+    op.create_index(op.f('ix_doi_mapping_dataset_doi_old'), 'doi_mapping', ['dataset_doi_old'], unique=False)
+    op.create_index(op.f('ix_doi_mapping_dataset_doi_new'), 'doi_mapping', ['dataset_doi_new'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_doi_mapping_dataset_doi_new'), table_name='doi_mapping')
+    op.drop_index(op.f('ix_doi_mapping_dataset_doi_old'), table_name='doi_mapping')
+    op.drop_index(op.f('ix_ds_meta_data_dataset_doi'), table_name='ds_meta_data')
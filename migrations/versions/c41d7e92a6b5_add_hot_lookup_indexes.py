@@ -0,0 +1,58 @@
+"""add_hot_lookup_indexes
+
+Revision ID: c41d7e92a6b5
+Revises: 8ea043f71b3b
+Create Date: 2026-10-19 11:02:17.534981
+
+Query plans before and after, measured on SQLite 3 with `rosemary db:seed --scale 200` and 5000 records per
+dataset (1M ds_view_record, 250k ds_download_record, 500k file_view_record, 125k file_download_record rows). In
+the "before" database the only indexes on these tables are the single-column ones on their foreign keys, as
+InnoDB creates them. Times are the median of 50 runs of the statement the repository sends, for an anonymous
+visitor whose cookie has no record yet. They were not measured on MariaDB.
+
+    Query (the_record_exists unless said)   Before (EXPLAIN QUERY PLAN, median)           After
+    DataSetRepository.get_synchronized      ix_data_set_user_id + temp B-tree for ORDER   ix_data_set_user_id_created_at
+                                            BY, 0.065 ms                                  with no sort, 0.069 ms
+    DSViewRecordRepository                  ix_ds_view_record_dataset_id, reads the 5000  composite index on all 3
+                                            rows of the dataset, 1.104 ms                 columns, 0.060 ms
+    DSDownloadRecordRepository              ix_ds_download_record_dataset_id, 0.294 ms    same, 0.056 ms
+    HubfileViewRecordRepository             ix_file_view_record_file_id, 0.219 ms         same, 0.057 ms
+    HubfileDownloadRecordRepository         ix_file_download_record_file_id, 0.090 ms     same, 0.055 ms
+
+Before the composite indexes, a record lookup reads every record of the dataset or file, so its cost grows with
+the popularity of the dataset. After them it is a single index probe. The "My datasets" list gains no measurable
+time with 5 datasets per user; the index only saves the sort, which matters for users with many datasets.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e92a6b5'
+down_revision = '8ea043f71b3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # "My datasets" lists a user's datasets newest first
+    op.create_index('ix_data_set_user_id_created_at', 'data_set', ['user_id', 'created_at'], unique=False)
+    # Views and downloads look up the record of the current user and cookie before inserting a new one
+    op.create_index('ix_ds_view_record_user_id_dataset_id_view_cookie', 'ds_view_record',
+                    ['user_id', 'dataset_id', 'view_cookie'], unique=False)
+    op.create_index('ix_ds_download_record_user_id_dataset_id_download_cookie', 'ds_download_record',
+                    ['user_id', 'dataset_id', 'download_cookie'], unique=False)
+    op.create_index('ix_file_view_record_user_id_file_id_view_cookie', 'file_view_record',
+                    ['user_id', 'file_id', 'view_cookie'], unique=False)
+    op.create_index('ix_file_download_record_user_id_file_id_download_cookie', 'file_download_record',
+                    ['user_id', 'file_id', 'download_cookie'], unique=False)
+
+
+def downgrade():
+    # InnoDB may have dropped its implicit user_id foreign key index in favour of the composite ones
+    for table in ('file_download_record', 'file_view_record', 'ds_download_record', 'ds_view_record', 'data_set'):
+        op.create_index(f'ix_{table}_user_id', table, ['user_id'], unique=False)
+    op.drop_index('ix_file_download_record_user_id_file_id_download_cookie', table_name='file_download_record')
+    op.drop_index('ix_file_view_record_user_id_file_id_view_cookie', table_name='file_view_record')
+    op.drop_index('ix_ds_download_record_user_id_dataset_id_download_cookie', table_name='ds_download_record')
+    op.drop_index('ix_ds_view_record_user_id_dataset_id_view_cookie', table_name='ds_view_record')
+    op.drop_index('ix_data_set_user_id_created_at', table_name='data_set')
@@ -5,6 +5,7 @@ from rosemary.commands.locust import locust, stop
 from rosemary.commands.compose_env import compose_env
 from rosemary.commands.route_list import route_list
 from rosemary.commands.db_seed import db_seed
+from rosemary.commands.db_explain import db_explain
 from rosemary.commands.clear_cache import clear_cache
 from rosemary.commands.db_console import db_console
 from rosemary.commands.db_migrate import db_migrate
@@ -19,6 +20,9 @@ from rosemary.commands.info import info, info2
 from rosemary.commands.make_module import make_module
 from rosemary.commands.env import env
 from rosemary.commands.test import test
+from rosemary.commands.profile_startup import profile_startup
+from rosemary.commands.profile_traces import profile_traces
+from rosemary.commands.bench import bench
 
 
 class RosemaryCLI(click.Group):
@@ -52,12 +56,16 @@ cli.add_command(db_reset)
 cli.add_command(db_migrate)
 cli.add_command(db_console)
 cli.add_command(db_seed)
+cli.add_command(db_explain)
 cli.add_command(route_list)
 cli.add_command(compose_env)
 cli.add_command(locust)
 cli.add_command(stop)
 cli.add_command(selenium)
 cli.add_command(module_list)
+cli.add_command(profile_startup)
+cli.add_command(profile_traces)
+cli.add_command(bench)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import click
+
+
+def load_results(path):
+    """Maps the full name of each benchmark in a pytest-benchmark JSON file to its stats."""
+    with open(path, 'r') as f:
+        return {benchmark['fullname']: benchmark['stats'] for benchmark in json.load(f)['benchmarks']}
+
+
+def compare_results(baseline, current, threshold, stat):
+    """
+    Returns (name, before, after) for every benchmark whose `stat` is more than `threshold` percent slower than in
+    the baseline. Benchmarks missing from the baseline are not regressions.
+    """
+    regressions = []
+    for name, stats in current.items():
+        before = baseline.get(name)
+        if before is not None and stats[stat] > before[stat] * (1 + threshold / 100):
+            regressions.append((name, before[stat], stats[stat]))
+    return regressions
+
+
+def format_seconds(seconds):
+    return f"{seconds * 1000:.3f} ms" if seconds < 1 else f"{seconds:.3f} s"
+
+
+@click.command('bench', help="Runs the micro-benchmarks (bench_*.py files) and compares them against a baseline.")
+@click.argument('module_name', required=False)
+@click.option('-k', 'keyword', help="Only run benchmarks that match the given substring expression.")
+@click.option('--save', is_flag=True, help="Store the results as the new baseline instead of comparing.")
+@click.option('--baseline', 'baseline_path', type=click.Path(dir_okay=False),
+              help="Baseline file. Defaults to benchmarks/baseline.json in the working dir.")
+@click.option('--threshold', default=20.0, show_default=True,
+              help="Percentage slowdown over the baseline that is flagged as a regression.")
+@click.option('--stat', default='median', show_default=True, type=click.Choice(['min', 'median', 'mean']),
+              help="Statistic of the rounds that is compared.")
+def bench(module_name, keyword, save, baseline_path, threshold, stat):
+    working_dir = os.getenv('WORKING_DIR', '') or os.getcwd()
+    base_path = os.path.join(working_dir, 'app/modules')
+    bench_path = base_path
+    results_dir = os.path.join(working_dir, 'benchmarks')
+    results_path = os.path.join(results_dir, 'latest.json')
+    baseline_path = baseline_path or os.path.join(results_dir, 'baseline.json')
+
+    if module_name:
+        bench_path = os.path.join(base_path, module_name)
+        if not os.path.exists(bench_path):
+            click.echo(click.style(f"Module '{module_name}' does not exist.", fg='red'))
+            return
+        click.echo(f"Running benchmarks for the '{module_name}' module...")
+    else:
+        click.echo("Running benchmarks for all modules...")
+
+    os.makedirs(results_dir, exist_ok=True)
+    # The benchmark names are relative to the rootdir, run from the working dir so they match the baseline
+    pytest_cmd = ['pytest', '-o', 'python_files=bench_*.py', '--benchmark-only', f'--benchmark-json={results_path}',
+                  '--benchmark-columns=min,median,mean,stddev,rounds', bench_path]
+    if keyword:
+        pytest_cmd.extend(['-k', keyword])
+
+    result = subprocess.run(pytest_cmd, cwd=working_dir)
+    if result.returncode != 0:
+        click.echo(click.style("Benchmarks failed, nothing was compared.", fg='red'))
+        sys.exit(result.returncode)
+
+    if save:
+        shutil.copyfile(results_path, baseline_path)
+        click.echo(click.style(f"\nBaseline saved to {baseline_path}", fg='green'))
+        return
+
+    if not os.path.exists(baseline_path):
+        click.echo(click.style(f"\nNo baseline at {baseline_path}, store one with --save.", fg='yellow'))
+        return
+
+    baseline = load_results(baseline_path)
+    current = load_results(results_path)
+
+    click.echo(click.style(f"\n{stat.capitalize()} compared to {baseline_path}:", fg='yellow'))
+    for name, stats in sorted(current.items()):
+        before = baseline.get(name)
+        if before is None:
+            click.echo(f"{name:<70} {'new':>12} -> {format_seconds(stats[stat])}")
+            continue
+        change = (stats[stat] / before[stat] - 1) * 100
+        click.echo(f"{name:<70} {format_seconds(before[stat]):>12} -> {format_seconds(stats[stat]):>12} "
+                   f"({change:+.1f}%)")
+
+    regressions = compare_results(baseline, current, threshold, stat)
+    if not regressions:
+        click.echo(click.style(f"\nNo regressions over {threshold}% compared to {baseline_path}.", fg='green'))
+        return
+
+    click.echo(click.style(f"\nRegressions over {threshold}% compared to {baseline_path}:", fg='red'))
+    for name, before, after in regressions:
+        click.echo(click.style(f"{name:<70} {format_seconds(before):>12} -> {format_seconds(after)}", fg='red'))
+    sys.exit(1)
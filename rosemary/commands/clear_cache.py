@@ -3,9 +3,13 @@ from pathlib import Path
 import click
 import shutil
 import os
+from flask import current_app
+from flask.cli import with_appcontext
 
 
-@click.command('clear:cache', help="Clears pytest cache in app/modules and the build directory at the root.")
+@click.command('clear:cache', help="Clears pytest cache in app/modules, the build directory at the root and the "
+                                   "compiled Jinja templates.")
+@with_appcontext
 def clear_cache():
 
     if click.confirm('Are you sure you want to clear the pytest cache and the build directory?'):
@@ -32,6 +36,14 @@ def clear_cache():
         else:
             click.echo(click.style("No cache or build directory found. Nothing to clear.", fg='yellow'))
 
+        jinja_cache_dir = current_app.config.get('JINJA_BYTECODE_CACHE_DIR')
+        if jinja_cache_dir and os.path.exists(jinja_cache_dir):
+            try:
+                shutil.rmtree(jinja_cache_dir)
+                click.echo(click.style("Jinja bytecode cache cleared.", fg='green'))
+            except Exception as e:
+                click.echo(click.style(f"Failed to clear Jinja bytecode cache: {e}", fg='red'))
+
         pycache_dirs = project_root.rglob('__pycache__')
         for dir in pycache_dirs:
             try:
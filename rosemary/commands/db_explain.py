@@ -0,0 +1,185 @@
+import json
+import statistics
+import sys
+import time
+import uuid
+from typing import NamedTuple
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from flask_login import login_user
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.models import DOIMapping, DSMetaData, DataSet
+from app.modules.dataset.repositories import (
+    DOIMappingRepository,
+    DSDownloadRecordRepository,
+    DSMetaDataRepository,
+    DSViewRecordRepository,
+    DataSetRepository
+)
+from app.modules.explore.repositories import ExploreRepository
+from app.modules.featuremodel.models import FeatureModel
+from app.modules.hubfile.models import Hubfile
+from app.modules.hubfile.repositories import HubfileDownloadRecordRepository, HubfileViewRecordRepository
+from core.repositories.explain import StatementRecorder, explain
+
+
+class Samples(NamedTuple):
+    user: User
+    dataset: DataSet
+    doi: str
+    old_doi: str
+    file_id: int
+    cookie: str
+    search: str
+
+
+# The repository queries behind the busiest pages, called with values taken from the database
+HOT_QUERIES = [
+    ('DataSetRepository.get_synchronized', lambda s: DataSetRepository().get_synchronized(s.user.id)),
+    ('DataSetRepository.get_unsynchronized', lambda s: DataSetRepository().get_unsynchronized(s.user.id)),
+    ('DataSetRepository.get_unsynchronized_dataset',
+     lambda s: DataSetRepository().get_unsynchronized_dataset(s.user.id, s.dataset.id)),
+    ('DataSetRepository.count_synchronized_datasets', lambda s: DataSetRepository().count_synchronized_datasets()),
+    ('DataSetRepository.latest_synchronized', lambda s: DataSetRepository().latest_synchronized()),
+    ('DataSetRepository.get_id_by_doi', lambda s: DataSetRepository().get_id_by_doi(s.doi)),
+    ('DSMetaDataRepository.filter_by_doi', lambda s: DSMetaDataRepository().filter_by_doi(s.doi)),
+    ('DOIMappingRepository.get_new_doi', lambda s: DOIMappingRepository().get_new_doi(s.old_doi)),
+    ('DSViewRecordRepository.the_record_exists',
+     lambda s: DSViewRecordRepository().the_record_exists(s.dataset, s.cookie)),
+    ('DSDownloadRecordRepository.the_record_exists',
+     lambda s: DSDownloadRecordRepository().the_record_exists(s.dataset.id, s.cookie)),
+    ('HubfileViewRecordRepository.the_record_exists',
+     lambda s: HubfileViewRecordRepository().the_record_exists(s.file_id, s.cookie)),
+    ('HubfileDownloadRecordRepository.the_record_exists',
+     lambda s: HubfileDownloadRecordRepository().the_record_exists(s.file_id, s.cookie)),
+    ('ExploreRepository.filter', lambda s: ExploreRepository().filter(query=s.search)),
+]
+
+
+def sample_values():
+    dataset = (
+        DataSet.query.join(DSMetaData)
+        .filter(DSMetaData.dataset_doi.isnot(None))
+        .order_by(DataSet.id.desc())
+        .first()
+    )
+    if dataset is None:
+        raise click.ClickException("There are no published datasets to sample, seed the database first.")
+    hubfile = Hubfile.query.join(FeatureModel).filter(FeatureModel.data_set_id == dataset.id).first()
+    mapping = DOIMapping.query.first()
+    title_words = dataset.ds_meta_data.title.split()
+
+    return Samples(
+        user=db.session.get(User, dataset.user_id),
+        dataset=dataset,
+        doi=dataset.ds_meta_data.dataset_doi,
+        old_doi=mapping.dataset_doi_old if mapping else dataset.ds_meta_data.dataset_doi,
+        file_id=hubfile.id if hubfile else 0,
+        # A cookie without records, like a first visit, the lookup every new visitor pays for
+        cookie=str(uuid.uuid4()),
+        search=title_words[0] if title_words else '',
+    )
+
+
+def run_query(func, samples, repeat):
+    engines = db.engines.values()
+    with StatementRecorder(engines) as recorder:
+        func(samples)
+    db.session.expunge_all()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(samples)
+        timings.append((time.perf_counter() - start) * 1000)
+        db.session.expunge_all()
+
+    plans = [explain(engine, statement, parameters) for engine, statement, parameters in recorder.statements]
+    return {
+        'statements': len(plans),
+        'full_scans': [scan for plan in plans for scan in plan.full_scans],
+        'steps': [step for plan in plans for step in plan.steps],
+        'median_ms': statistics.median(timings) if timings else None,
+        'min_ms': min(timings) if timings else None,
+    }
+
+
+def print_result(name, result, verbose):
+    label = click.style('[SCAN]', fg='red') if result['full_scans'] else click.style('[OK]  ', fg='green')
+    timing = f"{result['median_ms']:>9.2f} ms" if result['median_ms'] is not None else ''
+    click.echo(f"{label} {name:<52} {result['statements']:>2} statement(s) {timing}")
+    for step in result['steps'] if verbose else result['full_scans']:
+        color = 'red' if step in result['full_scans'] else None
+        click.echo(click.style(f"         {step}", fg=color))
+
+
+def compare_results(baseline, current, threshold):
+    click.echo(click.style(f"\n{'QUERY':<52} {'BEFORE':>11} {'AFTER':>11} {'SPEEDUP':>8}", fg='yellow'))
+    regressions = []
+    for name, result in current.items():
+        before = baseline.get(name, {}).get('median_ms')
+        after = result['median_ms']
+        if before is None or after is None:
+            continue
+        speedup = before / after if after else float('inf')
+        click.echo(f"{name:<52} {before:>8.2f} ms {after:>8.2f} ms {speedup:>7.1f}x")
+        if after > before * (1 + threshold / 100):
+            regressions.append(name)
+    return regressions
+
+
+@click.command('db:explain', help="Runs EXPLAIN on the hot repository queries and flags full table scans.")
+@click.option('--query', 'query_filter', help="Only check the queries whose name contains this text.")
+@click.option('--repeat', default=0, show_default=True, help="Time each query over this many runs.")
+@click.option('-v', '--verbose', is_flag=True, help="Print every step of the plans, not only the full scans.")
+@click.option('--save', 'save_path', type=click.Path(dir_okay=False), help="Write the results as JSON to this file.")
+@click.option('--compare', 'baseline_path', type=click.Path(exists=True, dir_okay=False),
+              help="Compare the timings against results previously written with --save.")
+@click.option('--threshold', default=20.0, show_default=True,
+              help="Percentage slowdown over the baseline that is flagged as a regression.")
+@click.option('--fail-on-scan', is_flag=True, help="Exit with an error when a query does a full table scan.")
+@with_appcontext
+def db_explain(query_filter, repeat, verbose, save_path, baseline_path, threshold, fail_on_scan):
+    queries = [(name, func) for name, func in HOT_QUERIES if not query_filter or query_filter in name]
+    if baseline_path and not repeat:
+        repeat = 20
+
+    # Repositories read current_user, so run them as the owner of the sampled dataset
+    with current_app.test_request_context():
+        samples = sample_values()
+        login_user(samples.user)
+        click.echo(click.style(f"Explaining {len(queries)} queries on {db.engine.dialect.name} "
+                               f"(user {samples.user.id}, dataset {samples.dataset.id})...\n", fg='green'))
+        results = {}
+        for name, func in queries:
+            results[name] = run_query(func, samples, repeat)
+            print_result(name, results[name], verbose)
+
+    scans = [name for name, result in results.items() if result['full_scans']]
+    if scans:
+        click.echo(click.style(f"\n{len(scans)} of {len(results)} queries do full table scans. On small tables the "
+                               "optimizer may prefer a scan, check them on a large seeded database.", fg='red'))
+    else:
+        click.echo(click.style(f"\nNo full table scans in {len(results)} queries.", fg='green'))
+
+    if save_path:
+        with open(save_path, 'w') as f:
+            json.dump({'dialect': db.engine.dialect.name, 'queries': results}, f, indent=2)
+        click.echo(click.style(f"Results saved to {save_path}", fg='green'))
+
+    failed = fail_on_scan and scans
+    if baseline_path:
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline.get('queries', {}), results, threshold)
+        if regressions:
+            click.echo(click.style(f"\nRegressions over {threshold}% compared to {baseline_path}: "
+                                   f"{', '.join(regressions)}", fg='red'))
+            failed = True
+
+    if failed:
+        sys.exit(1)
@@ -1,10 +1,14 @@
 import inspect
 import os
 import importlib
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import click
+from flask import current_app
 from flask.cli import with_appcontext
 
 from core.seeders.BaseSeeder import BaseSeeder
+from core.seeders.ScaleSeeder import ScaleSeeder
 from rosemary.commands.db_reset import db_reset
 
 
@@ -36,12 +40,78 @@ def get_module_seeders(module_path, specific_module=None):
     return seeders
 
 
+def get_seeder_dependencies(seeders):
+    """
+    Maps each seeder to the seeders that must finish before it starts: the ones named in its `depends_on`, or
+    every seeder with a lower priority when it does not declare them. Dependencies outside `seeders` (another
+    module's, when seeding one module) are assumed to have run already.
+    """
+    by_name = {seeder.__class__.__name__: seeder for seeder in seeders}
+    dependencies = {}
+    for seeder in seeders:
+        if seeder.depends_on is None:
+            dependencies[seeder] = [other for other in seeders if other.priority < seeder.priority]
+        else:
+            dependencies[seeder] = [by_name[name] for name in seeder.depends_on if name in by_name]
+    return dependencies
+
+
+def run_seeder(app, seeder):
+    # Every thread gets its own app context, and with it its own session and connection
+    with app.app_context():
+        seeder.run()
+
+
+def run_seeders_in_parallel(seeders, workers):
+    """Runs each seeder as soon as its dependencies are done, up to `workers` at a time. Stops at the first error."""
+    app = current_app._get_current_object()
+    dependencies = get_seeder_dependencies(seeders)
+    pending, running, done, success = list(seeders), {}, set(), True
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            ready = [seeder for seeder in pending if all(dependency in done for dependency in dependencies[seeder])]
+            for seeder in ready if success else []:
+                pending.remove(seeder)
+                running[executor.submit(run_seeder, app, seeder)] = seeder
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                seeder = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    click.echo(click.style(f'Error running seeder {seeder.__class__.__name__}: {e}', fg='red'))
+                    success = False
+                else:
+                    done.add(seeder)
+                    click.echo(click.style(f'{seeder.__class__.__name__} performed.', fg='blue'))
+
+    if success and pending:
+        names = ', '.join(seeder.__class__.__name__ for seeder in pending)
+        click.echo(click.style(f'Circular dependencies between seeders: {names}', fg='red'))
+        success = False
+    return success
+
+
 @click.command('db:seed', help="Populates the database with the seeders defined in each module.")
 @click.option('--reset', is_flag=True, help="Reset the database before seeding.")
 @click.option('-y', '--yes', is_flag=True, help="Confirm the operation without prompting.")
+@click.option('--scale', type=click.IntRange(min=1),
+              help="Generate this many published datasets, with their users, files and records, for benchmarking.")
+@click.option('--models', default=3, show_default=True, help="Feature models (UVL files) per dataset with --scale.")
+@click.option('--features', default=50, show_default=True, help="Features of each generated UVL file with --scale.")
+@click.option('--records', default=100, show_default=True,
+              help="Views per dataset with --scale; downloads and file views and downloads are a share of them.")
+@click.option('--processes', type=click.IntRange(min=1), help="Processes writing UVL files with --scale (all CPUs).")
+@click.option('--seed', 'random_seed', default=0, show_default=True, help="Random seed of the generated data.")
+@click.option('--parallel', is_flag=True, help="Run seeders that do not depend on each other at the same time.")
+@click.option('--workers', default=4, show_default=True, help="Seeders running at the same time with --parallel.")
 @click.argument('module', required=False)
 @with_appcontext
-def db_seed(reset, yes, module):
+def db_seed(reset, yes, scale, models, features, records, processes, random_seed, parallel, workers, module):
 
     if reset:
         if yes or click.confirm(click.style('This will reset the database, do you want '
@@ -53,6 +123,10 @@ def db_seed(reset, yes, module):
             click.echo(click.style("Database reset cancelled.", fg='yellow'))
             return
 
+    if scale:
+        seed_scale(scale, models, features, records, processes, random_seed)
+        return
+
     blueprints_module_path = os.path.join(os.getenv('WORKING_DIR', ''), 'app/modules')
     seeders = get_module_seeders(blueprints_module_path, specific_module=module)
     success = True  # Flag to control the successful flow of the operation
@@ -62,18 +136,33 @@ def db_seed(reset, yes, module):
     else:
         click.echo(click.style("Seeding data for all modules...", fg='green'))
 
-    for seeder in seeders:
-        try:
-            seeder.run()
-            click.echo(click.style(f'{seeder.__class__.__name__} performed.', fg='blue'))
-        except Exception as e:
-            click.echo(click.style(f'Error running seeder {seeder.__class__.__name__}: {e}', fg='red'))
-            click.echo(click.style(f'Rolled back the transaction of {seeder.__class__.__name__} to keep the session '
-                                   f'clean.',
-                                   fg='yellow'))
-
-            success = False
-            break
+    if parallel:
+        success = run_seeders_in_parallel(seeders, workers)
+    else:
+        for seeder in seeders:
+            try:
+                seeder.run()
+                click.echo(click.style(f'{seeder.__class__.__name__} performed.', fg='blue'))
+            except Exception as e:
+                click.echo(click.style(f'Error running seeder {seeder.__class__.__name__}: {e}', fg='red'))
+                click.echo(click.style(f'Rolled back the transaction of {seeder.__class__.__name__} to keep the '
+                                       f'session clean.',
+                                       fg='yellow'))
+
+                success = False
+                break
 
     if success:
         click.echo(click.style('Database populated with test data.', fg='green'))
+
+
+def seed_scale(scale, models, features, records, processes, random_seed):
+    click.echo(click.style(f"Generating {scale} datasets with {models} models of {features} features each...",
+                           fg='green'))
+    seeder = ScaleSeeder(scale, models=models, features=features, records=records, processes=processes,
+                         seed=random_seed, progress=lambda message: click.echo(f'  {message}'))
+    start = time.perf_counter()
+    seeder.run()
+    elapsed = time.perf_counter() - start
+    total = sum(seeder.counts.values())
+    click.echo(click.style(f'Inserted {total} rows in {elapsed:.1f} s ({total / elapsed:.0f} rows/s).', fg='green'))
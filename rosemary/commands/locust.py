@@ -1,14 +1,29 @@
 import os
 import subprocess
+import sys
 import click
 import docker
 import signal
 import psutil
 
 
+SUITES = {
+    'modules': 'bootstraps/locustfile_bootstrap.py',
+    'hot-paths': 'bootstraps/locustfile_hot_paths.py',
+}
+
+
 @click.command('locust', help="Launches Locust for load testing based on the environment.")
 @click.argument('module', required=False)
-def locust(module):
+@click.option('--suite', type=click.Choice(list(SUITES)), default='modules', show_default=True,
+              help="'modules' loads every module locustfile, 'hot-paths' the busiest pages with SLOs.")
+@click.option('--headless', is_flag=True, help="Run without the web UI, in the foreground, and exit with its result.")
+@click.option('--users', default=50, show_default=True, help="Number of concurrent users with --headless.")
+@click.option('--spawn-rate', default=5.0, show_default=True, help="Users started per second with --headless.")
+@click.option('--run-time', default='5m', show_default=True, help="Duration with --headless, e.g. 300s, 5m, 1h.")
+@click.option('--report', type=click.Path(dir_okay=False),
+              help="Write the stats and SLO results of the suite as JSON to this file when Locust stops.")
+def locust(module, suite, headless, users, spawn_rate, run_time, report):
 
     # Absolute paths
     working_dir = os.getenv('WORKING_DIR', '')
@@ -16,6 +31,25 @@ def locust(module):
     docker_dir = os.path.join(working_dir, 'docker/')
     modules_dir = os.path.join(working_dir, 'app/modules')
 
+    if module and suite != 'modules':
+        raise click.UsageError("A module can only be given with the 'modules' suite.")
+    if module and report:
+        # --slo-report is defined by core.locust.reporting, which module locustfiles do not load
+        raise click.UsageError("--report can only be given with a suite, not with a module.")
+
+    def get_locustfile_path(module):
+        if module:
+            return os.path.join(modules_dir, module, 'tests', 'locustfile.py')
+        return os.path.join(core_dir, SUITES[suite])
+
+    def get_locust_options():
+        options = []
+        if headless:
+            options += ['--headless', '-u', str(users), '-r', str(spawn_rate), '-t', run_time]
+        if report:
+            options += ['--slo-report', report]
+        return options
+
     def validate_module(module):
         """Check if the module exists."""
         if module:
@@ -51,18 +85,18 @@ def locust(module):
         subprocess.run(build_command, check=True)
 
         # Define the locustfile path
-        locustfile_path = os.path.join(core_dir, 'bootstraps/locustfile_bootstrap.py')
-        if module:
-            locustfile_path = f"{modules_dir}/{module}/tests/locustfile.py"
+        locustfile_path = get_locustfile_path(module)
 
-        # Run the Locust container
+        # Run the Locust container, in the foreground and removed afterwards when headless
         up_command = [
-            'docker', 'run', '-d', '-p', '8089:8089', '-v', f"{volume_name}:/app",
+            'docker', 'run', '--rm' if headless else '-d', '-p', '8089:8089', '-v', f"{volume_name}:/app",
             '--name', 'locust_container', '--network', 'docker_uvlhub_network',
             'locust-image', '-f', locustfile_path
-        ]
+        ] + get_locust_options()
 
         click.echo(f"Docker Run command: {' '.join(up_command)}")
+        if headless:
+            sys.exit(subprocess.run(up_command).returncode)
         subprocess.run(up_command, check=True)
         click.echo(click.style("Locust is running at http://localhost:8089", fg='green'))
 
@@ -79,11 +113,11 @@ def locust(module):
             click.echo("Locust is already running.")
             return
 
-        locustfile_path = os.path.join(core_dir, 'bootstraps/locustfile_bootstrap.py')
-        if module:
-            locustfile_path = os.path.join(modules_dir, module, 'tests', 'locustfile.py')
-        locust_command = ['locust', '-f', locustfile_path]
+        locust_command = ['locust', '-f', get_locustfile_path(module)] + get_locust_options()
         click.echo(f"Locust command: {' '.join(locust_command)}")
+        if headless:
+            # Locust exits with 1 when requests failed or an SLO was not met
+            sys.exit(subprocess.run(locust_command).returncode)
         subprocess.Popen(locust_command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         click.echo(click.style("Locust is running at http://localhost:8089", fg='green'))
 
@@ -0,0 +1,141 @@
+import json
+import os
+import subprocess
+import sys
+
+import click
+
+
+PROFILE_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print('ROSEMARY_PROFILE ' + json.dumps({
+    'startup_seconds': elapsed,
+    'registration': getattr(app.app, 'module_registration_times', {}),
+}))
+"""
+
+
+class ImportNode:
+    def __init__(self, name, self_us, cumulative_us):
+        self.name = name
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.children = []
+
+
+def parse_importtime(stderr):
+    """
+    Builds the import tree from the output of `python -X importtime`. CPython prints each module after all of
+    its children, indented two spaces per nesting level.
+    """
+    children_at = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_part, cumulative_us, name_part = line.split('|', 2)
+        self_us = self_part.split(':', 1)[1]
+        level = (len(name_part) - len(name_part.lstrip()) - 1) // 2
+        node = ImportNode(name_part.strip(), int(self_us), int(cumulative_us))
+        node.children = children_at.pop(level + 1, [])
+        children_at.setdefault(level, []).append(node)
+    return children_at.get(0, [])
+
+
+def flatten(nodes):
+    result = {}
+    for node in nodes:
+        result.setdefault(node.name, node.cumulative_us)
+        result.update({k: v for k, v in flatten(node.children).items() if k not in result})
+    return result
+
+
+def run_profile(working_dir):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROFILE_SCRIPT],
+                            cwd=working_dir or None, env=env, capture_output=True, text=True)
+    report_line = next((line for line in result.stdout.splitlines() if line.startswith('ROSEMARY_PROFILE ')), None)
+    if result.returncode != 0 or report_line is None:
+        raise click.ClickException(f"Could not import the app:\n{result.stderr[-2000:]}")
+
+    report = json.loads(report_line[len('ROSEMARY_PROFILE '):])
+    tree = parse_importtime(result.stderr)
+    report['imports'] = flatten(tree)
+    return report, tree
+
+
+def print_tree(nodes, depth, min_ms, level=0):
+    for node in sorted(nodes, key=lambda n: n.cumulative_us, reverse=True):
+        if node.cumulative_us / 1000 < min_ms:
+            continue
+        label = f"{'  ' * level}{node.name}"
+        click.echo(f"{label:<70} {node.cumulative_us / 1000:>9.1f} ms {node.self_us / 1000:>9.1f} ms")
+        if level + 1 < depth:
+            print_tree(node.children, depth, min_ms, level + 1)
+
+
+def compare_reports(baseline, current, threshold, min_ms):
+    regressions = []
+    sections = [('startup', {'create_app': baseline['startup_seconds'] * 1e6},
+                 {'create_app': current['startup_seconds'] * 1e6}),
+                ('module', {k: v * 1e6 for k, v in baseline.get('registration', {}).items()},
+                 {k: v * 1e6 for k, v in current.get('registration', {}).items()}),
+                ('import', baseline.get('imports', {}), current.get('imports', {}))]
+
+    for kind, before, after in sections:
+        for name, after_us in after.items():
+            before_us = before.get(name)
+            if before_us is None:
+                if after_us / 1000 >= min_ms:
+                    regressions.append((kind, name, None, after_us))
+                continue
+            if after_us > before_us * (1 + threshold / 100) and (after_us - before_us) / 1000 >= min_ms:
+                regressions.append((kind, name, before_us, after_us))
+    return regressions
+
+
+@click.command('profile:startup', help="Imports the app under an import-time tracer and reports what dominates boot.")
+@click.option('--depth', default=3, show_default=True, help="Depth of the import tree to print.")
+@click.option('--min-ms', default=5.0, show_default=True, help="Hide imports and regressions below this many ms.")
+@click.option('--save', 'save_path', type=click.Path(dir_okay=False), help="Write the report as JSON to this file.")
+@click.option('--compare', 'baseline_path', type=click.Path(exists=True, dir_okay=False),
+              help="Compare against a report previously written with --save.")
+@click.option('--threshold', default=20.0, show_default=True,
+              help="Percentage slowdown over the baseline that is flagged as a regression.")
+def profile_startup(depth, min_ms, save_path, baseline_path, threshold):
+    working_dir = os.getenv('WORKING_DIR', '')
+
+    click.echo("Importing the app with -X importtime...")
+    report, tree = run_profile(working_dir)
+
+    click.echo(click.style(f"\nStartup (import app + create_app): {report['startup_seconds'] * 1000:.1f} ms",
+                           fg='green'))
+
+    click.echo(click.style("\nImport tree (cumulative / self):", fg='yellow'))
+    print_tree(tree, depth, min_ms)
+
+    click.echo(click.style("\nModuleManager registration times:", fg='yellow'))
+    for name, seconds in sorted(report['registration'].items(), key=lambda item: item[1], reverse=True):
+        click.echo(f"{name:<70} {seconds * 1000:>9.1f} ms")
+
+    if save_path:
+        with open(save_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        click.echo(click.style(f"\nReport saved to {save_path}", fg='green'))
+
+    if baseline_path:
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+
+        regressions = compare_reports(baseline, report, threshold, min_ms)
+        if not regressions:
+            click.echo(click.style(f"\nNo regressions over {threshold}% compared to {baseline_path}.", fg='green'))
+            return
+
+        click.echo(click.style(f"\nRegressions over {threshold}% compared to {baseline_path}:", fg='red'))
+        for kind, name, before_us, after_us in regressions:
+            before = 'new' if before_us is None else f"{before_us / 1000:.1f} ms"
+            click.echo(click.style(f"[{kind}] {name:<60} {before:>12} -> {after_us / 1000:.1f} ms", fg='red'))
+        sys.exit(1)
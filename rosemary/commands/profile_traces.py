@@ -0,0 +1,88 @@
+import os
+
+import click
+
+from core.tracing.tracer import TraceStore
+
+KINDS = ('sql', 'template', 'file', 'flamapy', 'http')
+
+
+def traces_dir():
+    return os.path.join(os.getenv('WORKING_DIR', ''), os.getenv('PROFILING_TRACES_DIR', 'traces'))
+
+
+def format_kind(summary, kind):
+    entry = summary.get(kind)
+    if not entry:
+        return f"{'-':>16}"
+    return f"{entry['duration_ms']:>9.1f} ms/{entry['count']:<4}"
+
+
+def print_list(traces):
+    header = f"{'TRACE':<12} {'TIME':<23} {'STATUS':>6} {'TOTAL':>11}  " + ' '.join(f'{kind:>16}' for kind in KINDS)
+    click.echo(click.style(header, fg='yellow'))
+    for trace in traces:
+        kinds = ' '.join(format_kind(trace['summary'], kind) for kind in KINDS)
+        click.echo(f"{trace['id'][:12]:<12} {trace['timestamp'][:23]:<23} {trace['status'] or '':>6} "
+                   f"{trace['duration_ms']:>8.1f} ms  {kinds}  {trace['method']} {trace['path']}")
+
+
+def print_trace(trace, min_ms):
+    click.echo(click.style(f"{trace['method']} {trace['path']} -> {trace['status']} "
+                           f"in {trace['duration_ms']:.1f} ms ({trace['reason']}, pid {trace['pid']})", fg='green'))
+    click.echo(f"Trace {trace['id']} at {trace['timestamp']}")
+
+    accounted = 0.0
+    for kind, entry in sorted(trace['summary'].items(), key=lambda item: item[1]['duration_ms'], reverse=True):
+        accounted += entry['duration_ms']
+        click.echo(f"  {kind:<10} {entry['duration_ms']:>9.1f} ms in {entry['count']} spans")
+    # Spans of different kinds can nest (a query inside a template), so this is a lower bound of untraced time
+    click.echo(f"  {'other':<10} {max(trace['duration_ms'] - accounted, 0):>9.1f} ms (python, waiting...)")
+
+    click.echo(click.style(f"\n{'START':>10} {'DURATION':>11}  SPAN", fg='yellow'))
+    hidden = 0
+    for span in trace['spans']:
+        if span['duration_ms'] < min_ms:
+            hidden += 1
+            continue
+        meta = ' '.join(f'{key}={value}' for key, value in span.get('meta', {}).items())
+        click.echo(f"{span['start_ms']:>7.1f} ms {span['duration_ms']:>8.1f} ms  {'  ' * span['depth']}"
+                   f"[{span['kind']}] {span['name'][:160]} {meta}".rstrip())
+    if hidden:
+        click.echo(f"({hidden} spans under {min_ms} ms hidden)")
+    if trace.get('dropped_spans'):
+        click.echo(click.style(f"({trace['dropped_spans']} spans dropped over PROFILING_MAX_SPANS)", fg='red'))
+
+
+@click.command('profile:traces', help="Lists the request traces recorded by the sampling profiler, or shows one.")
+@click.argument('trace_id', required=False)
+@click.option('--limit', default=20, show_default=True, help="Number of traces to list.")
+@click.option('--slowest', is_flag=True, help="List the slowest traces instead of the newest.")
+@click.option('--path', 'path_filter', help="Only list traces whose path contains this text.")
+@click.option('--min-ms', default=0.0, show_default=True, help="Hide spans shorter than this many ms.")
+@click.option('--clear', is_flag=True, help="Delete all stored traces.")
+def profile_traces(trace_id, limit, slowest, path_filter, min_ms, clear):
+    store = TraceStore(traces_dir())
+
+    if clear:
+        store.clear()
+        click.echo(click.style(f"Traces in {store.directory} deleted.", fg='green'))
+        return
+
+    if trace_id:
+        trace = store.get(trace_id)
+        if trace is None:
+            raise click.ClickException(f"No trace '{trace_id}' in {store.directory}")
+        print_trace(trace, min_ms)
+        return
+
+    traces = store.list()
+    if path_filter:
+        traces = [trace for trace in traces if path_filter in trace['path']]
+    if slowest:
+        traces.sort(key=lambda trace: trace['duration_ms'], reverse=True)
+    if not traces:
+        click.echo(click.style(f"No traces in {store.directory}. Send requests with the X-Profile header or set "
+                               "PROFILING_SAMPLE_RATE.", fg='yellow'))
+        return
+    print_list(traces[:limit])